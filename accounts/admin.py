@@ -1,12 +1,14 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from eduaccess.admin_performance import LargeTableAdmin
 from .models import User, StudentProfile, EducatorProfile
 
 @admin.register(User)
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(BaseUserAdmin, LargeTableAdmin):
     list_display = ['email', 'username', 'user_type', 'is_staff', 'is_active']
     list_filter = ['user_type', 'is_staff', 'is_active']
-    search_fields = ['email', 'username']
+    # Prefix searches can use the email index; also used by autocomplete widgets
+    search_fields = ['email__startswith', 'username__startswith']
     ordering = ['email']
     
     fieldsets = (
@@ -17,11 +19,15 @@ class UserAdmin(BaseUserAdmin):
     )
 
 @admin.register(StudentProfile)
-class StudentProfileAdmin(admin.ModelAdmin):
+class StudentProfileAdmin(LargeTableAdmin):
     list_display = ['user', 'date_of_birth']
-    search_fields = ['user__email']
+    list_select_related = ['user']
+    autocomplete_fields = ['user']
+    search_fields = ['user__email__startswith']
 
 @admin.register(EducatorProfile)
 class EducatorProfileAdmin(admin.ModelAdmin):
     list_display = ['user', 'expertise']
-    search_fields = ['user__email', 'expertise']
\ No newline at end of file
+    list_select_related = ['user']
+    autocomplete_fields = ['user']
+    search_fields = ['user__email__startswith', 'expertise']
\ No newline at end of file
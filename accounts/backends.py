@@ -0,0 +1,21 @@
+from django.contrib.auth.backends import ModelBackend
+
+from .models import User
+
+
+class ProfileModelBackend(ModelBackend):
+    """
+    ModelBackend that loads the user's profile in the same query.
+
+    get_user() runs on every authenticated request, so joining both profile
+    tables here lets request.user.profile resolve without another query.
+    """
+
+    def get_user(self, user_id):
+        try:
+            user = User._default_manager.select_related(
+                *User.PROFILE_RELATED_NAMES.values()
+            ).get(pk=user_id)
+        except User.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
@@ -1,6 +1,7 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
-from .models import User
+from .models import User, StudentProfile, EducatorProfile
+from .services import register_user, split_full_name, username_from_email
 
 class SignUpForm(UserCreationForm):
     email = forms.EmailField(
@@ -39,25 +40,14 @@ class SignUpForm(UserCreationForm):
     
     def save(self, commit=True):
         user = super().save(commit=False)
-        user.username = self.cleaned_data['email'].split('@')[0]
+        user.username = username_from_email(self.cleaned_data['email'])
         user.email = self.cleaned_data['email']
         user.user_type = self.cleaned_data['user_type']
-        print(f"DEBUG: Form saving user {user.email} as {user.user_type}")
-        
-        # Split full name into first and last name
-        full_name = self.cleaned_data['full_name'].split(' ', 1)
-        user.first_name = full_name[0]
-        user.last_name = full_name[1] if len(full_name) > 1 else ''
+        user.first_name, user.last_name = split_full_name(self.cleaned_data['full_name'])
         
         if commit:
-            user.save()
-            # Create profile based on user type
-            if user.user_type == 'student':
-                from .models import StudentProfile
-                StudentProfile.objects.create(user=user)
-            else:
-                from .models import EducatorProfile
-                EducatorProfile.objects.create(user=user)
+            # User and profile are written in a single transaction
+            register_user(user)
         
         return user
 
@@ -83,7 +73,6 @@ class LoginForm(AuthenticationForm):
 
 class EducatorProfileForm(forms.ModelForm):
     class Meta:
-        from .models import EducatorProfile
         model = EducatorProfile
         fields = ['bio', 'expertise', 'website']
         widgets = {
@@ -95,7 +84,6 @@ class EducatorProfileForm(forms.ModelForm):
 
 class StudentProfileForm(forms.ModelForm):
     class Meta:
-        from .models import StudentProfile
         model = StudentProfile
         fields = ['bio', 'date_of_birth']
         widgets = {
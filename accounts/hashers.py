@@ -0,0 +1,36 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 with the iteration count taken from settings.
+
+    Keeps Django's 'pbkdf2_sha256' algorithm name so existing hashes still
+    verify. Django's check_password() calls must_update() on every
+    successful login, so changing PASSWORD_HASH_ITERATIONS transparently
+    rehashes users to the new cost the next time they sign in.
+    """
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_HASH_ITERATIONS', PBKDF2PasswordHasher.iterations)
+
+
+def time_hasher(hasher, iterations, rounds=3):
+    """Return the average seconds spent hashing one password at the given cost"""
+    salt = hasher.salt()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        hasher.encode('benchmark-password', salt, iterations)
+    return (time.perf_counter() - start) / rounds
+
+
+def calibrate_iterations(target_ms, hasher=None, start=100_000):
+    """Find the iteration count that costs roughly target_ms on this machine"""
+    hasher = hasher or TunedPBKDF2PasswordHasher()
+    elapsed = time_hasher(hasher, start)
+    # PBKDF2 cost scales linearly with iterations
+    return max(1, int(start * (target_ms / 1000) / elapsed))
@@ -0,0 +1,84 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+from unittest import mock
+
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from accounts.session_backend import write_buffer
+
+ENGINES = [
+    ('database', 'django.contrib.sessions.backends.db'),
+    ('cached write-behind', 'accounts.session_backend'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure session-bound request throughput (load, update and save a session) "
+        "with the database session engine and with accounts.session_backend"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sessions', type=int, default=50, help="Distinct sessions (users)")
+        parser.add_argument('--requests', type=int, default=2000, help="Requests per engine")
+        parser.add_argument('--workers', type=int, default=8, help="Concurrent request threads")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'engine':<22}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'db writes':>11}")
+        for label, engine in ENGINES:
+            result = self._run(import_module(engine).SessionStore, options)
+            self.stdout.write(
+                f"{label:<22}{result['throughput']:>9.0f}{result['p50']:>9.2f}"
+                f"{result['p95']:>9.2f}{result['writes']:>11}"
+            )
+
+    def _run(self, store_class, options):
+        keys = []
+        for _ in range(options['sessions']):
+            store = store_class()
+            store['_auth_user_id'] = '1'
+            store.create()
+            keys.append(store.session_key)
+
+        writes = 0
+        lock = threading.Lock()
+        db_save = DBStore.save
+
+        def counted_save(store, *args, **kwargs):
+            nonlocal writes
+            with lock:
+                writes += 1
+            return db_save(store, *args, **kwargs)
+
+        def request(i):
+            try:
+                start = time.perf_counter()
+                # What a request that shows a flash message does to its session
+                store = store_class(keys[i % len(keys)])
+                store['views'] = store.get('views', 0) + 1
+                store.save()
+                return (time.perf_counter() - start) * 1000
+            finally:
+                close_old_connections()
+
+        with mock.patch.object(DBStore, 'save', counted_save):
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                timings = sorted(pool.map(request, range(options['requests'])))
+            elapsed = time.perf_counter() - start
+            # Count the coalesced writes that are still pending
+            write_buffer.flush(force=True)
+
+        for key in keys:
+            store_class().delete(key)
+        return {
+            'throughput': len(timings) / elapsed,
+            'p50': statistics.median(timings),
+            'p95': timings[int(len(timings) * 0.95) - 1],
+            'writes': writes,
+        }
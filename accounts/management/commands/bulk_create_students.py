@@ -0,0 +1,104 @@
+import csv
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models.functions import Lower
+
+from accounts.models import User, StudentProfile
+from accounts.services import split_full_name, username_from_email
+
+
+class Command(BaseCommand):
+    help = (
+        "Provision a class roster of students from a CSV file with 'email' and "
+        "'full_name' columns and an optional 'password' column"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path', help="Path to the roster CSV")
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help="Rows per INSERT statement",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['csv_path'], newline='', encoding='utf-8') as f:
+                rows = list(csv.DictReader(f))
+        except OSError as e:
+            raise CommandError(f"Could not read roster: {e}")
+
+        if rows and not {'email', 'full_name'} <= set(rows[0]):
+            raise CommandError("Roster must have 'email' and 'full_name' columns")
+
+        # Deduplicate the roster and drop students who already have an account
+        roster = {}
+        for row in rows:
+            email = row['email'].strip().lower()
+            if email:
+                roster.setdefault(email, row)
+        # Existing addresses may have been stored with capitals
+        existing = set(
+            User.objects.annotate(email_lower=Lower('email'))
+            .filter(email_lower__in=list(roster)).values_list('email_lower', flat=True)
+        )
+        skipped = len(roster.keys() & existing)
+        for email in existing:
+            roster.pop(email, None)
+
+        usernames = self._unique_usernames(list(roster))
+        # Hashing is the slow part of provisioning, so rows without a password
+        # get an unusable one and students set theirs via password reset
+        unusable_password = make_password(None)
+
+        users = []
+        for email, row in roster.items():
+            first_name, last_name = split_full_name(row['full_name'])
+            password = (row.get('password') or '').strip()
+            users.append(User(
+                email=email,
+                username=usernames[email],
+                first_name=first_name,
+                last_name=last_name,
+                user_type='student',
+                password=make_password(password) if password else unusable_password,
+            ))
+
+        with transaction.atomic():
+            User.objects.bulk_create(users, batch_size=options['batch_size'])
+            # Re-read ids so this works on backends that don't return them from bulk inserts
+            user_ids = User.objects.filter(email__in=list(roster)).values_list('id', flat=True)
+            StudentProfile.objects.bulk_create(
+                [StudentProfile(user_id=user_id) for user_id in user_ids],
+                batch_size=options['batch_size'],
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(users)} students ({skipped} already had accounts)"
+        ))
+
+    def _unique_usernames(self, emails):
+        """Derive usernames from emails, suffixing any that are already taken"""
+        bases = {email: username_from_email(email) for email in emails}
+        taken = set(
+            User.objects.filter(username__in=set(bases.values())).values_list('username', flat=True)
+        )
+        while True:
+            usernames, assigned = {}, set()
+            for email, base in bases.items():
+                username, n = base, 1
+                while username in taken or username in assigned:
+                    n += 1
+                    username = f"{base}{n}"
+                assigned.add(username)
+                usernames[email] = username
+            # Suffixed names may themselves collide with existing accounts
+            clashes = set(
+                User.objects.filter(username__in=assigned - taken).values_list('username', flat=True)
+            )
+            if not clashes:
+                return usernames
+            taken |= clashes
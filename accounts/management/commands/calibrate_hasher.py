@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from accounts.hashers import TunedPBKDF2PasswordHasher, calibrate_iterations, time_hasher
+
+
+class Command(BaseCommand):
+    help = "Benchmark the password hasher and recommend PASSWORD_HASH_ITERATIONS for a cost target"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target-ms',
+            type=float,
+            default=getattr(settings, 'PASSWORD_HASH_TARGET_MS', 250),
+            help="Desired time per password hash in milliseconds",
+        )
+
+    def handle(self, *args, **options):
+        hasher = TunedPBKDF2PasswordHasher()
+        current = hasher.iterations
+        current_ms = time_hasher(hasher, current) * 1000
+        recommended = calibrate_iterations(options['target_ms'], hasher)
+
+        self.stdout.write(f"Current iterations: {current} ({current_ms:.1f} ms per hash)")
+        self.stdout.write(f"Target: {options['target_ms']:.0f} ms per hash")
+        self.stdout.write(self.style.SUCCESS(f"Recommended PASSWORD_HASH_ITERATIONS = {recommended}"))
@@ -0,0 +1,106 @@
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from accounts.models import User
+
+# Limits so high that nothing is throttled, for the baseline run
+UNTHROTTLED = {'ip': (10 ** 9, 1), 'email': (10 ** 9, 1)}
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate a credential-stuffing burst against the login view and measure how long "
+        "a legitimate user's logins take meanwhile, with and without throttling"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help="Existing account the legitimate client logs in as")
+        parser.add_argument('password', help="Its password")
+        parser.add_argument('--attack-requests', type=int, default=400, help="Failed login attempts in the burst")
+        parser.add_argument('--attacker-ips', type=int, default=4, help="Addresses the burst comes from")
+        parser.add_argument('--logins', type=int, default=20, help="Legitimate logins made during the burst")
+        parser.add_argument('--workers', type=int, default=4, help="Size of the simulated worker pool")
+        parser.add_argument('--host', default='localhost', help="Host header; must be in ALLOWED_HOSTS")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options['email'])
+        except User.DoesNotExist as e:
+            raise CommandError(str(e))
+        if not user.check_password(options['password']):
+            raise CommandError("Wrong password for the legitimate account")
+
+        self.stdout.write(
+            f"{'run':<13}{'hashed':>8}{'rejected':>10}{'burst s':>9}"
+            f"{'login p50 ms':>14}{'login p95 ms':>14}{'login max ms':>14}"
+        )
+        for label, limits in (('throttled', None), ('unthrottled', UNTHROTTLED)):
+            if limits is None:
+                result = self._run(user, options)
+            else:
+                with override_settings(LOGIN_RATE_LIMITS=limits):
+                    result = self._run(user, options)
+            self.stdout.write(
+                f"{label:<13}{result['hashed']:>8}{result['rejected']:>10}{result['elapsed']:>9.2f}"
+                f"{result['p50']:>14.1f}{result['p95']:>14.1f}{result['max']:>14.1f}"
+            )
+
+    def _run(self, user, options):
+        """Submit the burst and the legitimate logins to one pool, interleaved"""
+        # Fresh identities each run, so the runs don't share rate-limit counters
+        run = uuid.uuid4().hex[:8]
+        attacks = [
+            (f'203.0.113.{i % options["attacker_ips"] + 1}', f'{run}-{i}@example.invalid', 'wrong-password', 'student')
+            for i in range(options['attack_requests'])
+        ]
+        logins = [(f'198.51.100.{i % 250 + 1}', user.email, options['password'], user.user_type)
+                  for i in range(options['logins'])]
+        every = max(1, len(attacks) // max(1, len(logins)))
+
+        statuses, latencies = [], []
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            futures = []
+            for i, attempt in enumerate(attacks):
+                futures.append((False, time.perf_counter(), pool.submit(self._login, options['host'], *attempt)))
+                if i % every == 0 and logins:
+                    futures.append((True, time.perf_counter(), pool.submit(self._login, options['host'], *logins.pop())))
+            for attempt in logins:
+                futures.append((True, time.perf_counter(), pool.submit(self._login, options['host'], *attempt)))
+
+            for legitimate, submitted, future in futures:
+                status, finished = future.result()
+                if legitimate:
+                    if status != 302:
+                        raise CommandError(f"The legitimate login returned {status}")
+                    # Includes the time spent queued behind the burst
+                    latencies.append((finished - submitted) * 1000)
+                else:
+                    statuses.append(status)
+        elapsed = time.perf_counter() - start
+
+        latencies.sort()
+        return {
+            'hashed': sum(status == 200 for status in statuses),
+            'rejected': sum(status == 429 for status in statuses),
+            'elapsed': elapsed,
+            'p50': statistics.median(latencies),
+            'p95': latencies[int(len(latencies) * 0.95) - 1] if len(latencies) > 1 else latencies[0],
+            'max': latencies[-1],
+        }
+
+    def _login(self, host, ip, email, password, user_type):
+        try:
+            response = Client(HTTP_HOST=host, REMOTE_ADDR=ip).post(
+                reverse('accounts:login'), {'email': email, 'password': password, 'user_type': user_type},
+            )
+            return response.status_code, time.perf_counter()
+        finally:
+            close_old_connections()
@@ -0,0 +1,27 @@
+from django.db import migrations
+
+
+def backfill(apps, schema_editor):
+    """Create the missing profile of users created before profiles were mandatory"""
+    User = apps.get_model('accounts', 'User')
+    StudentProfile = apps.get_model('accounts', 'StudentProfile')
+    EducatorProfile = apps.get_model('accounts', 'EducatorProfile')
+
+    educators = User.objects.filter(user_type='educator', educator_profile__isnull=True)
+    students = User.objects.exclude(user_type='educator').filter(student_profile__isnull=True)
+    for profile_model, users in ((EducatorProfile, educators), (StudentProfile, students)):
+        profile_model.objects.bulk_create(
+            [profile_model(user_id=user_id) for user_id in users.values_list('pk', flat=True).iterator()],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_rename_student_profile_related_name'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -14,11 +14,34 @@ class User(AbstractUser):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['user_type', 'username']
     
+    # Reverse one-to-one accessor of the profile model for each user type
+    PROFILE_RELATED_NAMES = {
+        'student': 'student_profile',
+        'educator': 'educator_profile',
+    }
+    
     def __str__(self):
         return f"{self.email} ({self.user_type})"
     
+    @property
+    def profile(self):
+        """
+        The StudentProfile or EducatorProfile matching this user's type, or
+        None if there isn't one.
+
+        Reads the reverse one-to-one cache, so users loaded through
+        ProfileModelBackend (which select_related()s both profiles) never hit
+        the database here. Profiles are created with the user (see
+        accounts.signals); this never writes.
+        """
+        related_name = self.PROFILE_RELATED_NAMES.get(self.user_type, 'student_profile')
+        try:
+            return getattr(self, related_name)
+        except (StudentProfile.DoesNotExist, EducatorProfile.DoesNotExist):
+            return None
+    
 class StudentProfile(models.Model):
-    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="Student_profile")
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='student_profile')
     bio = models.TextField(blank=True)
     date_of_birth = models.DateField(null=True, blank=True)
     # Enrollment tracked via core.Enrollment model
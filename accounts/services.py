@@ -0,0 +1,33 @@
+from django.db import transaction
+
+from .models import User, StudentProfile, EducatorProfile
+
+
+def username_from_email(email):
+    return email.split('@')[0]
+
+
+def split_full_name(full_name):
+    """Split a full name into (first_name, last_name)"""
+    parts = full_name.strip().split(' ', 1)
+    return parts[0], parts[1] if len(parts) > 1 else ''
+
+
+def create_profile(user):
+    """Create the profile row that matches the user's type"""
+    if user.user_type == 'student':
+        return StudentProfile.objects.create(user=user)
+    return EducatorProfile.objects.create(user=user)
+
+
+@transaction.atomic
+def register_user(user):
+    """
+    Save a new (unsaved) user together with its profile.
+
+    The profile is created by the post_save signal (accounts.signals) inside
+    this transaction, so a failure while creating it rolls back the user as
+    well.
+    """
+    user.save()
+    return user
@@ -0,0 +1,138 @@
+"""
+Cached, write-behind session backend.
+
+Reads are served from the session cache (SESSION_CACHE_ALIAS) and fall back
+to the database like Django's cached_db backend. Updates to an existing
+session go to the cache immediately, while the database write is deferred
+by SESSION_WRITE_COALESCE_SECONDS so that every update made within that
+window lands as a single UPDATE. New sessions, including the new key
+issued on login, are still written synchronously so session keys stay
+unique and a fresh login survives a cache eviction.
+
+A daemon thread in each process flushes due writes and, at most once per
+SESSION_CLEANUP_INTERVAL across all processes, deletes expired sessions.
+
+With several worker processes the session cache must be shared (Redis or
+Memcached); otherwise a process can read a row that another process has
+not flushed yet.
+"""
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.contrib.sessions.backends.base import UpdateError
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'eduaccess.sessions.cached'
+CLEANUP_LOCK_KEY = 'eduaccess.sessions.cleanup-lock'
+
+
+class SessionWriteBuffer:
+    """Per-process set of session keys with a pending database write"""
+
+    poll_interval = 1
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}  # session_key -> monotonic time the write is due
+        self._thread = None
+
+    def schedule(self, session_key, delay):
+        with self._lock:
+            # Later writes in the window reuse the first deadline
+            self._pending.setdefault(session_key, time.monotonic() + delay)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='session-write-buffer', daemon=True
+                )
+                self._thread.start()
+
+    def discard(self, session_key):
+        with self._lock:
+            self._pending.pop(session_key, None)
+
+    def _pop_due(self, force=False):
+        now = time.monotonic()
+        with self._lock:
+            due = [key for key, deadline in self._pending.items() if force or deadline <= now]
+            for key in due:
+                del self._pending[key]
+        return due
+
+    def flush(self, force=False):
+        """Write every due session from the cache to the database"""
+        for session_key in self._pop_due(force):
+            store = SessionStore(session_key)
+            data = store._cache.get(store.cache_key)
+            if data is None:
+                # Evicted or deleted since it was scheduled
+                continue
+            store._session_cache = data
+            try:
+                DBStore.save(store)
+            except UpdateError:
+                # The session was deleted (e.g. logout) before the flush
+                pass
+            except Exception:
+                logger.exception("Error flushing session %s to the database", session_key)
+
+    def _run(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.flush()
+                clear_expired_if_due()
+            finally:
+                close_old_connections()
+
+
+write_buffer = SessionWriteBuffer()
+atexit.register(write_buffer.flush, force=True)
+
+
+def clear_expired_if_due():
+    """Delete expired sessions, at most once per SESSION_CLEANUP_INTERVAL"""
+    interval = getattr(settings, 'SESSION_CLEANUP_INTERVAL', 3600)
+    store = SessionStore()
+    # cache.add() is atomic, so only one process wins each interval
+    if store._cache.add(CLEANUP_LOCK_KEY, True, timeout=interval):
+        SessionStore.clear_expired()
+
+
+class SessionStore(CachedDBStore):
+    cache_key_prefix = KEY_PREFIX
+
+    def create(self):
+        super().create()
+        # Sessions created (or cycled on login) during this request are
+        # written through, so a cache eviction can't lose a fresh login
+        self._created = True
+
+    def save(self, must_create=False):
+        if must_create or self.session_key is None or getattr(self, '_created', False):
+            # Inserts stay synchronous; the database enforces key uniqueness
+            super().save(must_create)
+            return
+        try:
+            self._cache.set(self.cache_key, self._get_session(), self.get_expiry_age())
+        except Exception:
+            logger.exception("Error saving to cache (%s)", self._cache)
+            # Without the cache the update would be lost, so write through now
+            DBStore.save(self, must_create)
+            return
+        write_buffer.schedule(
+            self.session_key,
+            getattr(settings, 'SESSION_WRITE_COALESCE_SECONDS', 5),
+        )
+
+    def delete(self, session_key=None):
+        key = session_key or self.session_key
+        if key is not None:
+            write_buffer.discard(key)
+        super().delete(session_key)
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import User
+from .services import create_profile
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, raw=False, **kwargs):
+    # Every user has the profile matching their type, however they were created
+    if created and not raw:
+        create_profile(instance)
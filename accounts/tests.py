@@ -1,3 +1,190 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import authenticate
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .models import EducatorProfile, StudentProfile, User
+from .services import register_user
+from .session_backend import SessionStore, write_buffer
+
+
+def make_user(email, user_type='student', password='pw-123456', **fields):
+    user = User(email=email, username=email.split('@')[0], user_type=user_type, **fields)
+    user.set_password(password)
+    return register_user(user)
+
+
+class ProfileTests(TestCase):
+    def test_profile_is_created_with_the_user(self):
+        student = make_user('student@example.com')
+        educator = User.objects.create_user(
+            email='educator@example.com', username='educator', user_type='educator', password='pw-123456',
+        )
+        self.assertIsInstance(student.profile, StudentProfile)
+        self.assertIsInstance(educator.profile, EducatorProfile)
+        self.assertEqual(StudentProfile.objects.count() + EducatorProfile.objects.count(), 2)
+
+    def test_reading_a_missing_profile_does_not_create_it(self):
+        user = make_user('student@example.com')
+        User.objects.filter(pk=user.pk).update(user_type='educator')
+        user = User.objects.get(pk=user.pk)
+        with self.assertNumQueries(1):
+            self.assertIsNone(user.profile)
+        self.assertFalse(EducatorProfile.objects.exists())
+
+    def test_profile_loads_with_the_request_user(self):
+        user = make_user('student@example.com')
+        self.client.force_login(user)
+        response = self.client.get(reverse('accounts:edit_profile'))
+        self.assertEqual(response.context['form'].instance, user.profile)
+
+
+@override_settings(
+    PASSWORD_HASH_ITERATIONS=1000,
+    LOGIN_RATE_LIMITS={'ip': (5, 300), 'email': (3, 300)},
+)
+class LoginThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_user('alice@example.com')
+
+    def login(self, email, password, ip='192.0.2.1'):
+        return self.client.post(
+            reverse('accounts:login'),
+            {'email': email, 'password': password, 'user_type': 'student'},
+            REMOTE_ADDR=ip,
+        )
+
+    def test_over_limit_attempts_are_rejected_before_hashing(self):
+        with mock.patch('accounts.views.authenticate', wraps=authenticate) as auth:
+            for _ in range(3):
+                self.assertEqual(self.login('alice@example.com', 'wrong').status_code, 200)
+            response = self.login('alice@example.com', 'wrong', ip='192.0.2.2')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(auth.call_count, 3)
+
+    def test_per_ip_limit_covers_many_emails(self):
+        for i in range(5):
+            self.login(f'user{i}@example.com', 'wrong')
+        self.assertEqual(self.login('alice@example.com', 'pw-123456').status_code, 429)
+        self.assertEqual(self.login('alice@example.com', 'pw-123456', ip='192.0.2.9').status_code, 302)
+
+    def test_successful_logins_share_an_address_without_limit(self):
+        # A classroom behind one NAT address, five times the per-IP limit
+        for i in range(25):
+            make_user(f'student{i}@example.com')
+            response = self.login(f'student{i}@example.com', 'pw-123456')
+            self.assertEqual(response.status_code, 302, f'login {i + 1} was throttled')
+            self.client.logout()
+        self.assertEqual(self.login('alice@example.com', 'wrong').status_code, 200)
+
+    def test_successful_login_clears_the_email_counter(self):
+        for _ in range(2):
+            self.login('alice@example.com', 'wrong')
+        self.assertEqual(self.login('alice@example.com', 'pw-123456').status_code, 302)
+        self.client.logout()
+        for _ in range(2):
+            self.assertEqual(self.login('alice@example.com', 'wrong', ip='192.0.2.3').status_code, 200)
+
+    def test_login_rehashes_to_the_configured_cost(self):
+        self.assertIn('$1000$', self.user.password)
+        with override_settings(PASSWORD_HASH_ITERATIONS=2000):
+            self.assertEqual(self.login('alice@example.com', 'pw-123456').status_code, 302)
+        self.user.refresh_from_db()
+        self.assertIn('$2000$', self.user.password)
+
+
+class BulkCreateStudentsTests(TestCase):
+    def import_roster(self, text):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write(text)
+        self.addCleanup(os.unlink, f.name)
+        call_command('bulk_create_students', f.name, stdout=io.StringIO())
+
+    def test_existing_accounts_match_regardless_of_case(self):
+        make_user('Alice@Example.com')
+        self.import_roster('email,full_name\nalice@example.com,Alice A\nBOB@example.com,Bob B\nbob@example.com,Bob Again\n')
+        self.assertEqual(User.objects.count(), 2)
+        bob = User.objects.get(email='bob@example.com')
+        self.assertEqual((bob.first_name, bob.last_name), ('Bob', 'B'))
+        self.assertTrue(StudentProfile.objects.filter(user=bob).exists())
+
+
+class SessionBackendTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.store = SessionStore()
+        self.store['views'] = 0
+        self.store.create()
+
+    def stored_data(self):
+        return SessionStore().decode(Session.objects.get(session_key=self.store.session_key).session_data)
+
+    def test_new_sessions_are_written_through(self):
+        self.assertEqual(self.stored_data(), {'views': 0})
+
+    def test_updates_within_the_window_are_coalesced(self):
+        for views in range(1, 6):
+            store = SessionStore(self.store.session_key)
+            store['views'] = views
+            store.save()
+            # Served from the cache while the database write is pending
+            self.assertEqual(SessionStore(self.store.session_key)['views'], views)
+        self.assertEqual(self.stored_data(), {'views': 0})
+
+        with mock.patch('django.contrib.sessions.backends.db.SessionStore.save', autospec=True) as save:
+            write_buffer.flush(force=True)
+        self.assertEqual(save.call_count, 1)
+
+    def test_flush_writes_the_latest_data(self):
+        store = SessionStore(self.store.session_key)
+        store['views'] = 3
+        store.save()
+        write_buffer.flush(force=True)
+        self.assertEqual(self.stored_data(), {'views': 3})
+
+    def test_deleted_sessions_are_not_flushed(self):
+        store = SessionStore(self.store.session_key)
+        store['views'] = 3
+        store.save()
+        store.delete()
+        write_buffer.flush(force=True)
+        self.assertFalse(Session.objects.filter(session_key=self.store.session_key).exists())
+
+
+@override_settings(PASSWORD_HASH_ITERATIONS=1000)
+class AdminChangelistTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.superuser = User.objects.create_superuser(
+            email='admin@example.com', username='admin', password='pw-123456',
+        )
+        for n in range(3):
+            make_user(f'student{n}@example.com')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.superuser)
+
+    def test_changelists_run_a_fixed_number_of_queries(self):
+        # The user, the row estimate, the count and the page
+        for model in (User, StudentProfile):
+            url = reverse(f'admin:accounts_{model._meta.model_name}_changelist')
+            with self.subTest(model=model.__name__), self.assertNumQueries(4):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.context['cl'].result_list)
+
+    def test_profiles_are_searched_through_a_subquery(self):
+        # Searches count exactly, without the row estimate
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('admin:accounts_studentprofile_changelist'), {'q': 'STUDENT1@'})
+        self.assertEqual([profile.user.email for profile in response.context['cl'].result_list], ['student1@example.com'])
+        self.assertNotIn('JOIN', str(response.context['cl'].queryset.query).split(' WHERE ')[1])
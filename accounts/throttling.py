@@ -0,0 +1,117 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+# (max attempts, window in seconds) per scope; overridable via settings.LOGIN_RATE_LIMITS
+DEFAULT_LOGIN_RATE_LIMITS = {
+    'ip': (20, 300),
+    'email': (5, 300),
+}
+
+
+class SlidingWindowLimiter:
+    """
+    Approximate sliding-window counter backed by the Django cache.
+
+    Two fixed-window buckets (current and previous) are kept per identity and
+    the previous bucket is weighted by how much of it still overlaps the
+    sliding window. This needs only two cache reads per check and one atomic
+    increment per hit, so it is cheap enough to run before authentication.
+    """
+
+    def __init__(self, scope, limit, window):
+        self.scope = scope
+        self.limit = limit
+        self.window = window
+
+    def _key(self, ident, bucket):
+        digest = hashlib.sha256(ident.encode()).hexdigest()[:32]
+        return f'ratelimit:{self.scope}:{digest}:{bucket}'
+
+    def _buckets(self, now):
+        bucket = int(now // self.window)
+        elapsed = (now % self.window) / self.window
+        return bucket, elapsed
+
+    def count(self, ident, now=None):
+        now = time.time() if now is None else now
+        bucket, elapsed = self._buckets(now)
+        values = cache.get_many([self._key(ident, bucket), self._key(ident, bucket - 1)])
+        current = values.get(self._key(ident, bucket), 0)
+        previous = values.get(self._key(ident, bucket - 1), 0)
+        return current + previous * (1 - elapsed)
+
+    def is_limited(self, ident, now=None):
+        return self.count(ident, now) >= self.limit
+
+    def hit(self, ident, now=None):
+        now = time.time() if now is None else now
+        bucket, _ = self._buckets(now)
+        key = self._key(ident, bucket)
+        # Buckets must outlive the window they are weighted into
+        if not cache.add(key, 1, timeout=self.window * 2):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, timeout=self.window * 2)
+
+    def reset(self, ident, now=None):
+        now = time.time() if now is None else now
+        bucket, _ = self._buckets(now)
+        cache.delete_many([self._key(ident, bucket), self._key(ident, bucket - 1)])
+
+
+def get_login_limiters():
+    limits = {**DEFAULT_LOGIN_RATE_LIMITS, **getattr(settings, 'LOGIN_RATE_LIMITS', {})}
+    return {
+        scope: SlidingWindowLimiter(f'login-{scope}', limit, window)
+        for scope, (limit, window) in limits.items()
+    }
+
+
+def get_client_ip(request):
+    # Only trust REMOTE_ADDR; proxies must set it correctly (e.g. via the WSGI server)
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def login_identities(request, email):
+    return {
+        'ip': get_client_ip(request),
+        'email': (email or '').strip().lower(),
+    }
+
+
+def check_login_allowed(request, email):
+    """
+    Return True if this login attempt is within every limit.
+
+    Runs before authenticate() so over-limit attempts never reach the
+    password hasher. Only failed attempts count (record_failed_login), so
+    many students signing in from one school's address don't use up the
+    per-IP limit.
+    """
+    limiters = get_login_limiters()
+    identities = login_identities(request, email)
+    return not any(
+        identities.get(scope) and limiter.is_limited(identities[scope])
+        for scope, limiter in limiters.items()
+    )
+
+
+def record_failed_login(request, email):
+    """Count a wrong password against every scope"""
+    limiters = get_login_limiters()
+    identities = login_identities(request, email)
+    for scope, limiter in limiters.items():
+        if identities.get(scope):
+            limiter.hit(identities[scope])
+
+
+def reset_login_attempts(request, email):
+    """Clear the per-email counter after a successful login"""
+    limiters = get_login_limiters()
+    identities = login_identities(request, email)
+    if 'email' in limiters and identities['email']:
+        limiters['email'].reset(identities['email'])
@@ -2,15 +2,15 @@ from django.shortcuts import render, redirect
 from django.contrib.auth import login, authenticate, logout
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from .forms import SignUpForm, LoginForm
+from .forms import SignUpForm, LoginForm, EducatorProfileForm, StudentProfileForm
 from .models import User
+from .throttling import check_login_allowed, record_failed_login, reset_login_attempts
 
 def signup_view(request):
     if request.user.is_authenticated:
         return redirect('core:dashboard')
     
     if request.method == 'POST':
-        print(f"DEBUG: POST data: {request.POST}")
         form = SignUpForm(request.POST)
         if form.is_valid():
             try:
@@ -38,6 +38,11 @@ def login_view(request):
         password = request.POST.get('password')
         user_type = request.POST.get('user_type')
         
+        # Reject over-limit attempts before any password hashing happens
+        if not check_login_allowed(request, email):
+            messages.error(request, 'Too many login attempts. Please wait a few minutes and try again.')
+            return render(request, 'accounts/login.html', status=429)
+        
         # Authenticate using email
         try:
             # user_obj = User.objects.get(email=email) # Not needed to pre-fetch
@@ -46,6 +51,7 @@ def login_view(request):
             if user is not None:
                 # Check if user type matches
                 if user.user_type == user_type:
+                    reset_login_attempts(request, email)
                     login(request, user)
                     messages.success(request, f'Welcome back, {user.first_name}!')
                     
@@ -55,6 +61,7 @@ def login_view(request):
                 else:
                     messages.error(request, f'This account is registered as a {user.get_user_type_display()}, not a {user_type}. Please select the correct account type.')
             else:
+                record_failed_login(request, email)
                 messages.error(request, 'Invalid email or password. Please try again.')
         except User.DoesNotExist:
             messages.error(request, 'No account found with this email address. Please check your email or sign up.')
@@ -83,20 +90,17 @@ def edit_profile(request):
     user = request.user
     
     if user.user_type == 'educator':
-        from .models import EducatorProfile
-        from .forms import EducatorProfileForm
-        profile_model = EducatorProfile
         profile_form = EducatorProfileForm
         title = "Edit Educator Profile"
     else:
-        from .models import StudentProfile
-        from .forms import StudentProfileForm
-        profile_model = StudentProfile
         profile_form = StudentProfileForm
         title = "Edit Student Profile"
         
-    # Get or create profile
-    profile, created = profile_model.objects.get_or_create(user=user)
+    # Loaded together with the user by ProfileModelBackend
+    profile = user.profile
+    if profile is None:
+        # The user's type changed after signup; saving the form creates it
+        profile = profile_form._meta.model(user=user)
     
     if request.method == 'POST':
         form = profile_form(request.POST, instance=profile)
@@ -1,57 +1,97 @@
 from django.contrib import admin
+from eduaccess.admin_performance import LargeTableAdmin
 from .models import (
-    Course, Enrollment, CourseModule, Lesson, 
-    Quiz, Question, Answer, LessonCompletion, QuizSubmission
+    Course, Enrollment, CourseModule, Lesson,
+    Quiz, Question, Answer, LessonCompletion, QuizSubmission, CourseDailyActivity
 )
 
+# Student emails are searched by prefix, which the email column's unique
+# index can serve; a substring search would scan the whole users table.
+
 @admin.register(Course)
 class CourseAdmin(admin.ModelAdmin):
     list_display = ['title', 'educator', 'category', 'level', 'is_published', 'created_at']
     list_filter = ['is_published', 'level', 'category']
+    list_select_related = ['educator']
+    autocomplete_fields = ['educator']
     search_fields = ['title', 'description']
 
 @admin.register(Enrollment)
-class EnrollmentAdmin(admin.ModelAdmin):
+class EnrollmentAdmin(LargeTableAdmin):
     list_display = ['student', 'course', 'enrolled_at', 'progress', 'completed']
     list_filter = ['completed', 'enrolled_at']
-    search_fields = ['student__email', 'course__title']
+    list_select_related = ['student', 'course']
+    autocomplete_fields = ['student', 'course']
+    search_fields = ['student__email__startswith', 'course__title']
+    # Newest first by primary key, instead of sorting by the unindexed enrolled_at
+    ordering = ['-pk']
 
 @admin.register(CourseModule)
 class CourseModuleAdmin(admin.ModelAdmin):
     list_display = ['title', 'course', 'order']
     list_filter = ['course']
+    list_select_related = ['course']
+    autocomplete_fields = ['course']
     search_fields = ['title']
 
 @admin.register(Lesson)
-class LessonAdmin(admin.ModelAdmin):
+class LessonAdmin(LargeTableAdmin):
     list_display = ['title', 'module', 'content_type', 'order', 'duration_minutes']
     list_filter = ['content_type']
+    list_select_related = ['module__course']
+    autocomplete_fields = ['module']
     search_fields = ['title']
 
 @admin.register(Quiz)
-class QuizAdmin(admin.ModelAdmin):
+class QuizAdmin(LargeTableAdmin):
     list_display = ['title', 'lesson', 'passing_score']
+    list_select_related = ['lesson__module']
+    autocomplete_fields = ['lesson']
     search_fields = ['title']
 
 @admin.register(Question)
-class QuestionAdmin(admin.ModelAdmin):
+class QuestionAdmin(LargeTableAdmin):
     list_display = ['question_text', 'quiz', 'question_type', 'points', 'order']
     list_filter = ['question_type']
+    list_select_related = ['quiz']
+    autocomplete_fields = ['quiz']
     search_fields = ['question_text']
 
 @admin.register(Answer)
-class AnswerAdmin(admin.ModelAdmin):
+class AnswerAdmin(LargeTableAdmin):
     list_display = ['answer_text', 'question', 'is_correct']
     list_filter = ['is_correct']
+    list_select_related = ['question__quiz']
+    autocomplete_fields = ['question']
 
 @admin.register(LessonCompletion)
-class LessonCompletionAdmin(admin.ModelAdmin):
+class LessonCompletionAdmin(LargeTableAdmin):
     list_display = ['student', 'lesson', 'completed_at']
     list_filter = ['completed_at']
-    search_fields = ['student__email', 'lesson__title']
+    list_select_related = ['student', 'lesson__module']
+    autocomplete_fields = ['student', 'lesson']
+    search_fields = ['student__email__startswith', 'lesson__title']
 
 @admin.register(QuizSubmission)
-class QuizSubmissionAdmin(admin.ModelAdmin):
+class QuizSubmissionAdmin(LargeTableAdmin):
     list_display = ['student', 'quiz', 'score', 'passed', 'submitted_at']
     list_filter = ['passed', 'submitted_at']
-    search_fields = ['student__email', 'quiz__title']
\ No newline at end of file
+    list_select_related = ['student', 'quiz']
+    autocomplete_fields = ['student', 'quiz']
+    search_fields = ['student__email__startswith', 'quiz__title']
+
+@admin.register(CourseDailyActivity)
+class CourseDailyActivityAdmin(LargeTableAdmin):
+    """Read-only view of the daily rollups; `manage.py rollup_activity` maintains them"""
+    list_display = ['course', 'day', 'enrollments', 'completions', 'submissions', 'passes', 'average_score']
+    list_filter = ['day']
+    list_select_related = ['course']
+    search_fields = ['course__title']
+    date_hierarchy = 'day'
+    ordering = ['-day']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,423 @@
+"""
+Read-only JSON API (v1) for the course catalog, outlines, lessons, quizzes
+and the signed-in user's progress.
+
+Every endpoint reads through `values()` queries, so no model instances are
+built and nothing is fetched per object. Course-wide documents (outlines,
+lessons, quizzes) are cached keyed by the course's updated_at version stamp,
+which the signals in core.signals bump on any content change, so cached
+entries never need explicit invalidation. All responses carry ETags.
+"""
+import hashlib
+import json
+from functools import wraps
+from itertools import groupby
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Exists, Max, OuterRef, Sum
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition, require_GET, require_POST
+
+from eduaccess.routers import replica_reads
+from . import quiz_wire
+from .grading import grade_quiz
+from .models import (
+    Answer, Course, CourseModule, Enrollment, Lesson, LessonCompletion, Question, Quiz,
+)
+from .progress import record_quiz_submission
+
+API_VERSION = 'v1'
+
+# Cached documents are keyed by version, so the timeout only bounds memory use
+DOCUMENT_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Rows fetched per database round trip while streaming lists
+STREAM_CHUNK_SIZE = 500
+
+
+def api_login_required(view_func):
+    """Like login_required, but answers 401 instead of redirecting to the login page"""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': "Authentication required."}, status=401)
+        return view_func(request, *args, **kwargs)
+    return wrapper
+
+
+def api_view(etag_func, public=False):
+    """Decorators shared by every API endpoint"""
+    def decorator(view_func):
+        view_func = condition(etag_func=etag_func)(view_func)
+        visibility = {'public': True} if public else {'private': True}
+        view_func = cache_control(no_cache=True, **visibility)(view_func)
+        view_func = replica_reads(view_func)
+        if not public:
+            view_func = api_login_required(view_func)
+        return require_GET(view_func)
+    return decorator
+
+
+def api_etag(*parts):
+    raw = ':'.join(str(part) for part in (API_VERSION, *parts))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _error(message, status):
+    return JsonResponse({'error': message}, status=status)
+
+
+def _media_url(name):
+    return default_storage.url(name) if name else None
+
+
+def _cached_document(kind, object_id, version, build):
+    """Return the cached `kind` document for this content version, building it on a miss"""
+    key = f'api:{API_VERSION}:{kind}:{object_id}:{version:%Y%m%d%H%M%S%f}'
+    document = cache.get(key)
+    if document is None:
+        document = build()
+        cache.set(key, document, DOCUMENT_CACHE_TIMEOUT)
+    return document
+
+
+def _memoized(request, key, compute):
+    """Compute a per-request value once, so the ETag function and the view share it"""
+    memo = request.__dict__.setdefault('_api_memo', {})
+    if key not in memo:
+        memo[key] = compute()
+    return memo[key]
+
+
+# Catalog
+
+CATALOG_FIELDS = (
+    'id', 'title', 'description', 'category', 'level', 'thumbnail', 'updated_at',
+    'educator__first_name', 'educator__last_name',
+)
+
+
+def _catalog_item(row):
+    return {
+        'id': row['id'],
+        'title': row['title'],
+        'description': row['description'],
+        'category': row['category'],
+        'level': row['level'],
+        'thumbnail': _media_url(row['thumbnail']),
+        'educator': f"{row['educator__first_name']} {row['educator__last_name']}".strip(),
+        'updated_at': row['updated_at'],
+    }
+
+
+def stream_json_list(key, items):
+    """Yield {"<key>": [...]} piece by piece so large lists are never held in memory"""
+    encoder = DjangoJSONEncoder()
+    yield f'{{"version": "{API_VERSION}", "{key}": ['
+    for i, item in enumerate(items):
+        yield (',' if i else '') + encoder.encode(item)
+    yield ']}'
+
+
+def catalog_etag(request):
+    stats = Course.objects.filter(is_published=True).aggregate(
+        count=Count('id'), latest=Max('updated_at'),
+    )
+    return api_etag('catalog', stats['count'], stats['latest'])
+
+
+@api_view(catalog_etag, public=True)
+def course_catalog(request):
+    """All published courses"""
+    rows = Course.objects.filter(is_published=True).values(*CATALOG_FIELDS)
+    items = (_catalog_item(row) for row in rows.iterator(chunk_size=STREAM_CHUNK_SIZE))
+    return StreamingHttpResponse(stream_json_list('courses', items), content_type='application/json')
+
+
+# Course outline
+
+def _course_access(request, course_id):
+    """(updated_at, educator_id, is_published, is_enrolled) for a course, or None"""
+    return _memoized(request, ('course', course_id), lambda: Course.objects.filter(pk=course_id).annotate(
+        is_enrolled=Exists(Enrollment.objects.filter(student=request.user, course=OuterRef('pk'))),
+    ).values_list('updated_at', 'educator_id', 'is_published', 'is_enrolled').first())
+
+
+def _build_outline(course_id):
+    course = Course.objects.filter(pk=course_id).values(*CATALOG_FIELDS).get()
+    modules = CourseModule.objects.filter(course_id=course_id).values('id', 'title', 'description', 'order')
+    lessons = Lesson.objects.filter(module__course_id=course_id).order_by('module_id', 'order').values(
+        'id', 'module_id', 'title', 'content_type', 'order', 'duration_minutes', 'quiz__id',
+    )
+    lessons_by_module = {
+        module_id: [
+            {
+                'id': lesson['id'],
+                'title': lesson['title'],
+                'content_type': lesson['content_type'],
+                'order': lesson['order'],
+                'duration_minutes': lesson['duration_minutes'],
+                'quiz': lesson['quiz__id'],
+            }
+            for lesson in group
+        ]
+        for module_id, group in groupby(lessons, key=lambda lesson: lesson['module_id'])
+    }
+    return {
+        **_catalog_item(course),
+        'modules': [
+            {**module, 'lessons': lessons_by_module.get(module['id'], [])}
+            for module in modules
+        ],
+    }
+
+
+def course_outline_etag(request, course_id):
+    row = _course_access(request, course_id)
+    if row is None:
+        return None
+    return api_etag(request.user.pk, 'outline', course_id, *row)
+
+
+@api_view(course_outline_etag)
+def course_outline(request, course_id):
+    """A course with its modules and lesson titles"""
+    row = _course_access(request, course_id)
+    if row is None:
+        return _error("Course not found.", 404)
+    updated_at, educator_id, is_published, is_enrolled = row
+    if not is_published and educator_id != request.user.pk:
+        return _error("Course not found.", 404)
+
+    outline = _cached_document('outline', course_id, updated_at, lambda: _build_outline(course_id))
+    return JsonResponse({'version': API_VERSION, 'course': {**outline, 'is_enrolled': is_enrolled}})
+
+
+# Lesson content
+
+def _lesson_access(request, lesson_id):
+    """(course_id, course updated_at, educator_id, is_enrolled, is_completed) for a lesson, or None"""
+    return _memoized(request, ('lesson', lesson_id), lambda: Lesson.objects.filter(
+        pk=lesson_id, module__course__deleted_at__isnull=True,
+    ).annotate(
+        is_enrolled=Exists(Enrollment.objects.filter(student=request.user, course=OuterRef('module__course'))),
+        is_completed=Exists(LessonCompletion.objects.filter(student=request.user, lesson=OuterRef('pk'))),
+    ).values_list(
+        'module__course_id', 'module__course__updated_at', 'module__course__educator_id',
+        'is_enrolled', 'is_completed',
+    ).first())
+
+
+def _build_lesson(lesson_id):
+    lesson = Lesson.objects.filter(pk=lesson_id).values(
+        'id', 'module_id', 'module__course_id', 'title', 'content_type', 'order', 'duration_minutes',
+        'text_content', 'video_url', 'video_provider', 'video_id', 'pdf_file', 'quiz__id',
+    ).get()
+    # Unsaved instance used only for its embed URL property
+    video = Lesson(video_url=lesson['video_url'], video_provider=lesson['video_provider'], video_id=lesson['video_id'])
+    return {
+        'id': lesson['id'],
+        'course': lesson['module__course_id'],
+        'module': lesson['module_id'],
+        'title': lesson['title'],
+        'content_type': lesson['content_type'],
+        'order': lesson['order'],
+        'duration_minutes': lesson['duration_minutes'],
+        'text_content': lesson['text_content'],
+        'video_url': lesson['video_url'],
+        'video_embed_url': video.video_embed_url if lesson['video_url'] else None,
+        'pdf_url': _media_url(lesson['pdf_file']),
+        'quiz': lesson['quiz__id'],
+    }
+
+
+def lesson_content_etag(request, lesson_id):
+    row = _lesson_access(request, lesson_id)
+    if row is None:
+        return None
+    return api_etag(request.user.pk, 'lesson', lesson_id, *row)
+
+
+@api_view(lesson_content_etag)
+def lesson_content(request, lesson_id):
+    """A lesson's content, for enrolled students and the course's educator"""
+    row = _lesson_access(request, lesson_id)
+    if row is None:
+        return _error("Lesson not found.", 404)
+    course_id, updated_at, educator_id, is_enrolled, is_completed = row
+    if not is_enrolled and educator_id != request.user.pk:
+        return _error("You must be enrolled to view this lesson.", 403)
+
+    lesson = _cached_document('lesson', lesson_id, updated_at, lambda: _build_lesson(lesson_id))
+    return JsonResponse({'version': API_VERSION, 'lesson': {**lesson, 'is_completed': is_completed}})
+
+
+# Quiz
+
+def _quiz_access(request, quiz_id):
+    """(course updated_at, educator_id, is_enrolled) for a quiz, or None"""
+    return _memoized(request, ('quiz', quiz_id), lambda: Quiz.objects.filter(
+        pk=quiz_id, lesson__module__course__deleted_at__isnull=True,
+    ).annotate(
+        is_enrolled=Exists(Enrollment.objects.filter(
+            student=request.user, course=OuterRef('lesson__module__course'),
+        )),
+    ).values_list(
+        'lesson__module__course__updated_at', 'lesson__module__course__educator_id', 'is_enrolled',
+    ).first())
+
+
+def _build_quiz(quiz_id):
+    quiz = Quiz.objects.filter(pk=quiz_id).values('id', 'lesson_id', 'title', 'description', 'passing_score').get()
+    questions = Question.objects.filter(quiz_id=quiz_id).values(
+        'id', 'question_text', 'question_type', 'order', 'points',
+    )
+    # is_correct is deliberately never selected
+    answers = Answer.objects.filter(question__quiz_id=quiz_id).order_by('question_id', 'id').values(
+        'id', 'question_id', 'answer_text',
+    )
+    answers_by_question = {
+        question_id: [{'id': answer['id'], 'text': answer['answer_text']} for answer in group]
+        for question_id, group in groupby(answers, key=lambda answer: answer['question_id'])
+    }
+    return {
+        'id': quiz['id'],
+        'lesson': quiz['lesson_id'],
+        'title': quiz['title'],
+        'description': quiz['description'],
+        'passing_score': quiz['passing_score'],
+        'questions': [
+            {
+                'id': question['id'],
+                'text': question['question_text'],
+                'type': question['question_type'],
+                'order': question['order'],
+                'points': question['points'],
+                'answers': answers_by_question.get(question['id'], []),
+            }
+            for question in questions
+        ],
+    }
+
+
+def quiz_etag(request, quiz_id):
+    row = _quiz_access(request, quiz_id)
+    if row is None:
+        return None
+    return api_etag(request.user.pk, 'quiz', quiz_id, *row)
+
+
+@api_view(quiz_etag)
+def quiz_questions(request, quiz_id):
+    """A quiz's questions and answer options, without the correct answers"""
+    row = _quiz_access(request, quiz_id)
+    if row is None:
+        return _error("Quiz not found.", 404)
+    updated_at, educator_id, is_enrolled = row
+    if not is_enrolled and educator_id != request.user.pk:
+        return _error("You must be enrolled to take this quiz.", 403)
+
+    quiz = _cached_document('quiz', quiz_id, updated_at, lambda: _build_quiz(quiz_id))
+    return JsonResponse({'version': API_VERSION, 'quiz': quiz})
+
+
+def quiz_compact_etag(request, quiz_id):
+    row = _quiz_access(request, quiz_id)
+    if row is None:
+        return None
+    return api_etag(request.user.pk, 'quiz-compact', quiz_id, request.GET.get('page', '1'), *row)
+
+
+@gzip_page
+@api_view(quiz_compact_etag)
+def quiz_compact(request, quiz_id):
+    """One page of a quiz in the compact wire format (see core.quiz_wire)"""
+    row = _quiz_access(request, quiz_id)
+    if row is None:
+        return _error("Quiz not found.", 404)
+    updated_at, educator_id, is_enrolled = row
+    if not is_enrolled and educator_id != request.user.pk:
+        return _error("You must be enrolled to take this quiz.", 403)
+
+    # Pages are cached already serialized
+    pages = _cached_document('quiz-compact', quiz_id, updated_at, lambda: [
+        quiz_wire.dumps(page) for page in quiz_wire.build_quiz_pages(quiz_id)
+    ])
+    try:
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        page = 0
+    if not 1 <= page <= len(pages):
+        return _error("Page not found.", 404)
+    return HttpResponse(pages[page - 1], content_type='application/json')
+
+
+@api_login_required
+@require_POST
+def quiz_submit(request, quiz_id):
+    """Grade a compact quiz submission, {"a": [question id, answer id, ...]}"""
+    quiz = Quiz.objects.filter(
+        pk=quiz_id, lesson__module__course__deleted_at__isnull=True,
+    ).select_related('lesson__module__course').first()
+    if quiz is None:
+        return _error("Quiz not found.", 404)
+    course = quiz.lesson.module.course
+    is_educator = (course.educator_id == request.user.pk)
+    if not is_educator and not course.enrollments.filter(student=request.user).exists():
+        return _error("You must be enrolled to take this quiz.", 403)
+
+    try:
+        selected = quiz_wire.parse_submission(json.loads(request.body))
+    except ValueError as e:
+        return _error(str(e), 400)
+
+    percentage, passed = grade_quiz(quiz, selected)
+    # Educators can try their own quizzes without recording a submission
+    if not is_educator:
+        record_quiz_submission(request.user, quiz, percentage, passed)
+    return JsonResponse({'score': round(percentage, 1), 'passed': passed})
+
+
+# Progress
+
+def my_progress_etag(request):
+    enrollments = Enrollment.objects.filter(student=request.user, course__deleted_at__isnull=True).aggregate(
+        count=Count('id'), progress=Sum('progress'), latest=Max('course__updated_at'),
+    )
+    completions = LessonCompletion.objects.filter(student=request.user).aggregate(
+        count=Count('id'), latest=Max('completed_at'),
+    )
+    return api_etag(request.user.pk, 'progress', *enrollments.values(), *completions.values())
+
+
+@api_view(my_progress_etag)
+def my_progress(request):
+    """The signed-in user's enrollments and completed lessons"""
+    enrollments = Enrollment.objects.filter(student=request.user, course__deleted_at__isnull=True).values(
+        'course_id', 'course__title', 'enrolled_at', 'progress', 'completed',
+    )
+    completions = LessonCompletion.objects.filter(student=request.user).order_by(
+        'lesson__module__course_id', 'completed_at',
+    ).values_list('lesson__module__course_id', 'lesson_id', 'completed_at')
+    completed_by_course = {
+        course_id: [{'lesson': lesson_id, 'completed_at': completed_at} for _, lesson_id, completed_at in group]
+        for course_id, group in groupby(completions, key=lambda row: row[0])
+    }
+    return JsonResponse({
+        'version': API_VERSION,
+        'enrollments': [
+            {
+                'course': enrollment['course_id'],
+                'title': enrollment['course__title'],
+                'enrolled_at': enrollment['enrolled_at'],
+                'progress': enrollment['progress'],
+                'completed': enrollment['completed'],
+                'completed_lessons': completed_by_course.get(enrollment['course_id'], []),
+            }
+            for enrollment in enrollments
+        ],
+    })
@@ -0,0 +1,14 @@
+from django.urls import path
+from . import api
+
+app_name = 'api'
+
+urlpatterns = [
+    path('courses/', api.course_catalog, name='course_catalog'),
+    path('courses/<int:course_id>/', api.course_outline, name='course_outline'),
+    path('lessons/<int:lesson_id>/', api.lesson_content, name='lesson_content'),
+    path('quizzes/<int:quiz_id>/', api.quiz_questions, name='quiz_questions'),
+    path('quizzes/<int:quiz_id>/compact/', api.quiz_compact, name='quiz_compact'),
+    path('quizzes/<int:quiz_id>/submit/', api.quiz_submit, name='quiz_submit'),
+    path('me/progress/', api.my_progress, name='my_progress'),
+]
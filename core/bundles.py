@@ -0,0 +1,274 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import Course, Lesson
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_DIR = 'offline_bundles'
+
+# Superseded archives are kept this long (seconds) for downloads in flight
+DEFAULT_PRUNE_GRACE = 60 * 60
+
+# Static files every offline course viewer needs
+DEFAULT_BUNDLE_ASSETS = [
+    'css/style.css',
+    'images/eduaccess_logo.svg',
+]
+
+# Already-compressed formats are stored as-is rather than deflated again
+STORED_EXTENSIONS = {'.pdf', '.png', '.jpg', '.jpeg', '.gif', '.webp', '.zip'}
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def course_version(course):
+    """Bundle version of a course, derived from its updated_at version stamp"""
+    return course.updated_at.strftime('%Y%m%d%H%M%S%f')
+
+
+def bundles_dir():
+    # Outside MEDIA_ROOT: bundles are only served by the enrollment-checked view
+    return Path(getattr(settings, 'OFFLINE_BUNDLE_ROOT', Path(settings.BASE_DIR) / BUNDLE_DIR))
+
+
+def bundle_root(course_id):
+    return bundles_dir() / str(course_id)
+
+
+def remove_legacy_bundles():
+    """
+    Delete bundles built under MEDIA_ROOT by earlier versions, where the
+    media URLs exposed them. Returns True if there were any.
+    """
+    legacy = Path(settings.MEDIA_ROOT) / BUNDLE_DIR
+    if not legacy.is_dir() or legacy.resolve() == bundles_dir().resolve():
+        return False
+    shutil.rmtree(legacy, ignore_errors=True)
+    return True
+
+
+def manifest_path(course_id, version):
+    return bundle_root(course_id) / f'{version}.json'
+
+
+def archive_path(course_id, version, since=None):
+    name = f'{version}-since-{since}.zip' if since else f'{version}.zip'
+    return bundle_root(course_id) / name
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _lesson_document(lesson, pdf_path):
+    return {
+        'id': lesson.id,
+        'module': {'id': lesson.module_id, 'title': lesson.module.title, 'order': lesson.module.order},
+        'title': lesson.title,
+        'content_type': lesson.content_type,
+        'order': lesson.order,
+        'duration_minutes': lesson.duration_minutes,
+        'text_content': lesson.text_content,
+        'video_url': lesson.video_url,
+        'video_embed_url': lesson.video_embed_url if lesson.video_url else '',
+        'pdf': pdf_path,
+    }
+
+
+def collect_course_objects(course):
+    """
+    Return ({logical_path: sha256}, {sha256: source}) for a course bundle.
+
+    Sources are either bytes (generated JSON documents) or filesystem paths
+    (PDFs, thumbnails, static assets). Identical content shared by several
+    paths is stored once.
+    """
+    files, objects = {}, {}
+
+    def add_bytes(path, data):
+        sha = hashlib.sha256(data).hexdigest()
+        files[path] = sha
+        objects.setdefault(sha, data)
+
+    def add_file(path, source):
+        sha = _hash_file(source)
+        files[path] = sha
+        objects.setdefault(sha, Path(source))
+
+    lessons = Lesson.objects.filter(module__course=course).select_related('module').order_by(
+        'module__order', 'module_id', 'order', 'id'
+    )
+    outline = []
+    for lesson in lessons:
+        pdf_path = None
+        if lesson.pdf_file and os.path.exists(lesson.pdf_file.path):
+            pdf_path = f'pdfs/{lesson.id}/{os.path.basename(lesson.pdf_file.name)}'
+            add_file(pdf_path, lesson.pdf_file.path)
+        lesson_path = f'lessons/{lesson.id}.json'
+        add_bytes(lesson_path, json.dumps(_lesson_document(lesson, pdf_path), sort_keys=True).encode())
+        outline.append(lesson_path)
+
+    thumbnail_path = None
+    if course.thumbnail and os.path.exists(course.thumbnail.path):
+        thumbnail_path = f'thumbnail/{os.path.basename(course.thumbnail.name)}'
+        add_file(thumbnail_path, course.thumbnail.path)
+
+    for asset in getattr(settings, 'OFFLINE_BUNDLE_ASSETS', DEFAULT_BUNDLE_ASSETS):
+        source = finders.find(asset)
+        if source:
+            add_file(f'assets/{asset}', source)
+
+    add_bytes('course.json', json.dumps({
+        'id': course.id,
+        'title': course.title,
+        'description': course.description,
+        'category': course.category,
+        'level': course.level,
+        'thumbnail': thumbnail_path,
+        'lessons': outline,
+    }, sort_keys=True).encode())
+    return files, objects
+
+
+def _write_archive(path, manifest, objects):
+    """Write manifest + content-addressed objects to a zip, atomically"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f, zipfile.ZipFile(f, 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr('manifest.json', json.dumps(manifest, indent=2, sort_keys=True))
+            for sha, source in objects.items():
+                name = f'objects/{sha}'
+                if isinstance(source, bytes):
+                    archive.writestr(name, source)
+                else:
+                    compress = (
+                        zipfile.ZIP_STORED if source.suffix.lower() in STORED_EXTENSIONS
+                        else zipfile.ZIP_DEFLATED
+                    )
+                    archive.write(source, name, compress_type=compress)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def build_bundle(course, since=None):
+    """
+    Build the offline bundle for the course's current version.
+
+    With `since`, builds a delta holding only objects that are new relative
+    to that earlier version's manifest; the manifest still lists every file
+    so clients can drop the paths listed in 'removed'. Returns the archive
+    path. Unknown `since` versions produce a full bundle instead.
+    """
+    version = course_version(course)
+    files, objects = collect_course_objects(course)
+
+    manifest = {
+        'course': course.id,
+        'version': version,
+        'base_version': None,
+        'generated_at': timezone.now().isoformat(),
+        'files': files,
+    }
+    # Full manifests are kept so later deltas can be computed against them
+    root = bundle_root(course.id)
+    root.mkdir(parents=True, exist_ok=True)
+    manifest_path(course.id, version).write_text(json.dumps(manifest, sort_keys=True))
+
+    base = None
+    if since and since != version and manifest_path(course.id, since).exists():
+        base = json.loads(manifest_path(course.id, since).read_text())
+
+    if base is not None:
+        known = set(base['files'].values())
+        objects = {sha: source for sha, source in objects.items() if sha not in known}
+        manifest['base_version'] = since
+        manifest['removed'] = sorted(set(base['files']) - set(files))
+    manifest['objects'] = sorted(objects)
+
+    path = archive_path(course.id, version, since if base is not None else None)
+    _write_archive(path, manifest, objects)
+    if base is None:
+        prune_old_archives(course.id, version)
+    return path
+
+
+def prune_old_archives(course_id, current_version, grace=None):
+    """
+    Delete archives of superseded versions; manifests are kept for deltas.
+
+    Archives written less than `grace` seconds ago (OFFLINE_BUNDLE_PRUNE_GRACE)
+    are kept, so a download that looked its archive up just before the new
+    version was built can still open it.
+    """
+    if grace is None:
+        grace = getattr(settings, 'OFFLINE_BUNDLE_PRUNE_GRACE', DEFAULT_PRUNE_GRACE)
+    cutoff = time.time() - grace
+    for path in bundle_root(course_id).glob('*.zip'):
+        if path.name.startswith(current_version):
+            continue
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def get_or_schedule_bundle(course, since=None):
+    """
+    Return the path of a ready bundle, or None after scheduling its build.
+
+    Builds run in a background thread; a cache lock keeps concurrent
+    requests from building the same bundle twice.
+    """
+    version = course_version(course)
+    # `since` comes from the client and ends up in a file name
+    if since and (not since.isdigit() or not manifest_path(course.id, since).exists()):
+        since = None
+    if since == version:
+        since = None
+    path = archive_path(course.id, version, since)
+    if path.exists():
+        return path
+
+    lock_key = f'offline-bundle:{course.id}:{version}:{since}'
+    if cache.add(lock_key, True, timeout=600):
+        threading.Thread(
+            target=_build_in_background,
+            args=(course.id, since, lock_key),
+            name=f'offline-bundle-{course.id}',
+            daemon=True,
+        ).start()
+    return None
+
+
+def _build_in_background(course_id, since, lock_key):
+    try:
+        course = Course.objects.get(pk=course_id)
+        build_bundle(course, since)
+    except Exception:
+        logger.exception("Failed to build offline bundle for course %s", course_id)
+    finally:
+        cache.delete(lock_key)
+        close_old_connections()
@@ -0,0 +1,71 @@
+from django.db import transaction
+
+from .models import Answer, Course, CourseModule, Lesson, Question, Quiz
+from .storage import refresh_references
+
+CLONE_BATCH_SIZE = 1000
+
+
+def _copy_level(model, rows, parent_field, parent_map, batch_size):
+    """
+    Bulk-insert copies of `rows` (dicts from values()) under their new parents.
+
+    Returns {old id: new id}. Relies on bulk_create setting primary keys,
+    which SQLite and PostgreSQL both do.
+    """
+    old_ids, copies = [], []
+    for row in rows:
+        old_ids.append(row.pop('id'))
+        row[parent_field] = parent_map[row[parent_field]]
+        copies.append(model(**row))
+    model.objects.bulk_create(copies, batch_size=batch_size)
+    return {old_id: copy.pk for old_id, copy in zip(old_ids, copies)}
+
+
+def _values(model, **filters):
+    """All concrete fields of the matching rows, as dicts keyed by attname"""
+    fields = [field.attname for field in model._meta.concrete_fields]
+    return list(model.objects.filter(**filters).order_by('pk').values(*fields))
+
+
+@transaction.atomic
+def clone_course(course, educator=None, title=None, batch_size=CLONE_BATCH_SIZE):
+    """
+    Deep-copy a course with its modules, lessons, quizzes, questions and answers.
+
+    Copies are made one level at a time: each level is read with a single
+    query and written with bulk_create, and old ids are mapped to the new
+    ones for the next level. The number of queries depends only on the
+    number of batches. The copy is unpublished and has no enrollments.
+    Uploaded files (thumbnail, lesson PDFs) are shared by reference, not
+    duplicated; their reference counts are updated.
+    """
+    new_course = Course.objects.create(
+        title=title or f"{course.title} (Copy)",
+        description=course.description,
+        educator=educator or course.educator,
+        is_published=False,
+        thumbnail=course.thumbnail.name if course.thumbnail else None,
+        category=course.category,
+        level=course.level,
+    )
+
+    module_map = _copy_level(
+        CourseModule, _values(CourseModule, course=course), 'course_id', {course.pk: new_course.pk}, batch_size,
+    )
+    lessons = _values(Lesson, module__course=course)
+    # bulk_create sends no signals, so shared PDFs are recounted here
+    pdf_files = {lesson['pdf_file'] for lesson in lessons}
+    lesson_map = _copy_level(Lesson, lessons, 'module_id', module_map, batch_size)
+    refresh_references(pdf_files)
+    quiz_map = _copy_level(
+        Quiz, _values(Quiz, lesson__module__course=course), 'lesson_id', lesson_map, batch_size,
+    )
+    question_map = _copy_level(
+        Question, _values(Question, quiz__lesson__module__course=course), 'quiz_id', quiz_map, batch_size,
+    )
+    _copy_level(
+        Answer, _values(Answer, question__quiz__lesson__module__course=course), 'question_id', question_map,
+        batch_size,
+    )
+    return new_course
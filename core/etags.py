@@ -0,0 +1,68 @@
+import hashlib
+
+from django.contrib import messages
+from django.db.models import Exists, OuterRef, Subquery
+
+from .models import Course, Enrollment, Lesson, LessonCompletion, Quiz, QuizSubmission
+
+
+def make_etag(request, *parts):
+    """
+    Hash a page's version parts together with the viewer's identity.
+
+    Returns None (always render) when flash messages are waiting, since they
+    are part of the page and a 304 would leave them undisplayed. The CSRF
+    secret is included so a cached page never carries a stale CSRF token.
+    """
+    if len(messages.get_messages(request)):
+        return None
+    raw = ':'.join(str(part) for part in (
+        *parts,
+        request.user.pk,
+        request.META.get('CSRF_COOKIE', ''),
+    ))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def course_detail_etag(request, course_id):
+    enrollment = Enrollment.objects.filter(student=request.user, course=OuterRef('pk'))
+    row = Course.objects.filter(pk=course_id, is_published=True).annotate(
+        is_enrolled=Exists(enrollment),
+        # The "continue" link follows the resume pointer
+        next_lesson_id=Subquery(enrollment.values('next_lesson_id')[:1]),
+    ).values_list(
+        'updated_at', 'educator__first_name', 'educator__last_name', 'is_enrolled', 'next_lesson_id',
+    ).first()
+    if row is None:
+        return None
+    return make_etag(request, 'course', course_id, *row)
+
+
+def lesson_detail_etag(request, lesson_id):
+    row = Lesson.objects.filter(pk=lesson_id, module__course__deleted_at__isnull=True).annotate(
+        is_enrolled=Exists(Enrollment.objects.filter(
+            student=request.user, course=OuterRef('module__course'),
+        )),
+        is_completed=Exists(LessonCompletion.objects.filter(
+            student=request.user, lesson=OuterRef('pk'),
+        )),
+    ).values_list(
+        'module__course__updated_at', 'module__course__educator_id', 'is_enrolled', 'is_completed',
+    ).first()
+    if row is None:
+        return None
+    return make_etag(request, 'lesson', lesson_id, *row)
+
+
+def quiz_detail_etag(request, quiz_id):
+    latest_submission = QuizSubmission.objects.filter(
+        student=request.user, quiz=OuterRef('pk'),
+    ).order_by('-submitted_at').values('id')[:1]
+    row = Quiz.objects.filter(pk=quiz_id, lesson__module__course__deleted_at__isnull=True).annotate(
+        last_submission_id=Subquery(latest_submission),
+    ).values_list(
+        'lesson__module__course__updated_at', 'lesson__module__course__educator_id', 'last_submission_id',
+    ).first()
+    if row is None:
+        return None
+    return make_etag(request, 'quiz', quiz_id, *row)
@@ -1,5 +1,15 @@
 from django import forms
-from .models import Course, CourseModule, Lesson, Quiz, Question, Answer
+from .models import Course, CourseModule, Lesson, MediaUpload, Quiz, Question, Answer
+
+
+def position_field():
+    """Where to insert a new module, lesson or question; stored as a gap-based order key"""
+    return forms.IntegerField(
+        required=False,
+        min_value=1,
+        help_text="Position in the list. Leave blank to add it at the end.",
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Last'}),
+    )
 
 class CourseForm(forms.ModelForm):
     class Meta:
@@ -16,20 +26,29 @@ class CourseForm(forms.ModelForm):
 
 
 class ModuleForm(forms.ModelForm):
+    position = position_field()
+
     class Meta:
         model = CourseModule
-        fields = ['title', 'description', 'order']
+        fields = ['title', 'description']
         widgets = {
             'title': forms.TextInput(attrs={'class': 'form-control'}),
             'description': forms.Textarea(attrs={'class': 'form-control', 'rows': 2}),
-            'order': forms.NumberInput(attrs={'class': 'form-control'}),
         }
 
 
 class LessonForm(forms.ModelForm):
+    position = position_field()
+    # Set by the resumable uploader in place of pdf_file
+    media_upload = forms.ModelChoiceField(
+        queryset=MediaUpload.objects.none(),
+        required=False,
+        widget=forms.HiddenInput,
+    )
+
     class Meta:
         model = Lesson
-        fields = ['title', 'content_type', 'video_url', 'pdf_file', 'text_content', 'duration_minutes', 'order']
+        fields = ['title', 'content_type', 'video_url', 'pdf_file', 'text_content', 'duration_minutes']
         widgets = {
             'title': forms.TextInput(attrs={'class': 'form-control'}),
             'content_type': forms.Select(attrs={'class': 'form-select'}),
@@ -37,9 +56,15 @@ class LessonForm(forms.ModelForm):
             'pdf_file': forms.FileInput(attrs={'class': 'form-control'}),
             'text_content': forms.Textarea(attrs={'class': 'form-control', 'rows': 4}),
             'duration_minutes': forms.NumberInput(attrs={'class': 'form-control'}),
-            'order': forms.NumberInput(attrs={'class': 'form-control'}),
         }
 
+    def __init__(self, *args, owner=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if owner is not None:
+            self.fields['media_upload'].queryset = MediaUpload.objects.filter(
+                owner=owner, completed_at__isnull=False,
+            )
+
 
 class QuizForm(forms.ModelForm):
     class Meta:
@@ -53,14 +78,15 @@ class QuizForm(forms.ModelForm):
 
 
 class QuestionForm(forms.ModelForm):
+    position = position_field()
+
     class Meta:
         model = Question
-        fields = ['question_text', 'question_type', 'points', 'order']
+        fields = ['question_text', 'question_type', 'points']
         widgets = {
             'question_text': forms.Textarea(attrs={'class': 'form-control', 'rows': 2}),
             'question_type': forms.HiddenInput(),
             'points': forms.NumberInput(attrs={'class': 'form-control'}),
-            'order': forms.NumberInput(attrs={'class': 'form-control'}),
         }
     
     def __init__(self, *args, **kwargs):
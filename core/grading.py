@@ -0,0 +1,46 @@
+from .models import Answer, Question
+
+
+def grade_quiz(quiz, selected):
+    """
+    Score a quiz attempt.
+
+    `selected` maps question ids to the chosen answer id, as sent by the
+    HTML form or the compact quiz format. Only multiple-choice questions
+    are auto-graded; other questions still count towards the total points.
+    Ids of questions outside the quiz are ignored, and only the first answer
+    to each question counts however its id is spelled, so the score never
+    exceeds 100.
+    Returns (percentage, passed).
+    """
+    points = dict(Question.objects.filter(quiz=quiz).values_list('id', 'points'))
+    correct = set(
+        Answer.objects.filter(
+            question__quiz=quiz,
+            question__question_type='multiple_choice',
+            is_correct=True,
+        ).values_list('question_id', 'id')
+    )
+
+    answers = {}
+    for question_id, answer_id in selected.items():
+        try:
+            question_id = int(question_id)
+        except (TypeError, ValueError):
+            continue
+        if question_id in points:
+            answers.setdefault(question_id, answer_id)
+
+    score = 0
+    for question_id, answer_id in answers.items():
+        try:
+            choice = (question_id, int(answer_id))
+        except (TypeError, ValueError):
+            # Free-text answers and malformed ids never score
+            continue
+        if choice in correct:
+            score += points[question_id]
+
+    total_points = sum(points.values())
+    percentage = min(100, (score / total_points) * 100) if total_points > 0 else 0
+    return percentage, percentage >= quiz.passing_score
@@ -0,0 +1,74 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from accounts.models import User
+from core.models import Course, Lesson, Quiz
+
+
+class Command(BaseCommand):
+    help = "Compare payload size and latency of the JSON API against the equivalent HTML pages"
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help="Account to make the requests as")
+        parser.add_argument('course_id', type=int, help="Course to fetch the outline, a lesson and a quiz of")
+        parser.add_argument('--requests', type=int, default=50, help="Requests per page")
+        parser.add_argument('--host', default='localhost', help="Host header; must be in ALLOWED_HOSTS")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options['email'])
+            course = Course.objects.get(pk=options['course_id'])
+        except (User.DoesNotExist, Course.DoesNotExist) as e:
+            raise CommandError(str(e))
+        lesson = Lesson.objects.filter(module__course=course).first()
+        quiz = Quiz.objects.filter(lesson__module__course=course).first()
+
+        client = Client(HTTP_HOST=options['host'])
+        client.force_login(user)
+
+        # The dashboard is where the HTML site lists both the catalog and progress
+        pages = [
+            ('catalog', reverse('core:dashboard'), reverse('api:course_catalog')),
+            ('course outline', reverse('core:course_detail', args=[course.id]),
+             reverse('api:course_outline', args=[course.id])),
+            ('progress', reverse('core:dashboard'), reverse('api:my_progress')),
+        ]
+        if lesson:
+            pages.append(('lesson', reverse('core:lesson_detail', args=[lesson.id]),
+                          reverse('api:lesson_content', args=[lesson.id])))
+        if quiz:
+            pages.append(('quiz', reverse('core:quiz_detail', args=[quiz.id]),
+                          reverse('api:quiz_questions', args=[quiz.id])))
+
+        self.stdout.write(
+            f"{'page':<16}{'HTML bytes':>12}{'JSON bytes':>12}{'HTML ms':>10}{'JSON ms':>10}{'JSON 304 ms':>13}"
+        )
+        for name, html_url, json_url in pages:
+            html_size, html_ms = self._measure(client, html_url, options['requests'])
+            json_size, json_ms = self._measure(client, json_url, options['requests'])
+            _, revalidate_ms = self._measure(client, json_url, options['requests'], revalidate=True)
+            self.stdout.write(
+                f"{name:<16}{html_size:>12}{json_size:>12}{html_ms:>10.2f}{json_ms:>10.2f}{revalidate_ms:>13.2f}"
+            )
+
+    def _measure(self, client, url, count, revalidate=False):
+        """Return (body size, median milliseconds) for `count` GETs of `url`"""
+        headers = {}
+        if revalidate:
+            etag = client.get(url).headers.get('ETag')
+            if etag:
+                headers['If-None-Match'] = etag
+        size, timings = 0, []
+        for _ in range(count):
+            start = time.perf_counter()
+            response = client.get(url, headers=headers)
+            body = b''.join(response.streaming_content) if response.streaming else response.content
+            timings.append((time.perf_counter() - start) * 1000)
+            if response.status_code not in (200, 304):
+                raise CommandError(f"GET {url} returned {response.status_code}")
+            size = len(body)
+        return size, statistics.median(timings)
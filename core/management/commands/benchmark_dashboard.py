@@ -0,0 +1,59 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import User
+
+
+class Command(BaseCommand):
+    help = "Measure dashboard and course page render times with and without cached course fragments"
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help="Account to render the pages for")
+        parser.add_argument('--course', type=int, help="Also measure this course's detail page")
+        parser.add_argument('--requests', type=int, default=30, help="Requests per page")
+        parser.add_argument('--host', default='localhost', help="Host header; must be in ALLOWED_HOSTS")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options['email'])
+        except User.DoesNotExist as e:
+            raise CommandError(str(e))
+        pages = [('dashboard', reverse('core:dashboard'))]
+        if options['course']:
+            pages.append(('course detail', reverse('core:course_detail', args=[options['course']])))
+
+        # {% cache %} uses the 'template_fragments' cache when there is one
+        fragment_caches = [
+            ('uncached', 'django.core.cache.backends.dummy.DummyCache'),
+            ('cached', 'django.core.cache.backends.locmem.LocMemCache'),
+        ]
+        self.stdout.write(f"{'page':<16}{'fragments':<11}{'median ms':>10}{'p95 ms':>9}{'queries':>9}")
+        for name, url in pages:
+            for label, backend in fragment_caches:
+                caches = {**settings.CACHES, 'template_fragments': {'BACKEND': backend, 'LOCATION': 'benchmark'}}
+                with override_settings(CACHES=caches):
+                    client = Client(HTTP_HOST=options['host'])
+                    client.force_login(user)
+                    median, p95, queries = self._measure(client, url, options['requests'])
+                self.stdout.write(f"{name:<16}{label:<11}{median:>10.2f}{p95:>9.2f}{queries:>9}")
+
+    def _measure(self, client, url, count):
+        """Return (median ms, p95 ms, queries per request) for `count` GETs after a warm-up"""
+        client.get(url)
+        timings = []
+        for _ in range(count):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                raise CommandError(f"GET {url} returned {response.status_code}")
+        timings.sort()
+        return statistics.median(timings), timings[int(len(timings) * 0.95) - 1], len(queries)
@@ -0,0 +1,77 @@
+import gzip
+import json
+import statistics
+import time
+from html.parser import HTMLParser
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from accounts.models import User
+from core.models import Quiz
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare payload size, server time and client parse time of a quiz served "
+        "as HTML, as v1 JSON and in the compact wire format"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help="Account to make the requests as")
+        parser.add_argument('quiz_id', type=int)
+        parser.add_argument('--requests', type=int, default=20, help="Repetitions per measurement")
+        parser.add_argument('--host', default='localhost', help="Host header; must be in ALLOWED_HOSTS")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options['email'])
+            quiz = Quiz.objects.get(pk=options['quiz_id'])
+        except (User.DoesNotExist, Quiz.DoesNotExist) as e:
+            raise CommandError(str(e))
+
+        self.client = Client(HTTP_HOST=options['host'])
+        self.client.force_login(user)
+        self.count = options['requests']
+
+        html_url = reverse('core:quiz_detail', args=[quiz.id])
+        json_url = reverse('api:quiz_questions', args=[quiz.id])
+        compact_url = reverse('api:quiz_compact', args=[quiz.id])
+
+        compact_first = json.loads(self._fetch(compact_url))
+        compact_urls = [f'{compact_url}?page={page}' for page in range(1, compact_first['n'] + 1)]
+
+        formats = [
+            ('HTML', [html_url], self._parse_html),
+            ('JSON v1', [json_url], json.loads),
+            (f"compact ({len(compact_urls)} pages)", compact_urls, json.loads),
+        ]
+        self.stdout.write(f"{'format':<22}{'bytes':>10}{'gzip bytes':>12}{'server ms':>11}{'parse ms':>10}")
+        for name, urls, parse in formats:
+            bodies = [self._fetch(url) for url in urls]
+            size = sum(len(body) for body in bodies)
+            gzip_size = sum(len(gzip.compress(body)) for body in bodies)
+            server_ms = sum(self._median(lambda: self._fetch(url)) for url in urls)
+            parse_ms = self._median(lambda: [parse(body.decode()) for body in bodies])
+            self.stdout.write(f"{name:<22}{size:>10}{gzip_size:>12}{server_ms:>11.2f}{parse_ms:>10.3f}")
+
+    def _fetch(self, url):
+        response = self.client.get(url)
+        if response.status_code != 200:
+            raise CommandError(f"GET {url} returned {response.status_code}")
+        return response.content
+
+    def _parse_html(self, text):
+        parser = HTMLParser()
+        parser.feed(text)
+        parser.close()
+
+    def _median(self, func):
+        """Median milliseconds per call of func"""
+        timings = []
+        for _ in range(self.count):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from core.bundles import build_bundle, archive_path, course_version, remove_legacy_bundles
+from core.models import Course
+
+
+class Command(BaseCommand):
+    help = "Build offline bundles for published courses whose content changed since the last build"
+
+    def add_arguments(self, parser):
+        parser.add_argument('course_ids', nargs='*', type=int, help="Only build these courses")
+        parser.add_argument('--force', action='store_true', help="Rebuild even if the bundle is current")
+
+    def handle(self, *args, **options):
+        if remove_legacy_bundles():
+            self.stdout.write("Removed bundles left under MEDIA_ROOT")
+
+        courses = Course.objects.filter(is_published=True)
+        if options['course_ids']:
+            courses = courses.filter(id__in=options['course_ids'])
+
+        built = 0
+        for course in courses.iterator():
+            if not options['force'] and archive_path(course.id, course_version(course)).exists():
+                continue
+            path = build_bundle(course)
+            built += 1
+            self.stdout.write(f"{course.title}: {path.name} ({path.stat().st_size / 1024:.0f} KiB)")
+
+        self.stdout.write(self.style.SUCCESS(f"Built {built} bundle(s)"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.recommendations import update_recommendations
+
+
+class Command(BaseCommand):
+    help = "Fold new enrollments into the co-enrollment index and refresh course recommendations"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Rebuild the index from every enrollment")
+
+    def handle(self, *args, **options):
+        courses = update_recommendations(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(f"Recommendations refreshed for {courses} course(s)"))
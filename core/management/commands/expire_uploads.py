@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from core.uploads import expire_uploads, move_legacy_staging
+
+
+class Command(BaseCommand):
+    help = "Delete unfinished or unattached lesson media uploads and their staging files"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, help="Age after which an untouched upload expires (default: LESSON_UPLOAD_EXPIRY)")
+
+    def handle(self, *args, **options):
+        moved = move_legacy_staging()
+        if moved:
+            self.stdout.write(f"Moved {moved} staging file(s) out of MEDIA_ROOT")
+
+        max_age = timedelta(hours=options['hours']) if options['hours'] is not None else None
+        count = expire_uploads(max_age)
+        self.stdout.write(self.style.SUCCESS(f"{count} upload(s) expired"))
@@ -0,0 +1,73 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import MediaBlob
+from core.signals import touch_course
+from core.storage import REFERENCES, media_storage, refresh_references
+
+
+class Command(BaseCommand):
+    help = "Move existing lesson PDFs and course thumbnails into content-addressed storage, merging duplicates"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-originals', action='store_true', help="Leave the old files in place")
+        parser.add_argument(
+            '--recount', action='store_true',
+            help="Only recount references and delete stored files nothing refers to",
+        )
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            return self.recount()
+
+        known = set(MediaBlob.objects.values_list('name', flat=True))
+        for label, field_name in REFERENCES:
+            model = apps.get_model(label)
+            storage = model._meta.get_field(field_name).storage
+            names = list(
+                model._base_manager.exclude(**{f'{field_name}__isnull': True}).exclude(**{field_name: ''})
+                .values_list(field_name, flat=True).distinct()
+            )
+            moved = merged = missing = saved_bytes = 0
+
+            for name in names:
+                if name in known:
+                    continue
+                if not storage.exists(name):
+                    missing += 1
+                    self.stderr.write(f"Missing file, left as is: {name}")
+                    continue
+                with storage.open(name, 'rb') as f:
+                    # Hashed while it is copied, so each file is read once
+                    new_name = storage.save(name, f)
+                if new_name in known:
+                    merged += 1
+                    saved_bytes += storage.size(new_name)
+                known.add(new_name)
+
+                with transaction.atomic():
+                    model._base_manager.filter(**{field_name: name}).update(**{field_name: new_name})
+                    # Cached outlines, API documents and offline bundles carry file URLs
+                    if model._meta.label == 'core.Lesson':
+                        touch_course(modules__lessons__pdf_file=new_name)
+                    else:
+                        touch_course(thumbnail=new_name)
+                refresh_references([new_name])
+                if not options['keep_originals']:
+                    storage.delete(name)
+                moved += 1
+
+            self.stdout.write(
+                f"{model._meta.verbose_name_plural} {field_name}: {moved} file(s) moved, "
+                f"{merged} duplicate(s) merged ({saved_bytes} bytes saved), {missing} missing"
+            )
+        self.stdout.write(self.style.SUCCESS("Done"))
+
+    def recount(self):
+        names = list(MediaBlob.objects.values_list('name', flat=True))
+        counts = refresh_references(names)
+        unused = [name for name, count in counts.items() if not count]
+        for name in unused:
+            media_storage.delete(name)
+        self.stdout.write(self.style.SUCCESS(f"{len(names)} stored file(s) recounted, {len(unused)} unused deleted"))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Course
+from core.purge import PURGE_BATCH_SIZE, purge_course
+
+
+class Command(BaseCommand):
+    help = "Permanently delete courses that educators have deleted, in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('course_ids', nargs='*', type=int, help="Only purge these courses")
+        parser.add_argument('--batch-size', type=int, default=PURGE_BATCH_SIZE, help="Rows per DELETE statement")
+
+    def handle(self, *args, **options):
+        courses = Course.all_objects.filter(deleted_at__isnull=False)
+        if options['course_ids']:
+            courses = courses.filter(id__in=options['course_ids'])
+
+        course_ids = list(courses.values_list('id', flat=True))
+        for course_id in course_ids:
+            self.stdout.write(f"Purging course {course_id}")
+            totals = purge_course(
+                course_id,
+                batch_size=options['batch_size'],
+                on_progress=lambda step, deleted: self.stdout.write(f"  {step}: {deleted} deleted"),
+            )
+            self.stdout.write(f"  done ({sum(totals.values())} rows)")
+
+        self.stdout.write(self.style.SUCCESS(f"Purged {len(course_ids)} course(s)"))
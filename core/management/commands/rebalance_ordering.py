@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from core.ordering import SIBLINGS, crowded_parents, rebalance
+
+
+class Command(BaseCommand):
+    help = "Respace module, lesson and question order keys whose gaps have run low"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Respace every sibling set, not just crowded ones")
+
+    def handle(self, *args, **options):
+        for model, (parent_field, _) in SIBLINGS.items():
+            if options['all']:
+                parents = set(model.objects.values_list(parent_field, flat=True).distinct())
+            else:
+                parents = crowded_parents(model)
+            updated = sum(rebalance(model, parent_id) for parent_id in parents)
+            self.stdout.write(
+                f"{model._meta.verbose_name_plural}: {len(parents)} list(s) respaced, {updated} row(s) updated"
+            )
+        self.stdout.write(self.style.SUCCESS("Done"))
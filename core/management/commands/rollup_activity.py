@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.rollups import rollup_activity
+
+
+class Command(BaseCommand):
+    help = "Fold new enrollments, lesson completions and quiz submissions into the daily activity rollups"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Rebuild the rollups from every row")
+
+    def handle(self, *args, **options):
+        rows = rollup_activity(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(f"{rows} course-day row(s) updated"))
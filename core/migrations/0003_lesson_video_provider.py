@@ -0,0 +1,34 @@
+# Generated by Django 6.0.1 on 2026-10-19 13:30
+
+from django.db import migrations, models
+
+from core.video import parse_video_url
+
+
+def backfill_video_fields(apps, schema_editor):
+    Lesson = apps.get_model('core', 'Lesson')
+    lessons = list(Lesson.objects.exclude(video_url='').only('id', 'video_url'))
+    for lesson in lessons:
+        lesson.video_provider, lesson.video_id = parse_video_url(lesson.video_url)
+    Lesson.objects.bulk_update(lessons, ['video_provider', 'video_id'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_quizsubmission_lessoncompletion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='video_id',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='video_provider',
+            field=models.CharField(blank=True, choices=[('youtube', 'YouTube'), ('vimeo', 'Vimeo'), ('mp4', 'MP4 file')], max_length=10),
+        ),
+        migrations.RunPython(backfill_video_fields, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0.1 on 2026-10-19 13:34
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_lesson_video_provider'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='lessoncompletion',
+            name='completed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations
+
+ORDER_GAP = 1024
+
+
+def respace(apps, schema_editor):
+    """Spread existing order values ORDER_GAP apart, keeping each list's order"""
+    for model_name, parent_field in [
+        ('CourseModule', 'course_id'),
+        ('Lesson', 'module_id'),
+        ('Question', 'quiz_id'),
+    ]:
+        model = apps.get_model('core', model_name)
+        changed, parent, index = [], None, 0
+        for row in model.objects.order_by(parent_field, 'order', 'pk').only('pk', parent_field, 'order'):
+            if getattr(row, parent_field) != parent:
+                parent, index = getattr(row, parent_field), 0
+            index += 1
+            row.order = index * ORDER_GAP
+            changed.append(row)
+        model.objects.bulk_update(changed, ['order'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_course_deleted_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(respace, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+from itertools import groupby
+
+from django.db import migrations
+
+
+def backfill(apps, schema_editor):
+    """Point existing enrollments past their most recently completed lesson"""
+    Course = apps.get_model('core', 'Course')
+    Enrollment = apps.get_model('core', 'Enrollment')
+    Lesson = apps.get_model('core', 'Lesson')
+    LessonCompletion = apps.get_model('core', 'LessonCompletion')
+
+    for course_id in Course.objects.values_list('pk', flat=True).iterator():
+        lesson_ids = list(
+            Lesson.objects.filter(module__course_id=course_id)
+            .order_by('module__order', 'module_id', 'order', 'pk')
+            .values_list('pk', flat=True)
+        )
+        completions = LessonCompletion.objects.filter(lesson__module__course_id=course_id).order_by(
+            'student_id', 'completed_at',
+        ).values_list('student_id', 'lesson_id', 'completed_at')
+        history = {}
+        for student_id, rows in groupby(completions.iterator(), key=lambda row: row[0]):
+            rows = list(rows)
+            history[student_id] = ({lesson_id for _, lesson_id, _ in rows}, rows[-1][1], rows[-1][2])
+
+        changed = []
+        for enrollment in Enrollment.objects.filter(course_id=course_id).only('pk', 'student_id', 'enrolled_at'):
+            done, last_lesson_id, last_at = history.get(enrollment.student_id, (set(), None, None))
+            start = lesson_ids.index(last_lesson_id) if last_lesson_id in lesson_ids else 0
+            pending = (pk for pk in lesson_ids[start:] + lesson_ids[:start] if pk not in done)
+            enrollment.next_lesson_id = next(pending, None)
+            enrollment.last_activity_at = last_at or enrollment.enrolled_at
+            changed.append(enrollment)
+        Enrollment.objects.bulk_update(changed, ['next_lesson', 'last_activity_at'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_enrollment_resume_pointer'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
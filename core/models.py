@@ -1,5 +1,17 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
+
+from .storage import get_media_storage
+from .video import PROVIDER_CHOICES, embed_url, parse_video_url
+
+
+class VisibleCourseManager(models.Manager):
+    """Courses that have not been deleted"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
 
 class Course(models.Model):
     title = models.CharField(max_length=200)
@@ -12,9 +24,13 @@ class Course(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_published = models.BooleanField(default=False)
+    # Set when an educator deletes the course; core.purge removes it later
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False, db_index=True)
     
     # Course metadata
-    thumbnail = models.ImageField(upload_to='course_thumbnails/', blank=True, null=True)
+    thumbnail = models.ImageField(
+        upload_to='course_thumbnails/', storage=get_media_storage, blank=True, null=True, db_index=True
+    )
     category = models.CharField(max_length=100, blank=True)
     level = models.CharField(
         max_length=20,
@@ -26,6 +42,10 @@ class Course(models.Model):
         default='beginner'
     )
     
+    objects = VisibleCourseManager()
+    # Includes deleted courses that are waiting to be purged
+    all_objects = models.Manager()
+    
     class Meta:
         ordering = ['-created_at']
     
@@ -48,6 +68,16 @@ class Enrollment(models.Model):
     enrolled_at = models.DateTimeField(auto_now_add=True)
     completed = models.BooleanField(default=False)
     progress = models.IntegerField(default=0)  # Percentage 0-100
+    # Resume pointer, kept current by core.progress so "continue" links
+    # need no lookups: the lesson to pick up at (None once all are done)
+    next_lesson = models.ForeignKey(
+        'Lesson',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    last_activity_at = models.DateTimeField(null=True, blank=True)
     
     class Meta:
         unique_together = ['student', 'course']
@@ -69,6 +99,10 @@ class CourseModule(models.Model):
     
     def __str__(self):
         return f"{self.course.title} - {self.title}"
+    
+    def outline_lessons(self):
+        """Lessons for the course outline, with quizzes joined in for their links"""
+        return self.lessons.select_related('quiz')
 
 
 class Lesson(models.Model):
@@ -88,7 +122,13 @@ class Lesson(models.Model):
     # Content fields
     text_content = models.TextField(blank=True)
     video_url = models.URLField(blank=True)
-    pdf_file = models.FileField(upload_to='lesson_pdfs/', blank=True, null=True)
+    pdf_file = models.FileField(
+        upload_to='lesson_pdfs/', storage=get_media_storage, blank=True, null=True, db_index=True
+    )
+    
+    # Parsed from video_url on save so rendering doesn't re-run URL matching
+    video_provider = models.CharField(max_length=10, choices=PROVIDER_CHOICES, blank=True)
+    video_id = models.CharField(max_length=200, blank=True)
     
     duration_minutes = models.IntegerField(default=0, help_text="Estimated duration in minutes")
     
@@ -97,6 +137,17 @@ class Lesson(models.Model):
     
     def __str__(self):
         return f"{self.module.title} - {self.title}"
+    
+    def save(self, *args, **kwargs):
+        self.video_provider, self.video_id = parse_video_url(self.video_url)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'video_url' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'video_provider', 'video_id'}
+        super().save(*args, **kwargs)
+    
+    @property
+    def video_embed_url(self):
+        return embed_url(self.video_provider, self.video_id, self.video_url)
 
 
 class Quiz(models.Model):
@@ -145,7 +196,8 @@ class LessonCompletion(models.Model):
     """Track completion of individual lessons"""
     student = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE)
-    completed_at = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add: offline clients sync completions with their own timestamps
+    completed_at = models.DateTimeField(default=timezone.now)
     
     class Meta:
         unique_together = ['student', 'lesson']
@@ -163,4 +215,115 @@ class QuizSubmission(models.Model):
     submitted_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
-        return f"{self.student} - {self.quiz} ({self.score}%)"
\ No newline at end of file
+        return f"{self.student} - {self.quiz} ({self.score}%)"
+
+class CourseCoEnrollment(models.Model):
+    """
+    Sparse course-by-course co-enrollment matrix: how many students are
+    enrolled in both courses. Stored in both directions. Maintained by
+    core.recommendations.
+    """
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='+')
+    other = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='+')
+    students = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['course', 'other']
+    
+    def __str__(self):
+        return f"{self.course_id} & {self.other_id}: {self.students}"
+
+
+class CourseRecommendation(models.Model):
+    """Precomputed top-K most similar courses for each course"""
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='recommendations')
+    recommended = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='recommended_by')
+    score = models.FloatField()
+    
+    class Meta:
+        unique_together = ['course', 'recommended']
+        ordering = ['course', '-score']
+    
+    def __str__(self):
+        return f"{self.course_id} -> {self.recommended_id} ({self.score:.3f})"
+
+
+class RecommendationState(models.Model):
+    """Single row recording which enrollments the co-enrollment matrix includes"""
+    last_enrollment_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class CourseDailyActivity(models.Model):
+    """
+    Daily per-course totals of enrollments, lesson completions and quiz
+    submissions, for analytics. Maintained by core.rollups.
+    """
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='daily_activity')
+    day = models.DateField()
+    enrollments = models.PositiveIntegerField(default=0)
+    completions = models.PositiveIntegerField(default=0)
+    submissions = models.PositiveIntegerField(default=0)
+    passes = models.PositiveIntegerField(default=0)
+    # Sum rather than mean, so days and weeks can be combined exactly
+    score_total = models.FloatField(default=0)
+    
+    class Meta:
+        unique_together = ['course', 'day']
+        ordering = ['course', 'day']
+        verbose_name_plural = 'course daily activity'
+    
+    def __str__(self):
+        return f"{self.course} on {self.day}"
+    
+    @property
+    def average_score(self):
+        return self.score_total / self.submissions if self.submissions else None
+
+
+class ActivityRollupState(models.Model):
+    """Single row recording which rows the daily activity rollups include"""
+    last_enrollment_id = models.BigIntegerField(default=0)
+    last_completion_id = models.BigIntegerField(default=0)
+    last_submission_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class MediaUpload(models.Model):
+    """
+    A resumable, chunked upload of lesson media. Chunks are written to a
+    staging file until the upload is complete and attached to a lesson.
+    Managed by core.uploads.
+    """
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='media_uploads')
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()  # Declared total size in bytes
+    offset = models.BigIntegerField(default=0)  # Bytes received so far
+    # Checksum the client declared up front (optional) and the one computed on completion
+    expected_sha256 = models.CharField(max_length=64, blank=True)
+    sha256 = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size} bytes)"
+    
+    @property
+    def is_complete(self):
+        return self.completed_at is not None
+
+
+class MediaBlob(models.Model):
+    """
+    A file in content-addressed media storage, with the number of rows that
+    refer to it. Maintained by core.storage.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.BigIntegerField()
+    references = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.name} ({self.references} references)"
@@ -0,0 +1,155 @@
+"""
+Gap-based ordering for modules, lessons and questions.
+
+Siblings get order keys ORDER_GAP apart, so an item can be inserted between
+two others by taking the midpoint of their keys, and only the new row is
+written. When repeated inserts at one spot use up the room between two
+keys, the sibling set is respaced with a single bulk_update. That happens
+in the background once gaps get small, and synchronously if there is no
+room left at all.
+"""
+import logging
+import threading
+
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import Max
+
+from .models import CourseModule, Lesson, Question
+from .signals import touch_course
+
+logger = logging.getLogger(__name__)
+
+ORDER_GAP = 1024
+
+# Once an insert leaves less room than this, the siblings are respaced
+MIN_GAP = 16
+
+# model -> (field holding the parent id, touch_course lookup for that parent)
+SIBLINGS = {
+    CourseModule: ('course_id', 'pk'),
+    Lesson: ('module_id', 'modules__id'),
+    Question: ('quiz_id', 'modules__lessons__quiz__id'),
+}
+
+
+def siblings_of(model, parent_id):
+    parent_field, _ = SIBLINGS[model]
+    return model.objects.filter(**{parent_field: parent_id}).order_by('order', 'pk')
+
+
+def _touch(model, parent_id):
+    # bulk_update sends no signals, but the course version must still move
+    _, course_lookup = SIBLINGS[model]
+    touch_course(**{course_lookup: parent_id})
+
+
+def _key_for_position(model, parent_id, position, exclude_pk=None):
+    """
+    Return (order key, crowded) for an item placed at 1-based `position`
+    (None or past the end: last). The key is None if there is no room.
+    """
+    siblings = siblings_of(model, parent_id)
+    if exclude_pk is not None:
+        siblings = siblings.exclude(pk=exclude_pk)
+
+    if position is not None and position >= 1:
+        start = max(position - 2, 0)
+        neighbours = list(siblings.values_list('order', flat=True)[start:position])
+        if position == 1:
+            if neighbours:
+                return neighbours[0] - ORDER_GAP, False
+            return ORDER_GAP, False
+        if len(neighbours) == 2:
+            before, after = neighbours
+            if after - before < 2:
+                return None, True
+            key = (before + after) // 2
+            return key, min(key - before, after - key) < MIN_GAP
+
+    last = siblings.aggregate(last=Max('order'))['last']
+    return (last or 0) + ORDER_GAP, False
+
+
+def insert_at(instance, position=None):
+    """
+    Save a new or moved module, lesson or question at 1-based `position`
+    among its siblings (None: at the end). Only `instance` is written,
+    unless its neighbours' keys have no room left between them.
+    """
+    model = type(instance)
+    parent_id = getattr(instance, SIBLINGS[model][0])
+    key, crowded = _key_for_position(model, parent_id, position, exclude_pk=instance.pk)
+    if key is None:
+        rebalance(model, parent_id)
+        key, crowded = _key_for_position(model, parent_id, position, exclude_pk=instance.pk)
+    instance.order = key
+    instance.save()
+    if crowded:
+        # After commit, so the rebalance sees the new row
+        transaction.on_commit(lambda: schedule_rebalance(model, parent_id))
+    return instance
+
+
+def apply_order(model, parent_id, ordered_ids):
+    """
+    Reorder a whole sibling set to match `ordered_ids` with one bulk_update.
+
+    Raises ValueError unless `ordered_ids` lists every sibling exactly once.
+    """
+    rows = list(siblings_of(model, parent_id).only('pk', 'order'))
+    by_pk = {row.pk: row for row in rows}
+    if len(ordered_ids) != len(by_pk) or set(ordered_ids) != set(by_pk):
+        raise ValueError("The new order must list every item exactly once.")
+
+    changed = []
+    for index, pk in enumerate(ordered_ids, start=1):
+        row = by_pk[pk]
+        if row.order != index * ORDER_GAP:
+            row.order = index * ORDER_GAP
+            changed.append(row)
+    if changed:
+        model.objects.bulk_update(changed, ['order'])
+        _touch(model, parent_id)
+    return len(changed)
+
+
+def rebalance(model, parent_id):
+    """Respace a sibling set ORDER_GAP apart, keeping its current order"""
+    ordered_ids = list(siblings_of(model, parent_id).values_list('pk', flat=True))
+    return apply_order(model, parent_id, ordered_ids)
+
+
+def schedule_rebalance(model, parent_id):
+    """Rebalance a sibling set in a background thread"""
+    lock_key = f'ordering-rebalance:{model._meta.label_lower}:{parent_id}'
+    if not cache.add(lock_key, True, timeout=300):
+        return
+    threading.Thread(
+        target=_rebalance_in_background,
+        args=(model, parent_id, lock_key),
+        name=f'ordering-rebalance-{parent_id}',
+        daemon=True,
+    ).start()
+
+
+def _rebalance_in_background(model, parent_id, lock_key):
+    try:
+        rebalance(model, parent_id)
+    except Exception:
+        logger.exception("Failed to rebalance %s order under %s", model._meta.label, parent_id)
+    finally:
+        cache.delete(lock_key)
+        close_old_connections()
+
+
+def crowded_parents(model):
+    """Parent ids whose children have keys closer together than MIN_GAP"""
+    parent_field, _ = SIBLINGS[model]
+    crowded, previous = set(), {}
+    rows = model.objects.order_by(parent_field, 'order').values_list(parent_field, 'order')
+    for parent_id, order in rows.iterator():
+        if parent_id in previous and order - previous[parent_id] < MIN_GAP:
+            crowded.add(parent_id)
+        previous = {parent_id: order}
+    return crowded
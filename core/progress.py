@@ -0,0 +1,179 @@
+from datetime import timezone as dt_timezone
+from itertools import groupby
+
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Course, Enrollment, Lesson, LessonCompletion, QuizSubmission
+
+# Largest batch a client may sync in one request
+MAX_SYNC_BATCH = 500
+
+
+def parse_completion_events(events):
+    """
+    Validate a client batch of {'lesson_id': ..., 'completed_at': ...} events.
+
+    Returns ({lesson_id: completed_at}, [rejected events]). Missing or
+    future timestamps become now; a lesson listed twice keeps its earliest
+    timestamp.
+    """
+    now = timezone.now()
+    completions, rejected = {}, []
+    for event in events:
+        try:
+            lesson_id = int(event['lesson_id'])
+            raw = event.get('completed_at')
+            completed_at = parse_datetime(raw) if raw else now
+        except (KeyError, TypeError, ValueError, AttributeError):
+            rejected.append({'event': event, 'error': 'invalid'})
+            continue
+        if completed_at is None:
+            rejected.append({'event': event, 'error': 'invalid'})
+            continue
+        if timezone.is_naive(completed_at):
+            completed_at = timezone.make_aware(completed_at, dt_timezone.utc)
+        completed_at = min(completed_at, now)
+        if lesson_id not in completions or completed_at < completions[lesson_id]:
+            completions[lesson_id] = completed_at
+    return completions, rejected
+
+
+def resume_lessons(student, anchors):
+    """
+    The lesson to continue with in each course: the first lesson the
+    student has not completed, starting from anchors[course_id] in course
+    order and wrapping around to earlier gaps. None once all are complete.
+    """
+    lessons = Lesson.objects.filter(module__course_id__in=list(anchors)).annotate(
+        done=Exists(LessonCompletion.objects.filter(student=student, lesson=OuterRef('pk'))),
+    ).order_by(
+        'module__course_id', 'module__order', 'module_id', 'order', 'pk',
+    ).values_list('module__course_id', 'id', 'done')
+
+    resume = dict.fromkeys(anchors)
+    for course_id, rows in groupby(lessons, key=lambda row: row[0]):
+        rows = list(rows)
+        ids = [lesson_id for _, lesson_id, _ in rows]
+        start = ids.index(anchors[course_id]) if anchors[course_id] in ids else 0
+        pending = (lesson_id for _, lesson_id, done in rows[start:] + rows[:start] if not done)
+        resume[course_id] = next(pending, None)
+    return resume
+
+
+def refresh_enrollment_progress(student, course_ids, activity=None):
+    """
+    Recompute progress for the student's enrollments in the given courses.
+
+    `activity` maps course ids to (lesson id or None, time) for courses the
+    student just worked in; their resume pointer and last activity time
+    move too.
+
+    Returns {course_id: {'completed_lessons', 'total_lessons', 'progress',
+    'completed'}} for every course the student is enrolled in.
+    """
+    activity = activity or {}
+    # Correlated, so only this student's completions are read, through the
+    # (student, lesson) unique index, however many students the course has
+    completed = LessonCompletion.objects.filter(
+        student=student, lesson__module__course=OuterRef('pk'),
+    ).order_by().values('student').annotate(count=Count('pk')).values('count')
+    courses = Course.objects.filter(
+        id__in=set(course_ids) | set(activity), enrollments__student=student,
+    ).annotate(
+        total_lessons=Count('modules__lessons', distinct=True),
+        completed_lessons=Coalesce(Subquery(completed), 0),
+    ).values_list('id', 'total_lessons', 'completed_lessons')
+
+    summary = {}
+    for course_id, total, done in courses:
+        progress = round(100 * done / total) if total else 0
+        summary[course_id] = {
+            'completed_lessons': done,
+            'total_lessons': total,
+            'progress': progress,
+            'completed': bool(total) and done >= total,
+        }
+
+    resume = resume_lessons(student, {
+        course_id: lesson_id for course_id, (lesson_id, _) in activity.items() if course_id in summary
+    }) if activity else {}
+
+    enrollments = list(Enrollment.objects.filter(student=student, course_id__in=summary))
+    changed = []
+    for enrollment in enrollments:
+        course = summary[enrollment.course_id]
+        before = (enrollment.progress, enrollment.completed, enrollment.next_lesson_id, enrollment.last_activity_at)
+        enrollment.progress = course['progress']
+        enrollment.completed = course['completed']
+        if enrollment.course_id in resume:
+            _, at = activity[enrollment.course_id]
+            enrollment.next_lesson_id = resume[enrollment.course_id]
+            enrollment.last_activity_at = max(filter(None, [enrollment.last_activity_at, at]))
+        if before != (enrollment.progress, enrollment.completed, enrollment.next_lesson_id, enrollment.last_activity_at):
+            changed.append(enrollment)
+    if changed:
+        Enrollment.objects.bulk_update(changed, ['progress', 'completed', 'next_lesson', 'last_activity_at'])
+    return summary
+
+
+@transaction.atomic
+def record_completions(student, completions):
+    """
+    Store a batch of lesson completions for a student.
+
+    `completions` maps lesson ids to completion times. Lessons that do not
+    exist or belong to courses the student is not enrolled in are returned
+    as rejected; lessons already completed keep their original timestamp.
+    Returns (accepted lesson ids, rejected lesson ids, progress by course).
+    """
+    lesson_courses = dict(
+        Lesson.objects.filter(
+            id__in=list(completions), module__course__deleted_at__isnull=True,
+        ).values_list('id', 'module__course_id')
+    )
+    # One query checks enrollment for every course in the batch
+    enrolled = set(
+        Enrollment.objects.filter(
+            student=student, course_id__in=set(lesson_courses.values()),
+        ).values_list('course_id', flat=True)
+    )
+    accepted = [
+        lesson_id for lesson_id, course_id in lesson_courses.items() if course_id in enrolled
+    ]
+    rejected = sorted(set(completions) - set(accepted))
+
+    LessonCompletion.objects.bulk_create(
+        [
+            LessonCompletion(student=student, lesson_id=lesson_id, completed_at=completions[lesson_id])
+            for lesson_id in accepted
+        ],
+        ignore_conflicts=True,
+    )
+    # Each course resumes after its most recently completed lesson in the batch
+    activity = {}
+    for lesson_id in sorted(accepted, key=lambda lesson_id: completions[lesson_id]):
+        activity[lesson_courses[lesson_id]] = (lesson_id, completions[lesson_id])
+    progress = refresh_enrollment_progress(student, [], activity=activity)
+    return sorted(accepted), rejected, progress
+
+
+@transaction.atomic
+def record_quiz_submission(student, quiz, score, passed):
+    """
+    Store a graded quiz attempt and move the student's resume pointer.
+    Passing completes the quiz's lesson, so the student moves past it.
+    """
+    submission = QuizSubmission.objects.create(student=student, quiz=quiz, score=score, passed=passed)
+    if passed:
+        # A lesson completed earlier keeps its original timestamp
+        LessonCompletion.objects.get_or_create(
+            student=student, lesson_id=quiz.lesson_id, defaults={'completed_at': submission.submitted_at},
+        )
+    refresh_enrollment_progress(student, [], activity={
+        quiz.lesson.module.course_id: (quiz.lesson_id, submission.submitted_at),
+    })
+    return submission
@@ -0,0 +1,147 @@
+"""
+Batched purge of soft-deleted courses.
+
+Deleting a course through the ORM makes Django's collector load every
+related row into memory (and fire post_delete signals for each one) before
+the first DELETE runs. Instead, course_delete only stamps deleted_at, which
+hides the course everywhere at once, and the rows are removed here. Child
+tables are deleted leaf-first in batches of ids, each batch in its own
+short transaction. These deletes bypass the collector and signals.
+"""
+import logging
+import shutil
+import threading
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .bundles import bundle_root
+from .models import (
+    Answer, Course, CourseCoEnrollment, CourseDailyActivity, CourseModule, CourseRecommendation,
+    Enrollment, Lesson, LessonCompletion, Question, Quiz, QuizSubmission,
+)
+
+logger = logging.getLogger(__name__)
+
+PURGE_BATCH_SIZE = 1000
+
+# Leaf tables first, so no batch ever deletes a row that is still referenced
+PURGE_STEPS = [
+    (Answer, 'question__quiz__lesson__module__course_id'),
+    (Question, 'quiz__lesson__module__course_id'),
+    (QuizSubmission, 'quiz__lesson__module__course_id'),
+    (Quiz, 'lesson__module__course_id'),
+    (LessonCompletion, 'lesson__module__course_id'),
+    # Enrollment.next_lesson points at the course's lessons
+    (Enrollment, 'course_id'),
+    (Lesson, 'module__course_id'),
+    (CourseModule, 'course_id'),
+    (CourseCoEnrollment, 'course_id'),
+    (CourseCoEnrollment, 'other_id'),
+    (CourseRecommendation, 'course_id'),
+    (CourseRecommendation, 'recommended_id'),
+    (CourseDailyActivity, 'course_id'),
+]
+
+
+def progress_key(course_id):
+    return f'course-purge:{course_id}'
+
+
+def get_purge_progress(course_id):
+    """The last progress reported by a running purge, or None"""
+    return cache.get(progress_key(course_id))
+
+
+def soft_delete_course(course):
+    """Hide a course immediately; its rows are removed by purge_course"""
+    Course.all_objects.filter(pk=course.pk).update(deleted_at=timezone.now(), is_published=False)
+
+
+def _delete_orphaned_files(field_name, model, names):
+    """Delete stored files that no remaining row refers to"""
+    storage = model._meta.get_field(field_name).storage
+    for name in {name for name in names if name}:
+        try:
+            # Content-addressed storage keeps files that are still referenced
+            storage.delete(name)
+        except OSError:
+            logger.warning("Could not delete orphaned file %s", name, exc_info=True)
+
+
+def _purge_step(model, course_lookup, course_id, batch_size, report):
+    queryset = model._base_manager.filter(**{course_lookup: course_id}).order_by('pk')
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        pdf_files = []
+        if model is Lesson:
+            pdf_files = list(model._base_manager.filter(pk__in=ids).values_list('pdf_file', flat=True))
+        with transaction.atomic():
+            batch = model._base_manager.filter(pk__in=ids)
+            count = batch._raw_delete(batch.db)
+        deleted += count
+        _delete_orphaned_files('pdf_file', Lesson, pdf_files)
+        report(model._meta.model_name, count)
+
+
+def purge_course(course_id, batch_size=PURGE_BATCH_SIZE, on_progress=None):
+    """
+    Delete a soft-deleted course and everything under it, in batches.
+
+    Memory use is bounded by `batch_size` ids. Progress is reported to
+    `on_progress(step, deleted_so_far)` and stored in the cache for
+    get_purge_progress. Safe to re-run after an interruption.
+    Returns {model name: rows deleted}.
+    """
+    course = Course.all_objects.filter(pk=course_id, deleted_at__isnull=False).values(
+        'thumbnail',
+    ).first()
+    if course is None:
+        return {}
+
+    # Some models are purged in more than one step (both sides of a pair)
+    totals = Counter()
+
+    def report(step, deleted):
+        totals[step] += deleted
+        cache.set(progress_key(course_id), {'step': step, 'deleted': dict(totals)}, 3600)
+        if on_progress:
+            on_progress(step, totals[step])
+
+    for model, course_lookup in PURGE_STEPS:
+        _purge_step(model, course_lookup, course_id, batch_size, report)
+
+    Course.all_objects.filter(pk=course_id).delete()
+    _delete_orphaned_files('thumbnail', Course, [course['thumbnail']])
+    shutil.rmtree(bundle_root(course_id), ignore_errors=True)
+    report('course', 1)
+    cache.delete(progress_key(course_id))
+    return dict(totals)
+
+
+def schedule_purge(course_id):
+    """Purge a soft-deleted course in a background thread"""
+    lock_key = f'course-purge-lock:{course_id}'
+    if not cache.add(lock_key, True, timeout=3600):
+        return
+    threading.Thread(
+        target=_purge_in_background,
+        args=(course_id, lock_key),
+        name=f'course-purge-{course_id}',
+        daemon=True,
+    ).start()
+
+
+def _purge_in_background(course_id, lock_key):
+    try:
+        purge_course(course_id)
+    except Exception:
+        logger.exception("Failed to purge course %s; `manage.py purge_courses` will retry", course_id)
+    finally:
+        cache.delete(lock_key)
+        close_old_connections()
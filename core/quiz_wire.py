@@ -0,0 +1,106 @@
+"""
+Compact wire format for delivering quizzes to slow clients.
+
+A quiz is split into pages of QUIZ_PAGE_SIZE questions. Each page is a
+JSON object with short keys:
+
+    f   format version (WIRE_FORMAT)
+    p   page number (1-based)
+    n   number of pages
+    h   page 1 only: [quiz id, title, description, passing score, question count]
+    o   index of this page's first string in the quiz's string table
+    s   strings first used on this page, appended to the table client-side
+    q   questions: [id, text index, type code, points, [answer id, text index, ...]]
+
+Question and answer texts are sent once per quiz through the string table,
+so repeated options ("True", "False", "All of the above") cost one index
+each. Submissions reference the same question and answer ids. Documents
+are serialized without whitespace, which also compresses well.
+"""
+import json
+
+from .models import Answer, Question, Quiz
+
+WIRE_FORMAT = 1
+
+QUIZ_PAGE_SIZE = 20
+
+QUESTION_TYPE_CODES = {
+    'multiple_choice': 'm',
+    'true_false': 't',
+    'short_answer': 's',
+}
+
+
+def dumps(document):
+    return json.dumps(document, separators=(',', ':'), ensure_ascii=False)
+
+
+def build_quiz_pages(quiz_id, page_size=QUIZ_PAGE_SIZE):
+    """Return the quiz's compact pages, as a list of dicts"""
+    quiz = Quiz.objects.filter(pk=quiz_id).values_list('id', 'title', 'description', 'passing_score').get()
+    questions = list(
+        Question.objects.filter(quiz_id=quiz_id).values_list('id', 'question_text', 'question_type', 'points')
+    )
+    answers = {}
+    for question_id, answer_id, text in Answer.objects.filter(question__quiz_id=quiz_id).order_by(
+        'question_id', 'id',
+    ).values_list('question_id', 'id', 'answer_text'):
+        answers.setdefault(question_id, []).append((answer_id, text))
+
+    index = {}
+
+    def intern(text, new_strings):
+        if text not in index:
+            index[text] = len(index)
+            new_strings.append(text)
+        return index[text]
+
+    page_count = max(1, -(-len(questions) // page_size))
+    pages = []
+    for number in range(page_count):
+        offset, strings, rows = len(index), [], []
+        for question_id, text, question_type, points in questions[number * page_size:(number + 1) * page_size]:
+            text_index = intern(text, strings)
+            options = []
+            for answer_id, answer_text in answers.get(question_id, []):
+                options += [answer_id, intern(answer_text, strings)]
+            rows.append([
+                question_id,
+                text_index,
+                QUESTION_TYPE_CODES.get(question_type, question_type),
+                points,
+                options,
+            ])
+        page = {'f': WIRE_FORMAT, 'p': number + 1, 'n': page_count, 'o': offset, 's': strings, 'q': rows}
+        if number == 0:
+            page['h'] = [*quiz, len(questions)]
+        pages.append(page)
+    return pages
+
+
+def _wire_id(value):
+    """An id from a submission: an integer, or a string of digits"""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.isascii() and value.isdigit():
+        return int(value)
+    raise ValueError(f"Expected an integer id, got {json.dumps(value)[:40]}.")
+
+
+def parse_submission(data):
+    """
+    Turn a compact submission, {"a": [question id, answer id, ...]}, into
+    {question_id: answer_id} with integer ids. Raises ValueError if it is
+    malformed or answers a question more than once.
+    """
+    pairs = data.get('a') if isinstance(data, dict) else None
+    if not isinstance(pairs, list) or len(pairs) % 2:
+        raise ValueError("Expected 'a' to be a flat list of question and answer id pairs.")
+    selected = {}
+    for question_id, answer_id in zip(pairs[::2], pairs[1::2]):
+        question_id = _wire_id(question_id)
+        if question_id in selected:
+            raise ValueError(f"Question {question_id} is answered more than once.")
+        selected[question_id] = _wire_id(answer_id)
+    return selected
@@ -0,0 +1,183 @@
+"""
+Co-enrollment course recommendations.
+
+A batch job folds enrollments into a sparse course-by-course matrix
+(CourseCoEnrollment), then stores the top RECOMMENDATIONS_PER_COURSE most
+similar courses for every course it touched (CourseRecommendation).
+Similarity is cosine similarity over the course's students:
+co-enrollments / sqrt(students in A * students in B).
+
+Runs are incremental. Only enrollments newer than the watermark in
+RecommendationState are read, and only the courses they touch are
+re-ranked. Scores of untouched courses drift slowly as enrollment counts
+grow. The watermark is the highest enrollment id seen, so an enrollment
+whose transaction commits after a run that already saw a higher id is
+never counted incrementally. Ids are allocated before commit, so two
+concurrent enrollments can land this way. `manage.py build_recommendations
+--full` rebuilds everything and picks up both.
+"""
+import heapq
+import logging
+import math
+import threading
+from collections import Counter
+from itertools import combinations, groupby
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import Count
+
+from .models import Course, CourseCoEnrollment, CourseRecommendation, Enrollment, RecommendationState
+
+logger = logging.getLogger(__name__)
+
+RECOMMENDATIONS_PER_COURSE = 10
+
+# Students whose full course lists are fetched per query
+STUDENT_BATCH_SIZE = 1000
+
+# Courses re-ranked per pass
+RERANK_BATCH_SIZE = 500
+
+
+def _co_enrollment_deltas(since_id):
+    """
+    Count new co-enrollments from enrollments with id > since_id.
+
+    Returns (Counter of (course, other) -> new shared students, highest
+    enrollment id seen). Only pairs involving at least one new enrollment
+    are counted, so pairs from earlier runs aren't counted twice.
+    """
+    deltas = Counter()
+    last_id = since_id
+    new_enrollments = Enrollment.objects.filter(id__gt=since_id).order_by('student_id').values_list(
+        'student_id', 'course_id', 'id',
+    )
+
+    def flush(batch):
+        all_courses = {}
+        for student_id, course_id in Enrollment.objects.filter(
+            student_id__in=list(batch),
+        ).values_list('student_id', 'course_id'):
+            all_courses.setdefault(student_id, set()).add(course_id)
+        for student_id, new_courses in batch.items():
+            for a, b in combinations(sorted(all_courses.get(student_id, ())), 2):
+                if a in new_courses or b in new_courses:
+                    deltas[a, b] += 1
+                    deltas[b, a] += 1
+
+    batch = {}
+    for student_id, rows in groupby(new_enrollments.iterator(chunk_size=STUDENT_BATCH_SIZE), key=lambda r: r[0]):
+        rows = list(rows)
+        batch[student_id] = {course_id for _, course_id, _ in rows}
+        last_id = max(last_id, *(enrollment_id for _, _, enrollment_id in rows))
+        if len(batch) >= STUDENT_BATCH_SIZE:
+            flush(batch)
+            batch = {}
+    if batch:
+        flush(batch)
+    return deltas, last_id
+
+
+def _apply_deltas(deltas):
+    """Add co-enrollment deltas to the stored matrix"""
+    if not deltas:
+        return
+    courses = {course_id for course_id, _ in deltas}
+    current = {
+        (course_id, other_id): students
+        for course_id, other_id, students in CourseCoEnrollment.objects.filter(
+            course_id__in=courses,
+        ).values_list('course_id', 'other_id', 'students')
+    }
+    CourseCoEnrollment.objects.bulk_create(
+        [
+            CourseCoEnrollment(course_id=a, other_id=b, students=current.get((a, b), 0) + delta)
+            for (a, b), delta in deltas.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['course', 'other'],
+        update_fields=['students'],
+        batch_size=1000,
+    )
+
+
+def _rerank(course_ids):
+    """Recompute the stored top-K recommendations of the given courses"""
+    if not course_ids:
+        return
+    # Only published, live courses are worth recommending
+    pairs = list(
+        CourseCoEnrollment.objects.filter(
+            course_id__in=course_ids, students__gt=0,
+            other__is_published=True, other__deleted_at__isnull=True,
+        ).values_list('course_id', 'other_id', 'students')
+    )
+    involved = set(course_ids) | {other_id for _, other_id, _ in pairs}
+    enrolled = dict(
+        Enrollment.objects.filter(course_id__in=involved)
+        .values('course_id').annotate(n=Count('id')).values_list('course_id', 'n')
+    )
+    neighbours = {}
+    for course_id, other_id, students in pairs:
+        score = students / math.sqrt(enrolled.get(course_id, 1) * enrolled.get(other_id, 1))
+        neighbours.setdefault(course_id, []).append((score, other_id))
+
+    limit = getattr(settings, 'RECOMMENDATIONS_PER_COURSE', RECOMMENDATIONS_PER_COURSE)
+    CourseRecommendation.objects.filter(course_id__in=course_ids).delete()
+    CourseRecommendation.objects.bulk_create(
+        [
+            CourseRecommendation(course_id=course_id, recommended_id=other_id, score=score)
+            for course_id, scored in neighbours.items()
+            for score, other_id in heapq.nlargest(limit, scored)
+        ],
+        batch_size=1000,
+    )
+
+
+@transaction.atomic
+def update_recommendations(full=False):
+    """
+    Fold new enrollments into the co-enrollment matrix and re-rank the
+    courses they touch. With `full`, rebuild the matrix from scratch.
+    Returns the number of courses re-ranked.
+    """
+    state, _ = RecommendationState.objects.select_for_update().get_or_create(pk=1)
+    if full:
+        CourseCoEnrollment.objects.all().delete()
+        state.last_enrollment_id = 0
+
+    deltas, last_id = _co_enrollment_deltas(state.last_enrollment_id)
+    _apply_deltas(deltas)
+
+    if full:
+        touched = list(Course.all_objects.values_list('id', flat=True))
+    else:
+        touched = list({course_id for course_id, _ in deltas})
+    for start in range(0, len(touched), RERANK_BATCH_SIZE):
+        _rerank(touched[start:start + RERANK_BATCH_SIZE])
+
+    state.last_enrollment_id = last_id
+    state.save()
+    return len(touched)
+
+
+def schedule_recommendation_update():
+    """
+    Update recommendations in a background thread, at most once per
+    RECOMMENDATION_UPDATE_INTERVAL seconds across processes.
+    """
+    interval = getattr(settings, 'RECOMMENDATION_UPDATE_INTERVAL', 300)
+    if not cache.add('recommendations:update-lock', True, timeout=interval):
+        return
+    threading.Thread(target=_update_in_background, name='recommendations-update', daemon=True).start()
+
+
+def _update_in_background():
+    try:
+        update_recommendations()
+    except Exception:
+        logger.exception("Failed to update course recommendations")
+    finally:
+        close_old_connections()
@@ -0,0 +1,147 @@
+"""
+Daily activity rollups for analytics.
+
+`manage.py rollup_activity` folds new Enrollment, LessonCompletion and
+QuizSubmission rows into CourseDailyActivity: one row per course per day.
+Analytics views read those small tables instead of scanning the raw facts.
+
+Runs are incremental. ActivityRollupState records the last id processed
+in each fact table, and each run aggregates only newer rows, in id windows
+of ROLLUP_ID_WINDOW, with one GROUP BY query per window. Watermarks are
+ids rather than timestamps because synced offline completions arrive with
+timestamps in the past; each row is still counted on the day it happened.
+The flip side is that a row whose transaction commits after a run that
+already saw a higher id is never folded in incrementally; ids are
+allocated before commit, so concurrent writes can land this way.
+`manage.py rollup_activity --full` rebuilds the rollups and counts them.
+"""
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import TruncDate, TruncWeek
+from django.utils import timezone
+
+from .models import ActivityRollupState, CourseDailyActivity, Enrollment, LessonCompletion, QuizSubmission
+
+ROLLUP_ID_WINDOW = 50000
+
+# Day ranges offered by the analytics views
+ANALYTICS_RANGES = (7, 30, 90, 365)
+
+MEASURES = ['enrollments', 'completions', 'submissions', 'passes', 'score_total']
+
+# (model, watermark on ActivityRollupState, course lookup, timestamp field, measures)
+FACTS = [
+    (Enrollment, 'last_enrollment_id', 'course_id', 'enrolled_at', {
+        'enrollments': Count('id'),
+    }),
+    (LessonCompletion, 'last_completion_id', 'lesson__module__course_id', 'completed_at', {
+        'completions': Count('id'),
+    }),
+    (QuizSubmission, 'last_submission_id', 'quiz__lesson__module__course_id', 'submitted_at', {
+        'submissions': Count('id'),
+        'passes': Count('id', filter=Q(passed=True)),
+        'score_total': Sum('score'),
+    }),
+]
+
+
+def _daily_totals(model, course_lookup, time_field, measures, after_id, upto_id):
+    """Per (course, day) totals of the rows with after_id < id <= upto_id"""
+    return (
+        model.objects.filter(id__gt=after_id, id__lte=upto_id)
+        .annotate(rollup_course=F(course_lookup), rollup_day=TruncDate(time_field))
+        .values('rollup_course', 'rollup_day')
+        .annotate(**measures)
+        .order_by()
+    )
+
+
+def _add_to_rollups(totals):
+    """Add {(course_id, day): Counter of measures} to the stored rollups"""
+    if not totals:
+        return
+    existing = {
+        (row.course_id, row.day): row
+        for row in CourseDailyActivity.objects.filter(
+            course_id__in={course_id for course_id, _ in totals},
+            day__in={day for _, day in totals},
+        )
+    }
+    rows = []
+    for (course_id, day), measures in totals.items():
+        row = existing.get((course_id, day)) or CourseDailyActivity(course_id=course_id, day=day)
+        for name, value in measures.items():
+            setattr(row, name, getattr(row, name) + value)
+        rows.append(row)
+    CourseDailyActivity.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['course', 'day'],
+        update_fields=MEASURES,
+        batch_size=1000,
+    )
+
+
+@transaction.atomic
+def rollup_activity(full=False):
+    """
+    Fold fact rows added since the last run into the daily rollups. With
+    `full`, rebuild the rollups from scratch. Returns the number of
+    (course, day) rows written.
+    """
+    state, _ = ActivityRollupState.objects.select_for_update().get_or_create(pk=1)
+    if full:
+        CourseDailyActivity.objects.all().delete()
+
+    totals = defaultdict(Counter)
+    for model, watermark, course_lookup, time_field, measures in FACTS:
+        after_id = 0 if full else getattr(state, watermark)
+        upto_id = model.objects.aggregate(last=Max('id'))['last'] or 0
+        while after_id < upto_id:
+            window_end = min(after_id + ROLLUP_ID_WINDOW, upto_id)
+            for row in _daily_totals(model, course_lookup, time_field, measures, after_id, window_end):
+                course_day = (row.pop('rollup_course'), row.pop('rollup_day'))
+                totals[course_day].update(row)
+            after_id = window_end
+        setattr(state, watermark, after_id)
+
+    _add_to_rollups(totals)
+    state.save()
+    return len(totals)
+
+
+def activity_series(courses, days=30, period='day'):
+    """
+    Activity of `courses` over the last `days` days, read from the rollups,
+    as a list of dicts with one entry per day (or per week for
+    period='week'), oldest first. Periods without activity are omitted.
+    """
+    since = timezone.localdate() - timedelta(days=days - 1)
+    bucket = TruncWeek('day') if period == 'week' else F('day')
+    rows = (
+        CourseDailyActivity.objects.filter(course__in=courses, day__gte=since)
+        .annotate(period=bucket)
+        .values('period')
+        .annotate(**{name: Sum(name) for name in MEASURES})
+        .order_by('period')
+    )
+    return [_with_rates(row) for row in rows]
+
+
+def activity_totals(courses, days=30):
+    """Activity of `courses` over the last `days` days, summed"""
+    since = timezone.localdate() - timedelta(days=days - 1)
+    row = CourseDailyActivity.objects.filter(course__in=courses, day__gte=since).aggregate(
+        **{name: Sum(name) for name in MEASURES}
+    )
+    return _with_rates({name: value or 0 for name, value in row.items()})
+
+
+def _with_rates(row):
+    submissions = row['submissions']
+    row['average_score'] = row['score_total'] / submissions if submissions else None
+    row['pass_rate'] = 100 * row['passes'] / submissions if submissions else None
+    return row
@@ -0,0 +1,114 @@
+from django.conf import settings
+from django.db.models import QuerySet
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Course, CourseModule, Lesson, Quiz, Question, Answer
+from .storage import refresh_references, release
+
+
+def touch_course(**filters):
+    """
+    Bump Course.updated_at for the matching course.
+
+    updated_at is the course's version stamp: cached fragments of the course
+    outline are keyed on it, so any change to its content must move it.
+    """
+    Course.objects.filter(**filters).update(updated_at=timezone.now())
+
+
+def cascaded(instance, origin=None):
+    """
+    True when `instance` is being deleted because its parent is.
+
+    The delete that started the cascade bumps the course once from its own
+    handler, so the rows it takes with it needn't each run an UPDATE.
+    """
+    if origin is None or origin is instance:
+        return False
+    return not (isinstance(origin, QuerySet) and origin.model is type(instance))
+
+
+@receiver([post_save, post_delete], sender=CourseModule)
+def module_changed(sender, instance, origin=None, **kwargs):
+    if not cascaded(instance, origin):
+        touch_course(pk=instance.course_id)
+
+
+@receiver([post_save, post_delete], sender=Lesson)
+def lesson_changed(sender, instance, origin=None, **kwargs):
+    if not cascaded(instance, origin):
+        touch_course(modules__id=instance.module_id)
+
+
+@receiver([post_save, post_delete], sender=Quiz)
+def quiz_changed(sender, instance, origin=None, **kwargs):
+    if not cascaded(instance, origin):
+        touch_course(modules__lessons__id=instance.lesson_id)
+
+
+@receiver([post_save, post_delete], sender=Question)
+def question_changed(sender, instance, origin=None, **kwargs):
+    if not cascaded(instance, origin):
+        touch_course(modules__lessons__quiz__id=instance.quiz_id)
+
+
+@receiver([post_save, post_delete], sender=Answer)
+def answer_changed(sender, instance, origin=None, **kwargs):
+    if not cascaded(instance, origin):
+        touch_course(modules__lessons__quiz__questions__id=instance.question_id)
+
+
+# Educator fields shown in course cards, outlines and API documents
+EDUCATOR_DISPLAY_FIELDS = ('first_name', 'last_name')
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def remember_educator_name(sender, instance, update_fields=None, **kwargs):
+    instance._educator_name_before = None
+    if (
+        instance.pk and instance.user_type == 'educator'
+        and (update_fields is None or set(EDUCATOR_DISPLAY_FIELDS) & set(update_fields))
+    ):
+        instance._educator_name_before = sender._base_manager.filter(pk=instance.pk).values_list(
+            *EDUCATOR_DISPLAY_FIELDS,
+        ).first()
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def educator_renamed(sender, instance, **kwargs):
+    before = getattr(instance, '_educator_name_before', None)
+    if before is not None and before != tuple(getattr(instance, field) for field in EDUCATOR_DISPLAY_FIELDS):
+        touch_course(educator=instance)
+
+
+# Fields kept in content-addressed storage, whose files are reference counted
+STORED_FILE_FIELDS = {Lesson: 'pdf_file', Course: 'thumbnail'}
+
+
+@receiver(pre_save, sender=Lesson)
+@receiver(pre_save, sender=Course)
+def remember_stored_file(sender, instance, update_fields=None, **kwargs):
+    field = STORED_FILE_FIELDS[sender]
+    instance._stored_file_before = None
+    if instance.pk and (update_fields is None or field in update_fields):
+        instance._stored_file_before = sender._base_manager.filter(pk=instance.pk).values_list(
+            field, flat=True,
+        ).first()
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_save, sender=Course)
+def stored_file_saved(sender, instance, **kwargs):
+    before = getattr(instance, '_stored_file_before', None)
+    after = getattr(instance, STORED_FILE_FIELDS[sender]).name
+    if before != after:
+        refresh_references([after])
+        release([before])
+
+
+@receiver(post_delete, sender=Lesson)
+@receiver(post_delete, sender=Course)
+def stored_file_deleted(sender, instance, **kwargs):
+    release([getattr(instance, STORED_FILE_FIELDS[sender]).name])
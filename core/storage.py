@@ -0,0 +1,186 @@
+"""
+Content-addressed, deduplicating storage for lesson PDFs and course thumbnails.
+
+Files are stored under their SHA-256, as
+<upload_to>/<aa>/<bb>/<sha256><extension>, so an identical upload reuses the
+file that is already there instead of writing a second copy. The digest is
+computed while the file streams in: the upload handlers below hash
+multipart uploads chunk by chunk, resumable uploads arrive with their digest
+(core.uploads), and anything else is hashed as it is copied into place.
+
+Every stored file has a MediaBlob row whose `references` is the number of
+rows pointing at it, recounted whenever a referencing row changes. A file
+is only deleted once nothing refers to it: storing and deleting a file
+both lock its MediaBlob row (select_for_update) and the delete recounts
+under that lock, so whichever of the two runs second sees the other's
+result, and a save puts back a file a delete has just removed. A save
+outside a transaction holds the lock only while the file is placed, not
+until its row is written.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+from django.db import transaction
+from django.db.models import Count
+
+# Model fields kept in this storage: (model label, field name)
+REFERENCES = [
+    ('core.Lesson', 'pdf_file'),
+    ('core.Course', 'thumbnail'),
+]
+
+# Partially written files, inside MEDIA_ROOT so they can be renamed into place
+INCOMING_DIR = '.incoming'
+
+
+def content_name(directory, sha256, extension):
+    return os.path.join(directory, sha256[:2], sha256[2:4], f'{sha256}{extension}')
+
+
+def count_references(names):
+    """{name: number of rows referring to it} for the given stored file names"""
+    counts = dict.fromkeys(names, 0)
+    for label, field in REFERENCES:
+        rows = apps.get_model(label)._base_manager.filter(**{f'{field}__in': list(counts)})
+        for name, count in rows.values_list(field).annotate(count=Count('pk')).order_by():
+            counts[name] += count
+    return counts
+
+
+def refresh_references(names):
+    """Recount the references to the given stored files"""
+    MediaBlob = apps.get_model('core', 'MediaBlob')
+    names = {name for name in names if name}
+    if not names:
+        return {}
+    counts = count_references(names)
+    for name, count in counts.items():
+        MediaBlob.objects.filter(name=name).exclude(references=count).update(references=count)
+    return counts
+
+
+def release(names):
+    """After commit, delete any of the given stored files that nothing refers to any more"""
+    names = {name for name in names if name}
+    if names:
+        transaction.on_commit(lambda: [media_storage.delete(name) for name in names])
+
+
+def _lock_blob(name, sha256, size):
+    """The MediaBlob row for a stored file, created if needed and locked until commit"""
+    MediaBlob = apps.get_model('core', 'MediaBlob')
+    MediaBlob.objects.get_or_create(name=name, defaults={'sha256': sha256, 'size': size})
+    return MediaBlob.objects.select_for_update().get(name=name)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that names files by content and stores each one once"""
+
+    def _save(self, name, content):
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        sha256 = getattr(content, 'sha256', None)
+
+        incoming = None
+        if sha256:
+            size = content.size
+        else:
+            incoming, sha256, size = self._hash_to_incoming(content)
+        target = content_name(directory, sha256, extension)
+
+        try:
+            with transaction.atomic():
+                # Waits for a delete of the same file to finish, and holds one off
+                _lock_blob(target, sha256, size)
+                # Checked under the lock: a concurrent delete may just have removed it
+                if not self.exists(target) and incoming:
+                    os.makedirs(os.path.dirname(self.path(target)), exist_ok=True)
+                    os.replace(incoming, self.path(target))
+                    incoming = None
+                    if self.file_permissions_mode is not None:
+                        os.chmod(self.path(target), self.file_permissions_mode)
+                elif not self.exists(target):
+                    # Moves temporary files into place, copies anything else in chunks
+                    saved = super()._save(target, content)
+                    if saved != target:
+                        # Someone stored the same content at the same moment
+                        super().delete(saved)
+        finally:
+            if incoming:
+                os.unlink(incoming)
+        return target
+
+    def _hash_to_incoming(self, content):
+        """
+        Copy `content` to a temporary file while hashing it. Returns
+        (temporary path, sha256, size).
+        """
+        incoming = self.path(INCOMING_DIR)
+        os.makedirs(incoming, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        with tempfile.NamedTemporaryFile(dir=incoming, delete=False) as tmp:
+            try:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    tmp.write(chunk)
+                    size += len(chunk)
+            except BaseException:
+                os.unlink(tmp.name)
+                raise
+
+        return tmp.name, digest.hexdigest(), size
+
+    def delete(self, name):
+        """Delete a stored file, unless some row still refers to it"""
+        if not name:
+            return
+        MediaBlob = apps.get_model('core', 'MediaBlob')
+        with transaction.atomic():
+            # Saves of the same content wait here; any row they committed is counted
+            blob = MediaBlob.objects.select_for_update().filter(name=name).first()
+            if refresh_references([name]).get(name, 0):
+                return
+            super().delete(name)
+            if blob:
+                blob.delete()
+
+
+media_storage = ContentAddressedStorage()
+
+
+def get_media_storage():
+    return media_storage
+
+
+class HashingUploadHandlerMixin:
+    """Hashes a multipart file upload as it streams in and sets `sha256` on the result"""
+
+    def new_file(self, *args, **kwargs):
+        # Before super(): the memory handler stops other handlers by raising
+        self.digest = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.digest.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.sha256 = self.digest.hexdigest()
+        return file
+
+
+class HashingMemoryFileUploadHandler(HashingUploadHandlerMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(HashingUploadHandlerMixin, TemporaryFileUploadHandler):
+    pass
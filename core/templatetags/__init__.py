@@ -1,31 +0,0 @@
-from django import template
-import re
-
-register = template.Library()
-
-@register.filter
-def youtube_embed_url(url):
-    """
-    Convert a YouTube URL to an embed URL.
-    Handles:
-    - https://www.youtube.com/watch?v=VIDEO_ID
-    - https://youtu.be/VIDEO_ID
-    - Already embedded URLs
-    """
-    if not url:
-        return ''
-    
-    # Extract video ID from various YouTube URL formats
-    patterns = [
-        r'(?:youtube\.com\/watch\?v=|youtu\.be\/)([a-zA-Z0-9_-]{11})',
-        r'youtube\.com\/embed\/([a-zA-Z0-9_-]{11})',
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, url)
-        if match:
-            video_id = match.group(1)
-            return f'https://www.youtube.com/embed/{video_id}'
-    
-    # If no pattern matches, return original URL
-    return url
@@ -1,35 +1,32 @@
+from functools import lru_cache
+
 from django import template
-import re
+
+from core.video import embed_url, parse_video_url
 
 register = template.Library()
 
+
+@register.filter
+def video_embed_url(lesson):
+    """
+    Embed URL for a lesson's video.
+
+    The provider and video id are parsed when the lesson is saved, so this
+    is just a lookup.
+    """
+    return lesson.video_embed_url
+
+
 @register.filter
+@lru_cache(maxsize=1024)
 def youtube_embed_url(url):
     """
-    Convert any YouTube URL to a clean embed URL.
-    Handles:
-    - https://www.youtube.com/watch?v=VIDEO_ID
-    - https://www.youtube.com/watch?v=VIDEO_ID&other=params
-    - https://youtu.be/VIDEO_ID
-    - https://www.youtube.com/embed/VIDEO_ID
-    - https://www.youtube.com/embed/VIDEO_ID?si=tracking
-    Removes all query parameters for clean embedding.
+    Convert a raw YouTube (or Vimeo) URL to an embed URL.
+    Prefer video_embed_url for lessons; this parses the URL on every
+    uncached call. Unrecognised URLs are returned unchanged.
     """
     if not url:
         return ''
-    
-    # Extract video ID from various YouTube URL formats
-    patterns = [
-        r'(?:youtube\.com\/watch\?v=)([a-zA-Z0-9_-]{11})',  # Standard watch URL
-        r'(?:youtu\.be\/)([a-zA-Z0-9_-]{11})',              # Short URL
-        r'(?:youtube\.com\/embed\/)([a-zA-Z0-9_-]{11})',    # Already embed URL
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, url)
-        if match:
-            video_id = match.group(1)
-            return f'https://www.youtube.com/embed/{video_id}'
-    
-    # If no pattern matches, return original URL
-    return url
+    provider, video_id = parse_video_url(url)
+    return embed_url(provider, video_id, url)
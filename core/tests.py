@@ -1,3 +1,1138 @@
-from django.test import TestCase
+import csv
+import hashlib
+import io
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+
+from . import quiz_wire
+from .cloning import clone_course
+from .bundles import archive_path, build_bundle, course_version, prune_old_archives
+from .models import (
+    Answer, Course, CourseCoEnrollment, CourseDailyActivity, CourseModule, CourseRecommendation, Enrollment,
+    Lesson, LessonCompletion, MediaBlob, MediaUpload, Question, Quiz, QuizSubmission,
+)
+from .progress import record_quiz_submission, refresh_enrollment_progress
+from .grading import grade_quiz
+from .uploads import (
+    UploadError, attach_upload, create_upload, expire_uploads, move_legacy_staging, staging_path, write_chunk,
+)
+from .storage import media_storage
+from .ordering import MIN_GAP, ORDER_GAP, apply_order, insert_at, siblings_of
+from .recommendations import update_recommendations
+from . import rollups
+from .rollups import activity_series, rollup_activity
+from .purge import purge_course, soft_delete_course
+from .video import MP4, VIMEO, YOUTUBE, embed_url, parse_video_url
+
+
+@override_settings(PASSWORD_HASH_ITERATIONS=1000)
+class CourseTestCase(TestCase):
+    """An educator's published course: two modules of lessons, the last one a quiz"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.educator = User.objects.create_user(
+            email='educator@example.com', username='educator', user_type='educator',
+            first_name='Ada', last_name='Lovelace', password='pw-123456',
+        )
+        cls.student = User.objects.create_user(
+            email='student@example.com', username='student', user_type='student', password='pw-123456',
+        )
+        cls.course = Course.objects.create(
+            title='Algebra', description='Equations', educator=cls.educator, is_published=True,
+        )
+        cls.lessons = []
+        for m in range(2):
+            module = CourseModule.objects.create(course=cls.course, title=f'Module {m}', order=m)
+            for n in range(2):
+                cls.lessons.append(Lesson.objects.create(
+                    module=module, title=f'Lesson {m}.{n}', content_type='text', order=n,
+                ))
+        cls.quiz_lesson = Lesson.objects.create(module=module, title='Quiz', content_type='quiz', order=9)
+        cls.lessons.append(cls.quiz_lesson)
+        cls.quiz = Quiz.objects.create(lesson=cls.quiz_lesson, title='Check', passing_score=50)
+        for q in range(3):
+            question = Question.objects.create(
+                quiz=cls.quiz, question_text=f'Q{q}', question_type='multiple_choice', order=q,
+            )
+            Answer.objects.create(question=question, answer_text='right', is_correct=True)
+            Answer.objects.create(question=question, answer_text='wrong', is_correct=False)
+
+    def setUp(self):
+        cache.clear()
+
+    def course_stamp(self):
+        return Course.objects.values_list('updated_at', flat=True).get(pk=self.course.pk)
+
+
+class CourseVersionStampTests(CourseTestCase):
+    def course_updates(self, queries):
+        return [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE "core_course"')]
+
+    def test_cascading_delete_bumps_the_course_once(self):
+        stamp = self.course_stamp()
+        with CaptureQueriesContext(connection) as queries:
+            self.quiz_lesson.delete()
+        self.assertEqual(len(self.course_updates(queries)), 1)
+        self.assertGreater(self.course_stamp(), stamp)
+
+    def test_deleting_a_child_directly_bumps_the_course(self):
+        stamp = self.course_stamp()
+        with CaptureQueriesContext(connection) as queries:
+            Answer.objects.filter(question__quiz=self.quiz, is_correct=False).delete()
+        self.assertEqual(len(self.course_updates(queries)), 3)
+        self.assertGreater(self.course_stamp(), stamp)
+
+    def test_renaming_the_educator_refreshes_cached_cards(self):
+        self.client.force_login(self.student)
+        self.assertContains(self.client.get(reverse('core:dashboard')), 'Ada Lovelace')
+        stamp = self.course_stamp()
+
+        self.educator.first_name = 'Augusta'
+        self.educator.save()
+        self.assertGreater(self.course_stamp(), stamp)
+        self.assertContains(self.client.get(reverse('core:dashboard')), 'Augusta Lovelace')
+
+    def test_saves_that_cannot_rename_skip_the_check(self):
+        with self.assertNumQueries(1):
+            self.educator.save(update_fields=['last_login'])
+
+
+class ConditionalGetTests(CourseTestCase):
+    def setUp(self):
+        super().setUp()
+        # Enrolling schedules a background recommendations update
+        patcher = mock.patch('core.views.schedule_recommendation_update')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client.force_login(self.student)
+        self.course_url = reverse('core:course_detail', args=[self.course.id])
+        self.lesson_url = reverse('core:lesson_detail', args=[self.lessons[0].id])
+
+    def etag(self, url):
+        # The first visit may show a flash message or set the CSRF cookie,
+        # both of which change the ETag
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def enroll(self):
+        self.client.post(reverse('core:enroll_course', args=[self.course.id]))
+        return self.course.enrollments.get(student=self.student)
+
+    def complete(self, lesson):
+        self.client.post(reverse('core:mark_lesson_complete', args=[lesson.id]))
+
+    def test_unchanged_page_is_not_rendered_again(self):
+        self.enroll()
+        for url in (self.course_url, self.lesson_url, reverse('core:quiz_detail', args=[self.quiz.id])):
+            with self.subTest(url=url):
+                etag = self.etag(url)
+                response = self.client.get(url, headers={'If-None-Match': etag})
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.templates, [])
+
+    def test_enrolling_changes_the_course_etag(self):
+        etag = self.etag(self.course_url)
+        enrollment = self.enroll()
+        self.assertEqual(enrollment.next_lesson, self.lessons[0])
+        self.assertEqual(enrollment.progress, 0)
+
+        response = self.client.get(self.course_url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Next up: Lesson 0.0')
+
+    def test_completing_a_lesson_updates_progress_and_etags(self):
+        self.enroll()
+        course_etag, lesson_etag = self.etag(self.course_url), self.etag(self.lesson_url)
+        self.complete(self.lessons[0])
+
+        enrollment = self.course.enrollments.get(student=self.student)
+        self.assertEqual((enrollment.progress, enrollment.next_lesson), (20, self.lessons[1]))
+        self.assertIsNotNone(enrollment.last_activity_at)
+
+        response = self.client.get(self.course_url, headers={'If-None-Match': course_etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Next up: Lesson 0.1')
+        response = self.client.get(self.lesson_url, headers={'If-None-Match': lesson_etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['is_completed'])
+
+    def test_completing_every_lesson_completes_the_enrollment(self):
+        self.enroll()
+        etag = self.etag(self.course_url)
+        for lesson in self.lessons:
+            self.complete(lesson)
+
+        enrollment = self.course.enrollments.get(student=self.student)
+        self.assertEqual((enrollment.progress, enrollment.completed, enrollment.next_lesson), (100, True, None))
+        self.assertEqual(self.client.get(self.course_url, headers={'If-None-Match': etag}).status_code, 200)
+
+    def test_quiz_submission_changes_the_quiz_etag(self):
+        self.enroll()
+        url = reverse('core:quiz_detail', args=[self.quiz.id])
+        etag = self.etag(url)
+        self.client.post(url, {})
+        self.assertNotEqual(self.etag(url), etag)
+
+    def test_etags_are_per_user(self):
+        self.enroll()
+        etag = self.etag(self.course_url)
+        self.client.force_login(self.educator)
+        self.assertEqual(self.client.get(self.course_url, headers={'If-None-Match': etag}).status_code, 200)
+
+
+class ProgressTests(CourseTestCase):
+    def test_only_the_students_own_completions_count(self):
+        classmate = User.objects.create_user(
+            email='classmate@example.com', username='classmate', user_type='student',
+        )
+        for student in (self.student, classmate):
+            Enrollment.objects.create(student=student, course=self.course)
+        LessonCompletion.objects.bulk_create(
+            [LessonCompletion(student=classmate, lesson=lesson) for lesson in self.lessons]
+            + [LessonCompletion(student=self.student, lesson=self.lessons[0])]
+        )
+
+        summary = refresh_enrollment_progress(self.student, [self.course.id])
+        self.assertEqual(
+            summary[self.course.id],
+            {'completed_lessons': 1, 'total_lessons': 5, 'progress': 20, 'completed': False},
+        )
+        self.assertEqual(refresh_enrollment_progress(classmate, [self.course.id])[self.course.id]['progress'], 100)
+
+    def test_courses_without_completions_count_zero(self):
+        Enrollment.objects.create(student=self.student, course=self.course)
+        summary = refresh_enrollment_progress(self.student, [self.course.id])
+        self.assertEqual(summary[self.course.id]['completed_lessons'], 0)
+
+    def test_passing_a_quiz_completes_its_lesson(self):
+        Enrollment.objects.create(student=self.student, course=self.course)
+        LessonCompletion.objects.bulk_create(
+            [LessonCompletion(student=self.student, lesson=lesson) for lesson in self.lessons[:2]]
+        )
+
+        record_quiz_submission(self.student, self.quiz, 0, False)
+        enrollment = Enrollment.objects.get(student=self.student, course=self.course)
+        self.assertEqual((enrollment.next_lesson, enrollment.progress), (self.quiz_lesson, 40))
+        self.assertFalse(LessonCompletion.objects.filter(student=self.student, lesson=self.quiz_lesson).exists())
+
+        passed = record_quiz_submission(self.student, self.quiz, 100, True)
+        enrollment.refresh_from_db()
+        # Past the quiz, wrapping around to the first lesson still to do
+        self.assertEqual((enrollment.next_lesson, enrollment.progress), (self.lessons[2], 60))
+        completion = LessonCompletion.objects.get(student=self.student, lesson=self.quiz_lesson)
+        self.assertEqual(completion.completed_at, passed.submitted_at)
+
+        # Passing again keeps the first completion
+        record_quiz_submission(self.student, self.quiz, 100, True)
+        self.assertEqual(LessonCompletion.objects.get(pk=completion.pk).completed_at, passed.submitted_at)
+        self.assertEqual(Enrollment.objects.get(pk=enrollment.pk).progress, 60)
+
+
+class AdminChangelistTests(CourseTestCase):
+    # The user, the row estimate, the count and the page, with related
+    # objects joined in through list_select_related; date_hierarchy adds the
+    # date range and its choices
+    changelist_queries = {
+        Enrollment: 4, Lesson: 4, Quiz: 4, Question: 4, Answer: 4,
+        LessonCompletion: 4, QuizSubmission: 4, CourseDailyActivity: 6,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.superuser = User.objects.create_superuser(
+            email='admin@example.com', username='admin', password='pw-123456',
+        )
+        for n in range(3):
+            student = User.objects.create_user(
+                email=f'student{n}@example.com', username=f'student{n}', user_type='student',
+            )
+            Enrollment.objects.create(student=student, course=cls.course)
+            LessonCompletion.objects.bulk_create(
+                [LessonCompletion(student=student, lesson=lesson) for lesson in cls.lessons]
+            )
+            QuizSubmission.objects.create(student=student, quiz=cls.quiz, score=50, passed=True)
+            CourseDailyActivity.objects.create(
+                course=cls.course, day=timezone.localdate() - timedelta(days=n), enrollments=1,
+            )
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.superuser)
+
+    def changelist_url(self, model):
+        return reverse(f'admin:{model._meta.app_label}_{model._meta.model_name}_changelist')
+
+    def test_changelists_run_a_fixed_number_of_queries(self):
+        for model, queries in self.changelist_queries.items():
+            with self.subTest(model=model.__name__), self.assertNumQueries(queries):
+                response = self.client.get(self.changelist_url(model))
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.context['cl'].result_list)
+
+    def test_searches_across_foreign_keys_use_subqueries(self):
+        queryset, may_have_duplicates = admin.site._registry[LessonCompletion].get_search_results(
+            None, LessonCompletion.objects.all(), 'student1@ "Lesson 0.1"',
+        )
+        self.assertFalse(may_have_duplicates)
+        self.assertEqual(str(queryset.query).count('JOIN'), 0)
+        self.assertQuerySetEqual(
+            queryset, [('student1@example.com', 'Lesson 0.1')],
+            transform=lambda completion: (completion.student.email, completion.lesson.title),
+        )
+
+    def test_search_still_finds_deleted_courses(self):
+        Course.objects.filter(pk=self.course.pk).update(deleted_at=timezone.now())
+        response = self.client.get(self.changelist_url(Enrollment), {'q': 'algebra'})
+        self.assertEqual(len(response.context['cl'].result_list), 3)
+
+
+class PurgeTests(CourseTestCase):
+    def test_purging_a_course_with_enrolled_students(self):
+        Enrollment.objects.create(student=self.student, course=self.course, next_lesson=self.lessons[1])
+        LessonCompletion.objects.create(student=self.student, lesson=self.lessons[0])
+        QuizSubmission.objects.create(student=self.student, quiz=self.quiz, score=100, passed=True)
+        soft_delete_course(self.course)
+
+        # Each batch commits on its own, so foreign keys must hold after every
+        # one; the test transaction never commits, so check them explicitly
+        totals = purge_course(
+            self.course.id, batch_size=2, on_progress=lambda step, deleted: connection.check_constraints(),
+        )
+        self.assertEqual((totals['enrollment'], totals['lesson'], totals['course']), (1, 5, 1))
+        self.assertFalse(Course.all_objects.filter(pk=self.course.pk).exists())
+        self.assertFalse(Lesson.objects.filter(module__course_id=self.course.pk).exists())
+        self.assertTrue(User.objects.filter(pk=self.student.pk).exists())
+
+    def test_models_purged_in_several_steps_are_totalled(self):
+        others = [
+            Course.objects.create(title=f'Other {n}', educator=self.educator, is_published=True) for n in range(2)
+        ]
+        for other in others:
+            CourseCoEnrollment.objects.bulk_create([
+                CourseCoEnrollment(course=self.course, other=other, students=1),
+                CourseCoEnrollment(course=other, other=self.course, students=1),
+            ])
+            CourseRecommendation.objects.bulk_create([
+                CourseRecommendation(course=self.course, recommended=other, score=0.5),
+                CourseRecommendation(course=other, recommended=self.course, score=0.5),
+            ])
+        soft_delete_course(self.course)
+
+        out = io.StringIO()
+        call_command('purge_courses', self.course.id, stdout=out)
+        self.assertIn('coursecoenrollment: 4 deleted', out.getvalue())
+        self.assertIn('courserecommendation: 4 deleted', out.getvalue())
+        self.assertFalse(CourseCoEnrollment.objects.exists())
+        self.assertEqual(purge_course(self.course.id), {})
+
+
+class OfflineBundleTests(CourseTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        settings_override = override_settings(
+            MEDIA_ROOT=self.root / 'media', OFFLINE_BUNDLE_ROOT=self.root / 'bundles',
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.url = reverse('core:course_offline_bundle', args=[self.course.id])
+        # Adding the lessons moved the version stamp
+        self.course.refresh_from_db()
+
+    def test_bundles_are_only_served_to_enrolled_students(self):
+        path = build_bundle(self.course)
+        self.assertFalse(path.is_relative_to(self.root / 'media'))
+
+        self.client.force_login(self.student)
+        self.assertRedirects(
+            self.client.get(self.url), reverse('core:course_detail', args=[self.course.id]),
+            fetch_redirect_response=False,
+        )
+        Enrollment.objects.create(student=self.student, course=self.course)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), path.read_bytes())
+        response.close()
+
+    def test_superseded_archives_outlive_the_grace_period_only(self):
+        old = build_bundle(self.course)
+        Course.objects.filter(pk=self.course.pk).update(updated_at=timezone.now())
+        self.course.refresh_from_db()
+        current = build_bundle(self.course)
+        self.assertTrue(old.exists())
+
+        stale = time.time() - 2 * 60 * 60
+        os.utime(old, (stale, stale))
+        prune_old_archives(self.course.id, course_version(self.course))
+        self.assertFalse(old.exists())
+        self.assertTrue(current.exists())
+
+    def test_legacy_bundles_under_media_are_removed(self):
+        legacy = self.root / 'media' / 'offline_bundles' / str(self.course.id)
+        legacy.mkdir(parents=True)
+        (legacy / 'old.zip').write_bytes(b'zip')
+        call_command('build_offline_bundles', stdout=io.StringIO())
+        self.assertFalse(legacy.exists())
+        self.assertTrue(archive_path(self.course.id, course_version(self.course)).exists())
+
+
+class VideoURLTests(SimpleTestCase):
+    def test_known_providers(self):
+        for url, parsed in [
+            ('https://www.youtube.com/watch?v=dQw4w9WgXcQ', (YOUTUBE, 'dQw4w9WgXcQ')),
+            ('https://www.youtube.com/watch?feature=share&v=dQw4w9WgXcQ&t=42', (YOUTUBE, 'dQw4w9WgXcQ')),
+            ('https://youtu.be/dQw4w9WgXcQ?si=abc', (YOUTUBE, 'dQw4w9WgXcQ')),
+            ('https://www.youtube.com/embed/dQw4w9WgXcQ', (YOUTUBE, 'dQw4w9WgXcQ')),
+            ('https://vimeo.com/76979871', (VIMEO, '76979871')),
+            ('https://vimeo.com/channels/staffpicks/76979871', (VIMEO, '76979871')),
+            ('https://player.vimeo.com/video/76979871', (VIMEO, '76979871')),
+            ('https://cdn.example.com/lessons/intro.MP4', (MP4, 'https://cdn.example.com/lessons/intro.MP4')),
+        ]:
+            with self.subTest(url=url):
+                self.assertEqual(parse_video_url(url), parsed)
+
+    def test_unknown_urls_are_embedded_as_is(self):
+        url = 'https://videos.example.com/watch/42'
+        self.assertEqual(parse_video_url(url), ('', ''))
+        self.assertEqual(parse_video_url(''), ('', ''))
+        self.assertEqual(embed_url('', '', url), url)
+        self.assertEqual(embed_url(YOUTUBE, 'dQw4w9WgXcQ', url), 'https://www.youtube.com/embed/dQw4w9WgXcQ')
+
+
+class LessonVideoTests(CourseTestCase):
+    def test_saving_only_the_url_refreshes_the_parsed_fields(self):
+        lesson = self.lessons[0]
+        lesson.video_url = 'https://youtu.be/dQw4w9WgXcQ'
+        lesson.save(update_fields=['video_url'])
+        lesson = Lesson.objects.get(pk=lesson.pk)
+        self.assertEqual((lesson.video_provider, lesson.video_id), (YOUTUBE, 'dQw4w9WgXcQ'))
+        self.assertEqual(lesson.video_embed_url, 'https://www.youtube.com/embed/dQw4w9WgXcQ')
+
+        lesson.video_url = 'https://vimeo.com/76979871'
+        lesson.save()
+        lesson.refresh_from_db()
+        self.assertEqual((lesson.video_provider, lesson.video_id), (VIMEO, '76979871'))
+
+    def test_other_partial_saves_leave_the_video_alone(self):
+        lesson = self.lessons[0]
+        lesson.video_url = 'https://youtu.be/dQw4w9WgXcQ'
+        lesson.save()
+        lesson.title = 'Renamed'
+        with CaptureQueriesContext(connection) as queries:
+            lesson.save(update_fields=['title'])
+        [update] = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE "core_lesson"')]
+        self.assertIn('"title"', update)
+        self.assertNotIn('video_provider', update)
+
+
+class APITests(CourseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.outline_url = reverse('api:course_outline', args=[self.course.id])
+        self.lesson_url = reverse('api:lesson_content', args=[self.lessons[0].id])
+        self.quiz_url = reverse('api:quiz_questions', args=[self.quiz.id])
+        Enrollment.objects.create(student=self.student, course=self.course)
+        self.client.force_login(self.student)
+
+    def test_unchanged_documents_answer_304(self):
+        for url in (self.outline_url, self.lesson_url, self.quiz_url):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                response = self.client.get(url, headers={'If-None-Match': response['ETag']})
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+
+    def test_editing_a_lesson_changes_the_etag_and_the_document(self):
+        etags = {url: self.client.get(url)['ETag'] for url in (self.outline_url, self.lesson_url)}
+        lesson = self.lessons[0]
+        lesson.title = 'Linear equations'
+        lesson.save()
+
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, headers={'If-None-Match': etag})
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Linear equations')
+
+    def test_unpublished_and_deleted_courses_are_not_found(self):
+        Course.objects.filter(pk=self.course.pk).update(is_published=False)
+        self.assertEqual(self.client.get(self.outline_url).status_code, 404)
+        catalog = json.loads(b''.join(self.client.get(reverse('api:course_catalog')).streaming_content))
+        self.assertEqual(catalog['courses'], [])
+        # Its educator still sees the draft
+        self.client.force_login(self.educator)
+        self.assertEqual(self.client.get(self.outline_url).status_code, 200)
+
+        soft_delete_course(self.course)
+        for url in (self.outline_url, self.lesson_url, self.quiz_url):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_cached_documents_hold_no_per_user_data(self):
+        LessonCompletion.objects.create(student=self.student, lesson=self.lessons[0])
+        outline = self.client.get(self.outline_url).json()['course']
+        lesson = self.client.get(self.lesson_url).json()['lesson']
+        self.assertEqual((outline['is_enrolled'], lesson['is_completed']), (True, True))
+
+        classmate = User.objects.create_user(
+            email='classmate@example.com', username='classmate', user_type='student',
+        )
+        Enrollment.objects.create(student=classmate, course=self.course)
+        self.client.force_login(classmate)
+        lesson = self.client.get(self.lesson_url).json()['lesson']
+        self.assertFalse(lesson['is_completed'])
+        quiz = self.client.get(self.quiz_url).json()['quiz']
+        self.assertNotIn('is_correct', json.dumps(quiz))
+
+        # A student who isn't enrolled gets the same cached outline, but not
+        # the lesson it lists
+        outsider = User.objects.create_user(email='outsider@example.com', username='outsider', user_type='student')
+        self.client.force_login(outsider)
+        with self.assertNumQueries(2):
+            outline = self.client.get(self.outline_url).json()['course']
+        self.assertFalse(outline['is_enrolled'])
+        self.assertEqual(self.client.get(self.lesson_url).status_code, 403)
+
+
+class QuizWireTests(CourseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.questions = list(self.quiz.questions.order_by('order'))
+        self.right = {q.id: q.answers.get(is_correct=True).id for q in self.questions}
+        self.wrong = {q.id: q.answers.get(is_correct=False).id for q in self.questions}
+        self.submit_url = reverse('api:quiz_submit', args=[self.quiz.id])
+
+    def submit(self, payload):
+        body = payload if isinstance(payload, (str, bytes)) else json.dumps(payload)
+        return self.client.post(self.submit_url, body, content_type='application/json')
+
+    def test_pages_round_trip_through_the_string_table(self):
+        pages = [json.loads(quiz_wire.dumps(page)) for page in quiz_wire.build_quiz_pages(self.quiz.id, page_size=2)]
+        self.assertEqual([(page['p'], page['n']) for page in pages], [(1, 2), (2, 2)])
+        self.assertEqual(pages[0]['h'], [self.quiz.id, 'Check', '', 50, 3])
+
+        strings, decoded = [], []
+        for page in pages:
+            self.assertEqual(page['o'], len(strings))
+            strings += page['s']
+            for question_id, text, kind, points, options in page['q']:
+                answers = [(options[i], strings[options[i + 1]]) for i in range(0, len(options), 2)]
+                decoded.append((question_id, strings[text], kind, points, answers))
+        self.assertEqual(decoded, [
+            (q.id, q.question_text, 'm', q.points, [(a.id, a.answer_text) for a in q.answers.order_by('id')])
+            for q in self.questions
+        ])
+        # Shared answer texts are sent once
+        self.assertEqual(strings.count('right'), 1)
+
+    def test_submissions_are_graded(self):
+        Enrollment.objects.create(student=self.student, course=self.course)
+        self.client.force_login(self.student)
+        first, *rest = self.questions
+        pairs = [first.id, self.right[first.id]] + [i for q in rest for i in (q.id, self.wrong[q.id])]
+        self.assertEqual(self.submit({'a': pairs}).json(), {'score': 33.3, 'passed': False})
+        answers = [i for q in self.questions for i in (str(q.id), self.right[q.id])]
+        self.assertEqual(self.submit({'a': answers}).json(), {'score': 100.0, 'passed': True})
+
+    def test_malformed_submissions_are_rejected(self):
+        self.client.force_login(self.educator)
+        question = self.questions[0].id
+        answer = self.right[question]
+        for payload in [
+            'not json', [question, answer], {'a': [question]}, {'a': {str(question): answer}},
+            {'a': [question, [answer]]}, {'a': [{'id': question}, answer]}, {'a': [question, True]},
+            {'a': [question, 1.5]}, {'a': [f' {question}', answer]}, {'a': [question, '-1']},
+            # One question answered under several spellings of its id
+            {'a': [question, answer, str(question), answer]},
+        ]:
+            with self.subTest(payload=payload):
+                response = self.submit(payload)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+    def test_duplicate_and_foreign_question_ids_never_add_points(self):
+        first, second, third = self.questions
+        # As the HTML form would send them, under keys that all parse to one id
+        selected = {str(first.id): self.right[first.id], f' {first.id}': self.right[first.id],
+                    f'0{first.id}': self.right[first.id], str(second.id): self.wrong[second.id],
+                    '999999': self.right[first.id]}
+        percentage, passed = grade_quiz(self.quiz, selected)
+        self.assertAlmostEqual(percentage, 100 / 3)
+        self.assertFalse(passed)
+        # Only the first answer to a question counts
+        percentage, _ = grade_quiz(self.quiz, {str(third.id): self.wrong[third.id], f' {third.id}': self.right[third.id]})
+        self.assertEqual(percentage, 0)
+
+
+class CloneCourseTests(CourseTestCase):
+    def outline(self, course):
+        """The course's content, with every foreign key checked against the copy's own rows"""
+        modules = []
+        for module in course.modules.order_by('order'):
+            lessons = []
+            for lesson in module.lessons.order_by('order'):
+                quiz = getattr(lesson, 'quiz', None)
+                questions = None
+                if quiz is not None:
+                    questions = [
+                        (q.question_text, q.question_type, q.points, q.order,
+                         [(a.answer_text, a.is_correct) for a in q.answers.order_by('id')])
+                        for q in quiz.questions.order_by('order')
+                    ]
+                lessons.append((lesson.title, lesson.content_type, lesson.order, quiz and quiz.title, questions))
+            modules.append((module.title, module.order, lessons))
+        return modules
+
+    def test_clone_copies_the_content_under_new_rows(self):
+        Enrollment.objects.create(student=self.student, course=self.course)
+        # A savepoint and its release, the course, then one read and one
+        # bulk insert for each of the five levels below it
+        with self.assertNumQueries(13):
+            clone = clone_course(self.course, title='Algebra II')
+
+        self.assertEqual((clone.title, clone.educator, clone.is_published), ('Algebra II', self.educator, False))
+        self.assertFalse(clone.enrollments.exists())
+        self.assertEqual(self.outline(clone), self.outline(self.course))
+        self.assertEqual(CourseModule.objects.filter(course=clone).count(), 2)
+        self.assertFalse(Lesson.objects.filter(module__course=clone, pk__in=[l.pk for l in self.lessons]).exists())
+        self.assertEqual(Answer.objects.filter(question__quiz__lesson__module__course=clone).count(), 6)
+        self.assertEqual(Answer.objects.count(), 12)
+
+    def test_query_count_does_not_grow_with_the_course(self):
+        module = self.course.modules.first()
+        for n in range(10):
+            Lesson.objects.create(module=module, title=f'Extra {n}', content_type='text', order=10 + n)
+        with self.assertNumQueries(13):
+            clone_course(self.course)
+
+
+class OrderingTests(CourseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.module = self.lessons[0].module
+
+    def titles(self):
+        return list(siblings_of(Lesson, self.module.pk).values_list('title', flat=True))
+
+    def new_lesson(self, title):
+        return Lesson(module=self.module, title=title, content_type='text')
+
+    def test_inserting_between_adjacent_keys_rebalances(self):
+        # The fixture's keys are 0 and 1, with no room between them
+        with mock.patch('core.ordering.schedule_rebalance'):
+            insert_at(self.new_lesson('Between'), position=2)
+        self.assertEqual(self.titles(), ['Lesson 0.0', 'Between', 'Lesson 0.1'])
+        orders = list(siblings_of(Lesson, self.module.pk).values_list('order', flat=True))
+        self.assertGreaterEqual(min(b - a for a, b in zip(orders, orders[1:])), MIN_GAP)
+
+    def test_repeated_inserts_at_one_spot_keep_their_order(self):
+        apply_order(Lesson, self.module.pk, [lesson.pk for lesson in self.lessons[:2]])
+        expected = ['Lesson 0.0', 'Lesson 0.1']
+        with mock.patch('core.ordering.schedule_rebalance') as schedule, \
+                self.captureOnCommitCallbacks(execute=True) as callbacks:
+            # Halving a 1024 gap leaves no room after ten inserts
+            for n in range(12):
+                insert_at(self.new_lesson(f'New {n}'), position=2)
+                expected.insert(1, f'New {n}')
+        self.assertEqual(self.titles(), expected)
+        self.assertTrue(callbacks)
+        schedule.assert_called_with(Lesson, self.module.pk)
+
+    def test_inserting_only_writes_the_new_row_while_there_is_room(self):
+        apply_order(Lesson, self.module.pk, [lesson.pk for lesson in self.lessons[:2]])
+        with CaptureQueriesContext(connection) as queries:
+            lesson = insert_at(self.new_lesson('Between'), position=2)
+        self.assertEqual(lesson.order, ORDER_GAP + ORDER_GAP // 2)
+        writes = [q['sql'] for q in queries if q['sql'].startswith(('INSERT', 'UPDATE "core_lesson"'))]
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(writes[0].startswith('INSERT INTO "core_lesson"'))
+
+    def test_bulk_reorder_preserves_the_requested_order(self):
+        lessons = [self.lessons[0]] + [
+            insert_at(self.new_lesson(f'Extra {n}')) for n in range(4)
+        ] + [self.lessons[1]]
+        requested = [lessons[i].pk for i in (3, 0, 5, 1, 4, 2)]
+        stamp = self.course_stamp()
+        with self.assertNumQueries(3):
+            apply_order(Lesson, self.module.pk, requested)
+        self.assertEqual(list(siblings_of(Lesson, self.module.pk).values_list('pk', flat=True)), requested)
+        self.assertGreater(self.course_stamp(), stamp)
+
+        for wrong in (requested[:-1], requested + requested[:1], [*requested[:-1], self.quiz_lesson.pk]):
+            with self.subTest(ids=wrong), self.assertRaises(ValueError):
+                apply_order(Lesson, self.module.pk, wrong)
+
+
+class GradebookExportTests(CourseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('core:course_gradebook_export', args=[self.course.id])
+
+    def export(self):
+        self.client.force_login(self.educator)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        return list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+    def add_student(self, name, **fields):
+        student = User.objects.create_user(
+            email=f'{name}@example.com', username=name, user_type='student', first_name=name.title(), **fields,
+        )
+        Enrollment.objects.create(student=student, course=self.course)
+        return student
+
+    def test_only_the_educator_can_export(self):
+        other_educator = User.objects.create_user(
+            email='other@example.com', username='other', user_type='educator',
+        )
+        Enrollment.objects.create(student=self.student, course=self.course)
+        for user in (self.student, other_educator):
+            with self.subTest(user=user.email):
+                self.client.force_login(user)
+                self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+        soft_delete_course(self.course)
+        self.client.force_login(self.educator)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_every_enrolled_student_gets_a_row(self):
+        # Completions only, submissions only, and nothing at all, so the
+        # merge has to skip ahead in both directions
+        reader = self.add_student('reader')
+        quizzer = self.add_student('quizzer')
+        self.add_student('idle')
+        LessonCompletion.objects.bulk_create([LessonCompletion(student=reader, lesson=lesson) for lesson in self.lessons[:2]])
+        QuizSubmission.objects.bulk_create([
+            QuizSubmission(student=quizzer, quiz=self.quiz, score=40),
+            QuizSubmission(student=quizzer, quiz=self.quiz, score=80, passed=True),
+        ])
+
+        header, *rows = self.export()
+        self.assertEqual(header[5:], ['Lessons completed (of 5)', 'Check (best %)'])
+        self.assertEqual(
+            [(row[1], row[5], row[6]) for row in rows],
+            [('Reader', '2', ''), ('Quizzer', '0', '80.0'), ('Idle', '0', '')],
+        )
+
+    def test_formulas_in_titles_and_names_are_neutralized(self):
+        Quiz.objects.filter(pk=self.quiz.pk).update(title='=HYPERLINK("http://evil.example","x")')
+        self.add_student('mallory', last_name='+1-555')
+        header, row = self.export()
+        self.assertEqual(header[6], """'=HYPERLINK("http://evil.example","x") (best %)""")
+        self.assertEqual(row[2], "'+1-555")
+
+
+class RecommendationTests(CourseTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.courses = {'algebra': cls.course}
+        for name, fields in [
+            ('geometry', {}), ('calculus', {}),
+            ('draft', {'is_published': False}), ('retired', {'deleted_at': timezone.now()}),
+        ]:
+            cls.courses[name] = Course.objects.create(
+                title=name.title(), educator=cls.educator, **{'is_published': True, **fields},
+            )
+        cls.students = [
+            User.objects.create_user(email=f's{n}@example.com', username=f's{n}', user_type='student')
+            for n in range(4)
+        ]
+
+    def enroll(self, student, *names):
+        Enrollment.objects.bulk_create([Enrollment(student=student, course=self.courses[name]) for name in names])
+
+    def matrix(self):
+        names = {course.pk: name for name, course in self.courses.items()}
+        return {
+            (names[course_id], names[other_id]): students
+            for course_id, other_id, students in CourseCoEnrollment.objects.values_list('course_id', 'other_id', 'students')
+        }
+
+    def recommendations(self):
+        names = {course.pk: name for name, course in self.courses.items()}
+        return {
+            (names[course_id], names[recommended_id])
+            for course_id, recommended_id in CourseRecommendation.objects.values_list('course_id', 'recommended_id')
+        }
+
+    def test_pairs_from_earlier_runs_are_not_counted_again(self):
+        self.enroll(self.students[0], 'algebra', 'geometry')
+        update_recommendations()
+        self.assertEqual(self.matrix(), {('algebra', 'geometry'): 1, ('geometry', 'algebra'): 1})
+
+        # The same student adds a third course, and another student arrives
+        self.enroll(self.students[0], 'calculus')
+        self.enroll(self.students[1], 'algebra', 'calculus')
+        self.assertEqual(update_recommendations(), 3)
+        self.assertEqual(self.matrix(), {
+            ('algebra', 'geometry'): 1, ('geometry', 'algebra'): 1,
+            ('algebra', 'calculus'): 2, ('calculus', 'algebra'): 2,
+            ('geometry', 'calculus'): 1, ('calculus', 'geometry'): 1,
+        })
+        # Nothing new: nothing counted, nothing re-ranked
+        self.assertEqual(update_recommendations(), 0)
+        self.assertEqual(self.matrix()['algebra', 'calculus'], 2)
+
+    def test_a_full_rebuild_matches_the_incremental_runs(self):
+        runs = [
+            [(0, ['algebra', 'geometry', 'draft'])],
+            [(1, ['algebra', 'calculus']), (0, ['calculus'])],
+            [(2, ['geometry', 'calculus', 'retired']), (3, ['algebra'])],
+            [(3, ['geometry', 'calculus'])],
+        ]
+        for run in runs:
+            for student, names in run:
+                self.enroll(self.students[student], *names)
+            update_recommendations()
+        incremental = (self.matrix(), self.recommendations())
+
+        call_command('build_recommendations', '--full', stdout=io.StringIO())
+        # Scores of courses a run didn't touch may drift; membership doesn't
+        self.assertEqual((self.matrix(), self.recommendations()), incremental)
+
+    def test_unpublished_and_deleted_courses_are_never_recommended(self):
+        for student in self.students:
+            self.enroll(student, *self.courses)
+        update_recommendations()
+        recommended = {other for _, other in self.recommendations()}
+        self.assertEqual(recommended, {'algebra', 'geometry', 'calculus'})
+
+        # Unpublishing a course drops it at the next re-rank
+        Course.objects.filter(pk=self.courses['calculus'].pk).update(is_published=False)
+        self.enroll(User.objects.create_user(email='late@example.com', username='late'), 'algebra', 'geometry')
+        update_recommendations()
+        self.assertNotIn(('algebra', 'calculus'), self.recommendations())
+        self.assertIn(('algebra', 'geometry'), self.recommendations())
+
+
+class RollupTests(CourseTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.students = [
+            User.objects.create_user(email=f'r{n}@example.com', username=f'r{n}', user_type='student')
+            for n in range(6)
+        ]
+
+    def noon(self, days_ago):
+        """A local noon, so the day doesn't depend on the time zone"""
+        day = timezone.localdate() - timedelta(days=days_ago)
+        return timezone.make_aware(datetime.combine(day, datetime.min.time()).replace(hour=12))
+
+    def add_activity(self, student, days_ago, score):
+        """An enrollment, two completions and a quiz submission, all on one day"""
+        enrollment = Enrollment.objects.create(student=student, course=self.course)
+        Enrollment.objects.filter(pk=enrollment.pk).update(enrolled_at=self.noon(days_ago))
+        for lesson in self.lessons[:2]:
+            LessonCompletion.objects.create(student=student, lesson=lesson, completed_at=self.noon(days_ago))
+        submission = QuizSubmission.objects.create(student=student, quiz=self.quiz, score=score, passed=score >= 50)
+        QuizSubmission.objects.filter(pk=submission.pk).update(submitted_at=self.noon(days_ago))
+
+    def rollups(self):
+        return {
+            row['day']: row
+            for row in CourseDailyActivity.objects.filter(course=self.course).values('day', *rollups.MEASURES)
+        }
+
+    def test_incremental_runs_over_several_windows_match_a_full_rebuild(self):
+        with mock.patch.object(rollups, 'ROLLUP_ID_WINDOW', 2):
+            for n, (days_ago, score) in enumerate([(3, 100), (3, 0), (1, 50), (0, 40), (1, 90), (0, 60)]):
+                self.add_activity(self.students[n], days_ago, score)
+                if n % 2:
+                    rollup_activity()
+            incremental = self.rollups()
+            rollup_activity(full=True)
+        self.assertEqual(self.rollups(), incremental)
+        self.assertEqual(incremental[self.noon(3).date()], {
+            'day': self.noon(3).date(), 'enrollments': 2, 'completions': 4,
+            'submissions': 2, 'passes': 1, 'score_total': 100,
+        })
+        self.assertEqual(sum(row['completions'] for row in incremental.values()), 12)
+
+    def test_backdated_offline_completions_count_on_their_own_day(self):
+        self.add_activity(self.students[0], 0, 80)
+        rollup_activity()
+        # Synced after that run, with the timestamp the client recorded offline
+        LessonCompletion.objects.create(student=self.students[0], lesson=self.lessons[2], completed_at=self.noon(10))
+        self.assertEqual(rollup_activity(), 1)
+        days = self.rollups()
+        self.assertEqual(days[self.noon(10).date()]['completions'], 1)
+        self.assertEqual(days[self.noon(10).date()]['enrollments'], 0)
+        self.assertEqual(days[self.noon(0).date()]['completions'], 2)
+
+    def test_weekly_series_sums_the_days_of_each_week(self):
+        today = timezone.localdate()
+        monday = today - timedelta(days=today.weekday())
+        other = Course.objects.create(title='Other', educator=self.educator, is_published=True)
+        for course, day, submissions, passes, score_total in [
+            (self.course, monday - timedelta(days=7), 2, 1, 120),
+            (self.course, monday - timedelta(days=5), 2, 2, 160),
+            (self.course, monday, 1, 0, 20),
+            (self.course, monday - timedelta(days=60), 5, 5, 500),  # Out of range
+            (other, monday, 9, 9, 900),  # Not asked for
+        ]:
+            CourseDailyActivity.objects.create(
+                course=course, day=day, enrollments=1, completions=3,
+                submissions=submissions, passes=passes, score_total=score_total,
+            )
+
+        series = activity_series([self.course], days=30, period='week')
+        self.assertEqual(
+            [(row['period'], row['enrollments'], row['completions'], row['submissions'], row['passes'])
+             for row in series],
+            [(monday - timedelta(days=7), 2, 6, 4, 3), (monday, 1, 3, 1, 0)],
+        )
+        self.assertEqual(series[0]['average_score'], 70)
+        self.assertEqual(series[0]['pass_rate'], 75)
+        self.assertEqual(len(activity_series([self.course], days=30)), 3)
+
+
+class MediaUploadTests(CourseTestCase):
+    content = b'%PDF-1.4 ' + bytes(range(256)) * 4
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        settings_override = override_settings(
+            MEDIA_ROOT=self.root / 'media', UPLOAD_STAGING_ROOT=self.root / 'staging',
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client.force_login(self.educator)
+
+    def start(self, sha256=''):
+        response = self.client.post(
+            reverse('core:media_upload_create'),
+            {'filename': 'notes.pdf', 'size': len(self.content), 'sha256': sha256},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.json()
+
+    def send(self, upload, start, end, checksum=None):
+        headers = {'Upload-Offset': str(start)}
+        if checksum is not None:
+            headers['Upload-Checksum'] = checksum
+        return self.client.post(
+            upload['url'], self.content[start:end], content_type='application/octet-stream', headers=headers,
+        )
+
+    def test_chunks_are_staged_outside_media_root(self):
+        upload = self.start()
+        path = staging_path(MediaUpload.objects.get(pk=upload['id']))
+        self.assertTrue(path.is_relative_to(self.root / 'staging'))
+        self.send(upload, 0, 100)
+        self.assertEqual(path.read_bytes(), self.content[:100])
+        self.assertFalse((self.root / 'media').exists())
+
+    def test_a_chunk_must_start_at_the_confirmed_offset(self):
+        upload = self.start()
+        self.assertEqual(self.send(upload, 0, 100).json()['offset'], 100)
+        for offset in (0, 50, 200):
+            response = self.send(upload, offset, offset + 100)
+            self.assertEqual(response.status_code, 409)
+            self.assertEqual(response.json()['offset'], 100)
+        self.assertEqual(staging_path(MediaUpload.objects.get(pk=upload['id'])).stat().st_size, 100)
+
+    def test_an_interrupted_upload_resumes_from_the_confirmed_offset(self):
+        upload = self.start()
+        self.send(upload, 0, 300)
+        media_upload = MediaUpload.objects.get(pk=upload['id'])
+        # The connection drops 100 bytes into a 400-byte chunk
+        with self.assertRaisesMessage(UploadError, "cut off after 100 of 400 bytes"):
+            write_chunk(media_upload, 300, io.BytesIO(self.content[300:400]), 400)
+        # A chunk the server never finished with can leave bytes behind, too
+        with open(staging_path(media_upload), 'ab') as f:
+            f.write(b'partial')
+
+        self.assertEqual(self.client.get(upload['url']).json()['offset'], 300)
+        self.assertEqual(self.send(upload, 300, len(self.content)).json()['offset'], len(self.content))
+        self.assertEqual(staging_path(media_upload).read_bytes(), self.content)
+
+    def test_chunks_and_files_that_fail_their_checksum_are_rejected(self):
+        upload = self.start(sha256='0' * 64)
+        response = self.send(upload, 0, 100, checksum=hashlib.sha256(b'something else').hexdigest())
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['offset'], 0)
+        self.assertEqual(self.send(upload, 0, 100, checksum=hashlib.sha256(self.content[:100]).hexdigest())
+                         .json()['offset'], 100)
+        self.send(upload, 100, len(self.content))
+
+        # The whole file doesn't match the checksum declared up front: start over
+        response = self.client.post(upload['complete_url'])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['offset'], 0)
+        self.assertEqual(staging_path(MediaUpload.objects.get(pk=upload['id'])).stat().st_size, 0)
+
+    def test_completing_verifies_the_whole_file(self):
+        upload = self.start(sha256=hashlib.sha256(self.content).hexdigest())
+        self.send(upload, 0, 500)
+        self.assertEqual(self.client.post(upload['complete_url']).status_code, 409)
+        self.send(upload, 500, len(self.content))
+
+        response = self.client.post(upload['complete_url'])
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['complete'])
+        self.assertEqual(response.json()['sha256'], hashlib.sha256(self.content).hexdigest())
+        self.assertEqual(self.send(upload, len(self.content), len(self.content) + 1).status_code, 409)
+
+    def test_attaching_moves_the_file_into_media_storage(self):
+        upload = self.start()
+        self.send(upload, 0, len(self.content))
+        self.client.post(upload['complete_url'])
+        media_upload = MediaUpload.objects.get(pk=upload['id'])
+        staged = staging_path(media_upload)
+
+        lesson = self.lessons[0]
+        attach_upload(lesson, media_upload)
+        lesson.save()
+        digest = hashlib.sha256(self.content).hexdigest()
+        self.assertEqual(lesson.pdf_file.name, f'lesson_pdfs/{digest[:2]}/{digest[2:4]}/{digest}.pdf')
+        self.assertEqual(Path(lesson.pdf_file.path).read_bytes(), self.content)
+        self.assertTrue(Path(lesson.pdf_file.path).is_relative_to(self.root / 'media'))
+        self.assertFalse(staged.exists())
+        self.assertFalse(MediaUpload.objects.filter(pk=media_upload.pk).exists())
+        self.assertEqual(MediaBlob.objects.get(name=lesson.pdf_file.name).references, 1)
+
+    def test_expiry_sweeps_the_staging_directory(self):
+        stale = create_upload(self.educator, 'stale.pdf', 10)
+        fresh = create_upload(self.educator, 'fresh.pdf', 10)
+        MediaUpload.objects.filter(pk=stale.pk).update(updated_at=timezone.now() - timedelta(days=2))
+        orphan = self.root / 'staging' / '999999.part'
+        orphan.touch()
+        old = time.time() - 3 * 24 * 60 * 60
+        os.utime(orphan, (old, old))
+
+        self.assertEqual(expire_uploads(), 1)
+        self.assertEqual(list(MediaUpload.objects.values_list('pk', flat=True)), [fresh.pk])
+        self.assertFalse(staging_path(stale).exists())
+        self.assertFalse(orphan.exists())
+        self.assertTrue(staging_path(fresh).exists())
+
+    def test_staging_files_left_under_media_root_are_moved_out(self):
+        upload = create_upload(self.educator, 'notes.pdf', 10)
+        staging_path(upload).unlink()
+        legacy = self.root / 'media' / 'upload_staging'
+        legacy.mkdir(parents=True)
+        (legacy / f'{upload.pk}.part').write_bytes(b'12345')
+
+        out = io.StringIO()
+        call_command('expire_uploads', stdout=out)
+        self.assertIn("Moved 1 staging file(s) out of MEDIA_ROOT", out.getvalue())
+        self.assertFalse(legacy.exists())
+        self.assertEqual(staging_path(upload).read_bytes(), b'12345')
+        self.assertEqual(move_legacy_staging(), 0)
+
+
+class ContentAddressedStorageTests(CourseTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        settings_override = override_settings(MEDIA_ROOT=self.root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def attach(self, lesson, content, sha256=False):
+        file = ContentFile(content)
+        if sha256:
+            # As resumable and multipart uploads arrive
+            file.sha256 = hashlib.sha256(content).hexdigest()
+        with self.captureOnCommitCallbacks(execute=True):
+            lesson.pdf_file.save('notes.pdf', file)
+        return lesson.pdf_file.name
+
+    def references(self, name):
+        return MediaBlob.objects.filter(name=name).values_list('references', flat=True).first()
+
+    def test_identical_uploads_share_one_file(self):
+        first = self.attach(self.lessons[0], b'%PDF same')
+        second = self.attach(self.lessons[1], b'%PDF same', sha256=True)
+        self.assertEqual(first, second)
+        self.assertEqual(len([path for path in self.root.rglob('*.pdf')]), 1)
+        self.assertEqual(self.references(first), 2)
+        self.assertNotEqual(self.attach(self.lessons[2], b'%PDF other'), first)
+
+    def test_a_file_is_kept_while_another_row_refers_to_it(self):
+        name = self.attach(self.lessons[0], b'%PDF shared')
+        self.attach(self.lessons[1], b'%PDF shared')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lessons[0].delete()
+        self.assertTrue(media_storage.exists(name))
+        self.assertEqual(self.references(name), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lessons[1].delete()
+        self.assertFalse(media_storage.exists(name))
+        self.assertIsNone(self.references(name))
+
+    def test_a_replaced_file_is_released_once_nothing_refers_to_it(self):
+        old = self.attach(self.lessons[0], b'%PDF first edition')
+        self.attach(self.lessons[1], b'%PDF first edition')
+
+        new = self.attach(self.lessons[0], b'%PDF second edition')
+        self.assertTrue(media_storage.exists(old))
+        self.assertEqual((self.references(old), self.references(new)), (1, 1))
+
+        self.attach(self.lessons[1], b'%PDF second edition')
+        self.assertFalse(media_storage.exists(old))
+        self.assertIsNone(self.references(old))
+        self.assertEqual(self.references(new), 2)
+
+    def test_deleting_takes_the_blob_lock_and_recounts_under_it(self):
+        name = self.attach(self.lessons[0], b'%PDF locked')
+        with CaptureQueriesContext(connection) as queries:
+            media_storage.delete(name)
+        sql = [query['sql'] for query in queries]
+        lock = next(i for i, query in enumerate(sql) if 'FROM "core_mediablob"' in query)
+        count = next(i for i, query in enumerate(sql) if 'FROM "core_lesson"' in query)
+        self.assertLess(lock, count)
+        # Still referenced, so nothing was removed
+        self.assertTrue(media_storage.exists(name))
+
+    def test_saving_restores_a_file_a_delete_has_just_removed(self):
+        for sha256 in (False, True):
+            with self.subTest(sha256=sha256):
+                content = f'%PDF restored {sha256}'.encode()
+                name = self.attach(self.lessons[0], content, sha256=sha256)
+                # A delete that won the lock has removed the file and its blob row
+                os.unlink(media_storage.path(name))
+                MediaBlob.objects.filter(name=name).delete()
+
+                self.assertEqual(self.attach(self.lessons[1], content, sha256=sha256), name)
+                with media_storage.open(name) as f:
+                    self.assertEqual(f.read(), content)
+                self.assertEqual(self.references(name), 2)
+                self.assertFalse(any((self.root / '.incoming').iterdir()))
@@ -0,0 +1,252 @@
+"""
+Resumable, chunked uploads of lesson media.
+
+A client starts an upload with the file's name and size (optionally its
+SHA-256), then sends the bytes in chunks of at most UPLOAD_CHUNK_SIZE, each
+tagged with the offset it starts at. Chunks are streamed from the request
+straight into a staging file under UPLOAD_STAGING_ROOT, so neither a chunk
+nor the whole file is ever held in memory. Staging is outside MEDIA_ROOT,
+which is served publicly, so a partial or unverified upload is never
+downloadable. After a dropped
+connection the client asks for the confirmed offset and carries on from
+there. Completing an upload hashes the staged file; attaching it to a
+lesson moves the file into storage, which is a rename when both are on
+the same filesystem and a copy otherwise.
+"""
+import hashlib
+import os
+import re
+import shutil
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.utils import timezone
+
+from .models import MediaUpload
+
+UPLOAD_STAGING_DIR = 'upload_staging'
+
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Bytes moved from the request to disk per read
+READ_SIZE = 64 * 1024
+
+# Lessons store uploaded media in pdf_file
+ALLOWED_EXTENSIONS = {'.pdf'}
+
+SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+class UploadError(Exception):
+    """A rejected upload request, with the HTTP status to answer with"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def staging_dir():
+    # Outside MEDIA_ROOT: partial uploads must never be served
+    return Path(getattr(settings, 'UPLOAD_STAGING_ROOT', Path(settings.BASE_DIR) / UPLOAD_STAGING_DIR))
+
+
+def staging_path(upload):
+    return staging_dir() / f'{upload.pk}.part'
+
+
+def move_legacy_staging():
+    """
+    Move staging files left under MEDIA_ROOT by earlier versions, where the
+    media URLs exposed them, to the staging directory so their uploads can
+    still be resumed. Returns the number of files moved.
+    """
+    legacy = Path(settings.MEDIA_ROOT) / UPLOAD_STAGING_DIR
+    if not legacy.is_dir() or legacy.resolve() == staging_dir().resolve():
+        return 0
+    staging_dir().mkdir(parents=True, exist_ok=True)
+    moved = 0
+    for path in legacy.iterdir():
+        if path.is_file():
+            shutil.move(path, staging_dir() / path.name)
+            moved += 1
+    shutil.rmtree(legacy, ignore_errors=True)
+    return moved
+
+
+def upload_status(upload):
+    return {
+        'id': upload.pk,
+        'filename': upload.filename,
+        'size': upload.size,
+        'offset': upload.offset,
+        'chunk_size': UPLOAD_CHUNK_SIZE,
+        'complete': upload.is_complete,
+        'sha256': upload.sha256,
+    }
+
+
+def _checksum(value):
+    value = (value or '').strip().lower()
+    if value and not SHA256_RE.match(value):
+        raise UploadError("Checksums must be hex-encoded SHA-256 digests.")
+    return value
+
+
+def create_upload(owner, filename, size, sha256=''):
+    """Register a new upload and create its empty staging file"""
+    filename = os.path.basename(str(filename)).strip()
+    if os.path.splitext(filename)[1].lower() not in ALLOWED_EXTENSIONS:
+        raise UploadError(f"Only {', '.join(sorted(ALLOWED_EXTENSIONS))} files can be uploaded.")
+    size = int(size)
+    max_size = getattr(settings, 'LESSON_UPLOAD_MAX_SIZE', 1024 ** 3)
+    if not 0 < size <= max_size:
+        raise UploadError(f"Files must be between 1 byte and {max_size} bytes.", status=413)
+
+    upload = MediaUpload.objects.create(
+        owner=owner, filename=filename[:255], size=size, expected_sha256=_checksum(sha256),
+    )
+    path = staging_path(upload)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.touch()
+    return upload
+
+
+def write_chunk(upload, offset, stream, length, sha256=''):
+    """
+    Write `length` bytes read from `stream` at `offset` of the staging file.
+
+    The chunk must start at the confirmed offset. It only counts once it
+    has arrived whole and matches `sha256` when one is given; otherwise the
+    staging file is cut back and the client resends it. Returns the new
+    confirmed offset.
+    """
+    if upload.is_complete:
+        raise UploadError("This upload is already complete.", status=409)
+    if offset != upload.offset:
+        raise UploadError(f"Expected a chunk at offset {upload.offset}.", status=409)
+    if not 0 < length <= UPLOAD_CHUNK_SIZE:
+        raise UploadError(f"Chunks must be between 1 and {UPLOAD_CHUNK_SIZE} bytes.", status=413)
+    if offset + length > upload.size:
+        raise UploadError("The chunk runs past the declared file size.")
+    sha256 = _checksum(sha256)
+
+    lock_key = f'media-upload:{upload.pk}'
+    if not cache.add(lock_key, True, timeout=300):
+        raise UploadError("Another chunk of this upload is still being written.", status=409)
+    try:
+        digest = hashlib.sha256()
+        received = 0
+        with open(staging_path(upload), 'r+b') as f:
+            # Drop whatever an interrupted chunk left past the confirmed offset
+            f.truncate(offset)
+            f.seek(offset)
+            while received < length:
+                data = stream.read(min(READ_SIZE, length - received))
+                if not data:
+                    break
+                f.write(data)
+                digest.update(data)
+                received += len(data)
+            if received != length:
+                f.truncate(offset)
+                raise UploadError(f"The chunk was cut off after {received} of {length} bytes.")
+            if sha256 and digest.hexdigest() != sha256:
+                f.truncate(offset)
+                raise UploadError("The chunk does not match its checksum.")
+            f.flush()
+            os.fsync(f.fileno())
+
+        # Only moves the offset if no other request got there first
+        updated = MediaUpload.objects.filter(pk=upload.pk, offset=offset, completed_at__isnull=True).update(
+            offset=offset + length, updated_at=timezone.now(),
+        )
+        if not updated:
+            upload.refresh_from_db()
+            raise UploadError(f"Expected a chunk at offset {upload.offset}.", status=409)
+        upload.offset = offset + length
+        return upload.offset
+    finally:
+        cache.delete(lock_key)
+
+
+def complete_upload(upload):
+    """
+    Verify a fully received upload and mark it complete.
+
+    The staged file is hashed one chunk-sized read at a time. If it does
+    not match the checksum declared at the start, the upload is reset to
+    offset 0.
+    """
+    if upload.is_complete:
+        return upload
+    if upload.offset != upload.size:
+        raise UploadError(f"Only {upload.offset} of {upload.size} bytes have arrived.", status=409)
+
+    path = staging_path(upload)
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    if upload.expected_sha256 and digest.hexdigest() != upload.expected_sha256:
+        with open(path, 'r+b') as f:
+            f.truncate(0)
+        upload.offset = 0
+        upload.save(update_fields=['offset', 'updated_at'])
+        raise UploadError("The file does not match its checksum. Upload it again.")
+
+    upload.sha256 = digest.hexdigest()
+    upload.completed_at = timezone.now()
+    upload.save(update_fields=['sha256', 'completed_at', 'updated_at'])
+    return upload
+
+
+class StagedFile(File):
+    """A staged upload that storage can move into place instead of copying"""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def attach_upload(lesson, upload):
+    """Store a completed upload as the lesson's PDF (the lesson is not saved)"""
+    path = staging_path(upload)
+    with open(path, 'rb') as f:
+        staged = StagedFile(f, name=upload.filename)
+        # Already hashed on completion, so storage need not read the file again
+        staged.sha256 = upload.sha256
+        lesson.pdf_file.save(upload.filename, staged, save=False)
+    path.unlink(missing_ok=True)
+    upload.delete()
+    return lesson
+
+
+def delete_upload(upload):
+    staging_path(upload).unlink(missing_ok=True)
+    upload.delete()
+
+
+def expire_uploads(max_age=None):
+    """
+    Delete uploads untouched for `max_age` (default LESSON_UPLOAD_EXPIRY
+    seconds), and staging files as old that have no upload. Returns the
+    number of uploads deleted.
+    """
+    if max_age is None:
+        max_age = timedelta(seconds=getattr(settings, 'LESSON_UPLOAD_EXPIRY', 24 * 60 * 60))
+    cutoff = timezone.now() - max_age
+    stale = MediaUpload.objects.filter(updated_at__lt=cutoff)
+    count = 0
+    for upload in stale.iterator():
+        delete_upload(upload)
+        count += 1
+
+    staging = staging_dir()
+    if staging.is_dir():
+        live = {f'{pk}.part' for pk in MediaUpload.objects.values_list('pk', flat=True)}
+        for path in staging.iterdir():
+            if path.name not in live and path.stat().st_mtime < cutoff.timestamp():
+                path.unlink(missing_ok=True)
+    return count
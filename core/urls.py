@@ -10,12 +10,23 @@ urlpatterns = [
     path('courses/<int:course_id>/', views.course_detail, name='course_detail'),
     path('courses/<int:course_id>/edit/', views.course_edit, name='course_edit'),
     path('courses/<int:course_id>/delete/', views.course_delete, name='course_delete'),
+    path('courses/<int:course_id>/clone/', views.course_clone, name='course_clone'),
+    path('courses/<int:course_id>/analytics/', views.course_analytics, name='course_analytics'),
+    path('courses/<int:course_id>/gradebook.csv', views.course_gradebook_export, name='course_gradebook_export'),
     path('courses/<int:course_id>/enroll/', views.enroll_course, name='enroll_course'),
+    path('courses/<int:course_id>/offline/', views.course_offline_bundle, name='course_offline_bundle'),
     path('courses/<int:course_id>/module/add/', views.module_create, name='module_create'),
+    path('courses/<int:course_id>/modules/reorder/', views.module_reorder, name='module_reorder'),
     path('modules/<int:module_id>/lesson/add/', views.lesson_create, name='lesson_create'),
+    path('modules/<int:module_id>/lessons/reorder/', views.lesson_reorder, name='lesson_reorder'),
     path('lessons/<int:lesson_id>/quiz/create/', views.quiz_create, name='quiz_create'),
     path('quizzes/<int:quiz_id>/question/add/', views.question_create, name='question_create'),
+    path('quizzes/<int:quiz_id>/questions/reorder/', views.question_reorder, name='question_reorder'),
     path('quizzes/<int:quiz_id>/', views.quiz_detail, name='quiz_detail'),
     path('lessons/<int:lesson_id>/', views.lesson_detail, name='lesson_detail'),
     path('lessons/<int:lesson_id>/complete/', views.mark_lesson_complete, name='mark_lesson_complete'),
+    path('lessons/completions/sync/', views.sync_lesson_completions, name='sync_lesson_completions'),
+    path('uploads/', views.media_upload_create, name='media_upload_create'),
+    path('uploads/<int:upload_id>/', views.media_upload, name='media_upload'),
+    path('uploads/<int:upload_id>/complete/', views.media_upload_complete, name='media_upload_complete'),
 ]
\ No newline at end of file
@@ -0,0 +1,53 @@
+import re
+from urllib.parse import urlparse
+
+YOUTUBE = 'youtube'
+VIMEO = 'vimeo'
+MP4 = 'mp4'
+
+PROVIDER_CHOICES = [
+    (YOUTUBE, 'YouTube'),
+    (VIMEO, 'Vimeo'),
+    (MP4, 'MP4 file'),
+]
+
+# Compiled once at import; each captures the provider's video id
+_PATTERNS = [
+    (YOUTUBE, re.compile(r'(?:youtube\.com/watch\?(?:.*&)?v=)([a-zA-Z0-9_-]{11})')),
+    (YOUTUBE, re.compile(r'(?:youtu\.be/)([a-zA-Z0-9_-]{11})')),
+    (YOUTUBE, re.compile(r'(?:youtube\.com/(?:embed|shorts|live)/)([a-zA-Z0-9_-]{11})')),
+    (VIMEO, re.compile(r'(?:player\.vimeo\.com/video/)(\d+)')),
+    (VIMEO, re.compile(r'(?:vimeo\.com/(?:channels/[\w-]+/)?)(\d+)')),
+]
+
+_EMBED_URLS = {
+    YOUTUBE: 'https://www.youtube.com/embed/{}',
+    VIMEO: 'https://player.vimeo.com/video/{}',
+}
+
+
+def parse_video_url(url):
+    """
+    Return (provider, video_id) for a lesson video URL.
+
+    Direct MP4 links use the URL itself as the id. Unrecognised URLs return
+    ('', '') and are embedded as-is.
+    """
+    if not url:
+        return '', ''
+    for provider, pattern in _PATTERNS:
+        match = pattern.search(url)
+        if match:
+            return provider, match.group(1)
+    if urlparse(url).path.lower().endswith('.mp4'):
+        return MP4, url
+    return '', ''
+
+
+def embed_url(provider, video_id, url=''):
+    """Build the embeddable URL for a parsed video, falling back to the original URL"""
+    if provider in _EMBED_URLS:
+        return _EMBED_URLS[provider].format(video_id)
+    if provider == MP4:
+        return video_id
+    return url
@@ -1,7 +1,32 @@
+import json
+
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.db import transaction
+from django.core.exceptions import PermissionDenied
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_http_methods, require_POST
+from eduaccess.routers import replica_reads
+from .bundles import get_or_schedule_bundle
+from .cloning import clone_course
+from .etags import course_detail_etag, lesson_detail_etag, quiz_detail_etag
+from .gradebook import stream_gradebook_csv
+from .grading import grade_quiz
 from .models import Course, Enrollment, Lesson
+from .ordering import apply_order, insert_at
+from .progress import (
+    MAX_SYNC_BATCH, parse_completion_events, record_completions, record_quiz_submission,
+    refresh_enrollment_progress,
+)
+from .purge import schedule_purge, soft_delete_course
+from .recommendations import schedule_recommendation_update
+from .rollups import ANALYTICS_RANGES, activity_series, activity_totals
+from .uploads import UploadError, attach_upload, complete_upload, create_upload, upload_status, write_chunk
 
 def home(request):
     """Landing page view"""
@@ -9,6 +34,7 @@ def home(request):
 
 
 @login_required
+@replica_reads
 def dashboard(request):
     """Dashboard view for authenticated users"""
     user = request.user
@@ -19,31 +45,48 @@ def dashboard(request):
     
     if user.user_type == 'student':
         # Get student's enrolled courses
-        enrollments = Enrollment.objects.filter(student=user).select_related('course')
-        enrolled_courses = [enrollment.course for enrollment in enrollments]
+        enrollments = Enrollment.objects.filter(
+            student=user, course__deleted_at__isnull=True
+        ).select_related('course', 'next_lesson__quiz')
+        enrolled_courses = []
+        for enrollment in enrollments:
+            # The card's "continue" link reads the stored resume pointer
+            enrollment.course.enrollment = enrollment
+            enrolled_courses.append(enrollment.course)
         context['enrolled_courses'] = enrolled_courses
         context['total_courses'] = enrollments.count()
         context['completed_courses'] = enrollments.filter(completed=True).count()
         
-        # Get available courses (published, not enrolled)
+        # Get available courses (published, not enrolled), with courses
+        # that students of the same courses also took ranked first
         enrolled_course_ids = [course.id for course in enrolled_courses]
         available_courses = Course.objects.filter(
             is_published=True
         ).exclude(
             id__in=enrolled_course_ids
+        ).annotate(
+            recommendation_score=Sum(
+                'recommended_by__score',
+                filter=Q(recommended_by__course_id__in=enrolled_course_ids),
+            )
+        ).order_by(
+            F('recommendation_score').desc(nulls_last=True), '-created_at'
         ).select_related('educator')
         context['available_courses'] = available_courses
     else:
         # Get educator's created courses
-        context['created_courses'] = Course.objects.filter(educator=user)
-        context['total_courses'] = context['created_courses'].count()
+        context['created_courses'] = Course.objects.filter(educator=user).annotate(
+            student_count=Count('enrollments')
+        )
+        context['total_courses'] = len(context['created_courses'])
         context['total_students'] = Enrollment.objects.filter(
-            course__educator=user
+            course__educator=user, course__deleted_at__isnull=True
         ).values('student').distinct().count()
     
     return render(request, 'dashboard.html', context)
 
 
+@replica_reads
 def course_list(request):
     """List all published courses"""
     courses = Course.objects.filter(is_published=True).select_related('educator')
@@ -51,22 +94,27 @@ def course_list(request):
 
 
 @login_required
+@replica_reads
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=course_detail_etag)
 def course_detail(request, course_id):
     """View course details"""
     course = get_object_or_404(Course, id=course_id, is_published=True)
     
     # Check if user is enrolled
-    is_enrolled = False
+    enrollment = None
     if request.user.user_type == 'student':
-        is_enrolled = Enrollment.objects.filter(
+        enrollment = Enrollment.objects.filter(
             student=request.user,
             course=course
-        ).exists()
+        ).select_related('next_lesson__quiz').first()
     
     context = {
         'course': course,
-        'is_enrolled': is_enrolled,
-        'modules': course.modules.all(),
+        'is_enrolled': enrollment is not None,
+        'enrollment': enrollment,
+        # Lessons are loaded per module inside the cached outline fragments
+        'modules': list(course.modules.all()),
     }
     
     return render(request, 'courses/course_detail.html', context)
@@ -81,13 +129,18 @@ def enroll_course(request, course_id):
     
     course = get_object_or_404(Course, id=course_id, is_published=True)
     
-    # Create enrollment if doesn't exist
-    enrollment, created = Enrollment.objects.get_or_create(
-        student=request.user,
-        course=course
-    )
+    # Create enrollment if doesn't exist; IMMEDIATE transaction takes the
+    # write lock before the lookup so concurrent enrollments don't deadlock
+    with transaction.atomic():
+        enrollment, created = Enrollment.objects.get_or_create(
+            student=request.user,
+            course=course
+        )
     
     if created:
+        # Point the new enrollment at the first lesson
+        refresh_enrollment_progress(request.user, [], activity={course.id: (None, enrollment.enrolled_at)})
+        schedule_recommendation_update()
         messages.success(request, f'Successfully enrolled in {course.title}!')
     else:
         messages.info(request, f'You are already enrolled in {course.title}.')
@@ -148,7 +201,9 @@ def course_delete(request, course_id):
         return redirect('core:course_detail', course_id=course.id)
         
     if request.method == 'POST':
-        course.delete()
+        # Hidden right away; the rows are purged in the background
+        soft_delete_course(course)
+        schedule_purge(course.id)
         messages.success(request, "Course deleted successfully.")
         return redirect('core:dashboard')
         
@@ -156,6 +211,57 @@ def course_delete(request, course_id):
 
 
 
+@login_required
+@require_POST
+def course_clone(request, course_id):
+    """Copy a course, with all its content, for a new term"""
+    course = get_object_or_404(Course, id=course_id)
+    if request.user != course.educator:
+        messages.error(request, "You do not have permission to duplicate this course.")
+        return redirect('core:course_detail', course_id=course.id)
+
+    new_course = clone_course(course, educator=request.user)
+    messages.success(request, "Course duplicated. Review the details and publish it when it's ready.")
+    return redirect('core:course_edit', course_id=new_course.id)
+
+
+@login_required
+def course_analytics(request, course_id):
+    """Course activity over time, read from the daily rollups"""
+    from .models import ActivityRollupState
+    course = get_object_or_404(Course, id=course_id)
+    if request.user != course.educator:
+        messages.error(request, "You do not have permission to view these analytics.")
+        return redirect('core:course_detail', course_id=course.id)
+
+    days = request.GET.get('days', '')
+    days = int(days) if days.isdigit() and int(days) in ANALYTICS_RANGES else 30
+    period = 'week' if request.GET.get('period') == 'week' else 'day'
+    state = ActivityRollupState.objects.filter(pk=1).first()
+    return render(request, 'core/course_analytics.html', {
+        'course': course,
+        'days': days,
+        'period': period,
+        'ranges': ANALYTICS_RANGES,
+        'series': activity_series([course], days=days, period=period),
+        'totals': activity_totals([course], days=days),
+        'rolled_up_at': state.updated_at if state else None,
+    })
+
+
+@login_required
+def course_gradebook_export(request, course_id):
+    """Stream the course gradebook as CSV"""
+    course = get_object_or_404(Course, id=course_id)
+    if request.user != course.educator:
+        # A download link has no page to show a flash message on
+        raise PermissionDenied("You do not have permission to export this gradebook.")
+
+    response = StreamingHttpResponse(stream_gradebook_csv(course), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="gradebook-course-{course.id}.csv"'
+    return response
+
+
 @login_required
 def module_create(request, course_id):
     """Add a module to a course"""
@@ -170,7 +276,7 @@ def module_create(request, course_id):
         if form.is_valid():
             module = form.save(commit=False)
             module.course = course
-            module.save()
+            insert_at(module, form.cleaned_data['position'])
             messages.success(request, "Module added!")
             return redirect('core:course_detail', course_id=course.id)
     else:
@@ -184,18 +290,20 @@ def module_create(request, course_id):
 def lesson_create(request, module_id):
     """Add a lesson to a module"""
     from .models import CourseModule
-    module = get_object_or_404(CourseModule, id=module_id)
+    module = get_object_or_404(CourseModule, id=module_id, course__deleted_at__isnull=True)
     if request.user != module.course.educator:
         messages.error(request, "Permission denied.")
         return redirect('core:dashboard')
         
     if request.method == 'POST':
         from .forms import LessonForm
-        form = LessonForm(request.POST, request.FILES)
+        form = LessonForm(request.POST, request.FILES, owner=request.user)
         if form.is_valid():
             lesson = form.save(commit=False)
             lesson.module = module
-            lesson.save()
+            if form.cleaned_data['media_upload']:
+                attach_upload(lesson, form.cleaned_data['media_upload'])
+            insert_at(lesson, form.cleaned_data['position'])
             messages.success(request, "Lesson added!")
             
             if lesson.content_type == 'quiz':
@@ -216,7 +324,7 @@ def lesson_create(request, module_id):
 def quiz_create(request, lesson_id):
     """Create a quiz for a specific lesson"""
     from .models import Lesson
-    lesson = get_object_or_404(Lesson, id=lesson_id)
+    lesson = get_object_or_404(Lesson, id=lesson_id, module__course__deleted_at__isnull=True)
     if request.user != lesson.module.course.educator:
         messages.error(request, "Permission denied.")
         return redirect('core:dashboard')
@@ -245,7 +353,7 @@ def quiz_create(request, lesson_id):
 def question_create(request, quiz_id):
     """Add questions to a quiz"""
     from .models import Quiz
-    quiz = get_object_or_404(Quiz, id=quiz_id)
+    quiz = get_object_or_404(Quiz, id=quiz_id, lesson__module__course__deleted_at__isnull=True)
     if request.user != quiz.lesson.module.course.educator:
          messages.error(request, "Permission denied.")
          return redirect('core:dashboard')
@@ -254,24 +362,26 @@ def question_create(request, quiz_id):
         from .forms import QuestionForm
         form = QuestionForm(request.POST)
         if form.is_valid():
-            question = form.save(commit=False)
-            question.quiz = quiz
-            question.save()
-            
-            # Handle MCQ Answers
-            if question.question_type == 'multiple_choice':
-                from .models import Answer
-                correct_idx = int(request.POST.get('correct_answer', 0))
+            # Question and answers are committed together
+            with transaction.atomic():
+                question = form.save(commit=False)
+                question.quiz = quiz
+                insert_at(question, form.cleaned_data['position'])
                 
-                # We expect up to 4 answers
-                for i in range(4):
-                    answer_text = request.POST.get(f'answer_{i}')
-                    if answer_text and answer_text.strip():
-                        Answer.objects.create(
-                            question=question,
-                            answer_text=answer_text.strip(),
-                            is_correct=(i == correct_idx)
-                        )
+                # Handle MCQ Answers
+                if question.question_type == 'multiple_choice':
+                    from .models import Answer
+                    correct_idx = int(request.POST.get('correct_answer', 0))
+                    
+                    # We expect up to 4 answers
+                    for i in range(4):
+                        answer_text = request.POST.get(f'answer_{i}')
+                        if answer_text and answer_text.strip():
+                            Answer.objects.create(
+                                question=question,
+                                answer_text=answer_text.strip(),
+                                is_correct=(i == correct_idx)
+                            )
             
             messages.success(request, "Question added!")
             
@@ -281,18 +391,18 @@ def question_create(request, quiz_id):
                 return redirect('core:course_detail', course_id=quiz.lesson.module.course.id)
     else:
         from .forms import QuestionForm
-        # Auto-increment order
-        last_question = quiz.questions.last()
-        next_order = last_question.order + 1 if last_question else 1
-        form = QuestionForm(initial={'order': next_order})
+        # A blank position adds the question at the end
+        form = QuestionForm()
         
     return render(request, 'core/question_form.html', {'form': form, 'quiz': quiz})
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=quiz_detail_etag)
 def quiz_detail(request, quiz_id):
     """View for students to take a quiz or educators to preview it"""
     from .models import Quiz, Answer
-    quiz = get_object_or_404(Quiz, id=quiz_id)
+    quiz = get_object_or_404(Quiz, id=quiz_id, lesson__module__course__deleted_at__isnull=True)
     
     # Check enrollment or ownership
     is_educator = (request.user == quiz.lesson.module.course.educator)
@@ -300,39 +410,16 @@ def quiz_detail(request, quiz_id):
     
     if request.method == 'POST':
         # Handle quiz submission
-        score = 0
-        total_points = 0
-        passed = False
-        
-        # Calculate score
-        for question in quiz.questions.all():
-            total_points += question.points
-            submitted_answer_id = request.POST.get(f'question_{question.id}')
-            
-            if question.question_type == 'multiple_choice' and submitted_answer_id:
-                try:
-                    selected_answer = question.answers.get(id=submitted_answer_id)
-                    if selected_answer.is_correct:
-                        score += question.points
-                except:
-                    pass
-        
-        # Calculate percentage
-        percentage = 0
-        if total_points > 0:
-            percentage = (score / total_points) * 100
-            
-        passed = percentage >= quiz.passing_score
+        selected = {
+            key[len('question_'):]: value
+            for key, value in request.POST.items()
+            if key.startswith('question_')
+        }
+        percentage, passed = grade_quiz(quiz, selected)
         
         # Save submission
         if not is_educator:
-            from .models import QuizSubmission
-            QuizSubmission.objects.create(
-                student=request.user,
-                quiz=quiz,
-                score=percentage,
-                passed=passed
-            )
+            record_quiz_submission(request.user, quiz, percentage, passed)
             
         if passed:
             messages.success(request, f"Congratulations! You passed with {percentage:.1f}%")
@@ -355,9 +442,11 @@ def quiz_detail(request, quiz_id):
 
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=lesson_detail_etag)
 def lesson_detail(request, lesson_id):
     """View to content of a specific lesson (Video/PDF/Text)"""
-    lesson = get_object_or_404(Lesson, id=lesson_id)
+    lesson = get_object_or_404(Lesson, id=lesson_id, module__course__deleted_at__isnull=True)
     
     # Check if user is enrolled or is course creator
     is_creator = (request.user == lesson.module.course.educator)
@@ -385,13 +474,17 @@ def lesson_detail(request, lesson_id):
 def mark_lesson_complete(request, lesson_id):
     """Mark a lesson as complete"""
     if request.method == 'POST':
-        lesson = get_object_or_404(Lesson, id=lesson_id)
+        lesson = get_object_or_404(Lesson, id=lesson_id, module__course__deleted_at__isnull=True)
         # Verify enrollment
         is_enrolled = lesson.module.course.enrollments.filter(student=request.user).exists()
         
         if is_enrolled:
             from .models import LessonCompletion
-            LessonCompletion.objects.get_or_create(student=request.user, lesson=lesson)
+            with transaction.atomic():
+                LessonCompletion.objects.get_or_create(student=request.user, lesson=lesson)
+                refresh_enrollment_progress(request.user, [], activity={
+                    lesson.module.course_id: (lesson.id, timezone.now()),
+                })
             messages.success(request, "Lesson marked as complete!")
         
         return redirect('core:course_detail', course_id=lesson.module.course.id)
@@ -399,4 +492,166 @@ def mark_lesson_complete(request, lesson_id):
     return redirect('core:dashboard')
 
 
+@login_required
+def course_offline_bundle(request, course_id):
+    """Download a course as an offline bundle (full, or a delta with ?since=<version>)"""
+    course = get_object_or_404(Course, id=course_id)
+    is_creator = (request.user == course.educator)
+    if not is_creator and not course.enrollments.filter(student=request.user).exists():
+        messages.error(request, "You must be enrolled to download this course.")
+        return redirect('core:course_detail', course_id=course.id)
+
+    path = get_or_schedule_bundle(course, request.GET.get('since'))
+    if path is None:
+        # Built in the background; clients retry until it is ready
+        response = HttpResponse(
+            "Your offline bundle is being prepared. Please try again in a moment.",
+            status=202,
+            content_type='text/plain',
+        )
+        response['Retry-After'] = '10'
+        return response
+
+    return FileResponse(
+        open(path, 'rb'),
+        as_attachment=True,
+        filename=f'course-{course.id}-{path.stem}.zip',
+    )
+
+
+@login_required
+@require_POST
+def sync_lesson_completions(request):
+    """
+    Record a batch of lesson completions queued by an offline client.
+
+    Expects {"completions": [{"lesson_id": 1, "completed_at": "<ISO 8601>"}, ...]}
+    and answers with the accepted and rejected lessons and the updated
+    progress of each affected course.
+    """
+    try:
+        events = json.loads(request.body)['completions']
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': "Expected a JSON object with a 'completions' list."}, status=400)
+    if not isinstance(events, list):
+        return JsonResponse({'error': "'completions' must be a list."}, status=400)
+    if len(events) > MAX_SYNC_BATCH:
+        return JsonResponse({'error': f"At most {MAX_SYNC_BATCH} completions per request."}, status=413)
+
+    completions, invalid = parse_completion_events(events)
+    accepted, rejected, progress = record_completions(request.user, completions)
+    return JsonResponse({
+        'accepted': accepted,
+        'rejected': rejected,
+        'invalid': invalid,
+        'courses': {str(course_id): course for course_id, course in progress.items()},
+    })
 
+
+def _upload_response(upload, status=200, error=None):
+    data = upload_status(upload)
+    data['url'] = reverse('core:media_upload', args=[upload.pk])
+    data['complete_url'] = reverse('core:media_upload_complete', args=[upload.pk])
+    if error:
+        data['error'] = error
+    return JsonResponse(data, status=status)
+
+
+@login_required
+@require_POST
+def media_upload_create(request):
+    """
+    Start a resumable lesson media upload.
+
+    Expects {"filename": "notes.pdf", "size": <bytes>, "sha256": <optional hex>}
+    and answers with the upload's URLs, chunk size and offset.
+    """
+    if request.user.user_type != 'educator':
+        return JsonResponse({'error': "Only educators can upload lesson media."}, status=403)
+    try:
+        data = json.loads(request.body)
+        upload = create_upload(request.user, data['filename'], data['size'], data.get('sha256') or '')
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': "Expected a JSON object with 'filename' and 'size'."}, status=400)
+    except UploadError as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+    return _upload_response(upload, status=201)
+
+
+@login_required
+@require_http_methods(['GET', 'POST'])
+def media_upload(request, upload_id):
+    """
+    GET: the upload's confirmed offset, to resume from.
+    POST: the next chunk as the raw request body, starting at the offset in
+    the Upload-Offset header, with an optional Upload-Checksum (SHA-256 hex).
+    """
+    from .models import MediaUpload
+    upload = get_object_or_404(MediaUpload, id=upload_id, owner=request.user)
+    if request.method == 'POST':
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except (KeyError, ValueError):
+            return _upload_response(upload, status=400, error="Chunks need Upload-Offset and Content-Length headers.")
+        try:
+            # Read from the request stream; request.body would buffer the chunk
+            write_chunk(upload, offset, request, length, request.headers.get('Upload-Checksum', ''))
+        except UploadError as e:
+            return _upload_response(upload, status=e.status, error=str(e))
+    return _upload_response(upload)
+
+
+@login_required
+@require_POST
+def media_upload_complete(request, upload_id):
+    """Verify a fully sent upload so it can be attached to a lesson"""
+    from .models import MediaUpload
+    upload = get_object_or_404(MediaUpload, id=upload_id, owner=request.user)
+    try:
+        complete_upload(upload)
+    except UploadError as e:
+        return _upload_response(upload, status=e.status, error=str(e))
+    return _upload_response(upload)
+
+
+def _reorder(request, model, parent_id, educator_id):
+    """Apply a drag-and-drop ordering, {"order": [id, ...]}, to a sibling set"""
+    if request.user.pk != educator_id:
+        return JsonResponse({'error': "Permission denied."}, status=403)
+    try:
+        ordered_ids = [int(pk) for pk in json.loads(request.body)['order']]
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': "Expected a JSON object with an 'order' list of ids."}, status=400)
+    try:
+        apply_order(model, parent_id, ordered_ids)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({'order': ordered_ids})
+
+
+@login_required
+@require_POST
+def module_reorder(request, course_id):
+    """Reorder a course's modules"""
+    from .models import CourseModule
+    course = get_object_or_404(Course, id=course_id)
+    return _reorder(request, CourseModule, course.id, course.educator_id)
+
+
+@login_required
+@require_POST
+def lesson_reorder(request, module_id):
+    """Reorder a module's lessons"""
+    from .models import CourseModule
+    module = get_object_or_404(CourseModule, id=module_id, course__deleted_at__isnull=True)
+    return _reorder(request, Lesson, module.id, module.course.educator_id)
+
+
+@login_required
+@require_POST
+def question_reorder(request, quiz_id):
+    """Reorder a quiz's questions"""
+    from .models import Question, Quiz
+    quiz = get_object_or_404(Quiz, id=quiz_id, lesson__module__course__deleted_at__isnull=True)
+    return _reorder(request, Question, quiz.id, quiz.lesson.module.course.educator_id)
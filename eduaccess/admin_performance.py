@@ -0,0 +1,135 @@
+"""
+Admin changelist helpers for tables too large for exact counts.
+
+Django's changelist runs COUNT(*) over the whole table for its paginator
+(and once more for the "N total" link). On tables with millions of rows
+those counts dominate page load, so unfiltered changelists use the
+database's row estimate instead once it passes
+ADMIN_ESTIMATED_COUNT_THRESHOLD. Filtered or searched changelists still
+count exactly, since they are usually small.
+
+Searches through a foreign key (course__title, student__email__startswith)
+would otherwise join every row of the large table to the related one and
+filter afterwards, because a case-insensitive LIKE can't use an index.
+LargeTableAdmin searches the related table in a subquery instead, so the
+matching rows are found through the foreign key's index.
+"""
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.utils import lookup_spawns_duplicates
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.db.models.constants import LOOKUP_SEP
+from django.utils.functional import cached_property
+from django.utils.text import smart_split, unescape_string_literal
+
+
+def estimated_row_count(model, using):
+    """
+    A cheap estimate of the number of rows in the model's table, or None.
+
+    PostgreSQL keeps a planner estimate in pg_class. SQLite has no such
+    statistic, but the largest rowid is an index lookup and a close upper
+    bound for tables that are mostly appended to.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [table])
+        elif connection.vendor == 'sqlite':
+            cursor.execute(f'SELECT MAX(rowid) FROM {connection.ops.quote_name(table)}')
+        else:
+            return None
+        row = cursor.fetchone()
+    # reltuples is -1 for tables that were never analyzed
+    return row[0] if row and row[0] is not None and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that estimates the count of unfiltered querysets over large tables"""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            threshold = getattr(settings, 'ADMIN_ESTIMATED_COUNT_THRESHOLD', 10000)
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > threshold:
+                return estimate
+        return super().count
+
+
+def search_lookup(model, field_name):
+    """
+    The ORM lookup for a search_fields entry naming a field of `model`,
+    optionally followed by a lookup, or None for paths through relations.
+    """
+    for prefix, lookup in (('^', 'istartswith'), ('=', 'iexact')):
+        if field_name.startswith(prefix):
+            return search_lookup(model, f'{field_name[1:]}{LOOKUP_SEP}{lookup}')
+    name, *rest = field_name.split(LOOKUP_SEP)
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+    if field.is_relation or len(rest) > 1 or (rest and not field.get_lookup(rest[0])):
+        return None
+    return field_name if rest else f'{field_name}{LOOKUP_SEP}icontains'
+
+
+def related_search(model, field_name):
+    """
+    (foreign key name, related model, lookup) for a search_fields entry that
+    searches one field across a foreign key, or None.
+    """
+    prefix = field_name[:1] if field_name.startswith(('^', '=')) else ''
+    name, _, rest = field_name.removeprefix(prefix).partition(LOOKUP_SEP)
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+    if not rest or not field.concrete or not (field.many_to_one or field.one_to_one):
+        return None
+    lookup = search_lookup(field.related_model, prefix + rest)
+    return (name, field.related_model, lookup) if lookup else None
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    ModelAdmin for tables that grow without bound.
+
+    Subclasses should set list_select_related for every foreign key shown in
+    list_display and autocomplete_fields for every foreign key on the form,
+    so neither the changelist nor the change form scales with table size.
+    Searches across a foreign key go through a subquery on the related table.
+    """
+    paginator = EstimatedCountPaginator
+    # Skips the second COUNT(*) behind the "N total" link on filtered pages
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        search_fields = self.get_search_fields(request)
+        related = {field: related_search(queryset.model, str(field)) for field in search_fields}
+        if not search_term or not any(related.values()):
+            return super().get_search_results(request, queryset, search_term)
+        direct = {field: search_lookup(queryset.model, str(field)) for field in search_fields if not related[field]}
+        if not all(direct.values()):
+            # Paths this doesn't understand get Django's own search
+            return super().get_search_results(request, queryset, search_term)
+
+        term_queries = []
+        for bit in smart_split(search_term):
+            if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+                bit = unescape_string_literal(bit)
+            term_query = Q.create([(lookup, bit) for lookup in direct.values()], connector=Q.OR)
+            for name, model, lookup in filter(None, related.values()):
+                # _base_manager, like the join it replaces: soft-deleted
+                # courses still match
+                matches = model._base_manager.filter(**{lookup: bit}).values('pk')
+                term_query |= Q(**{f'{name}__in': matches})
+            term_queries.append(term_query)
+        queryset = queryset.filter(Q.create(term_queries))
+        return queryset, any(lookup_spawns_duplicates(self.opts, lookup) for lookup in direct.values())
@@ -0,0 +1,31 @@
+"""
+Cache configuration for deployments with more than one worker process.
+
+Sessions (accounts.session_backend) and login rate limits live in the
+default cache. With a per-process cache such as LocMemCache each worker
+sees its own copy of a session until the write-behind flush, and each
+worker keeps its own rate-limit counters, so the production profile
+requires a cache every worker shares.
+"""
+from urllib.parse import urlsplit
+
+SHARED_CACHE_BACKENDS = {
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+    'rediss': 'django.core.cache.backends.redis.RedisCache',
+    'memcached': 'django.core.cache.backends.memcached.PyMemcacheCache',
+}
+
+
+def shared_cache(url):
+    """
+    Build a CACHES entry from a redis://, rediss:// or memcached://host:port
+    URL, or raise ValueError for anything that isn't shared between processes.
+    """
+    parts = urlsplit(url or '')
+    if parts.scheme not in SHARED_CACHE_BACKENDS or not parts.netloc:
+        raise ValueError(
+            f"Expected a shared cache URL (redis://, rediss:// or memcached://host:port), got {url!r}; "
+            "sessions and login rate limits must be visible to every worker process"
+        )
+    location = parts.netloc if parts.scheme == 'memcached' else url
+    return {'BACKEND': SHARED_CACHE_BACKENDS[parts.scheme], 'LOCATION': location}
@@ -0,0 +1,168 @@
+import logging
+import random
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+PRIMARY_ALIAS = 'default'
+
+# Cookie that pins a client's reads to the primary for a short while after it
+# wrote, so the redirect that follows a write never sees replica lag
+PIN_COOKIE_NAME = 'db_pin_primary'
+
+_replica_reads = ContextVar('replica_reads', default=False)
+_request_routing = ContextVar('request_routing', default=None)
+
+# alias -> monotonic time until which the replica is considered down
+_replica_down_until = {}
+
+
+class RequestRouting:
+    """Per-request routing state"""
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+        self._replica = None
+        self._replica_chosen = False
+
+    def replica(self):
+        """
+        The replica for this request's reads, chosen on the first read.
+
+        Replicas lag by different amounts, so switching between them within
+        a request could show data going back in time.
+        """
+        if not self._replica_chosen:
+            self._replica = choose_replica()
+            self._replica_chosen = True
+        return self._replica
+
+
+def replica_reads(view_func):
+    """
+    Route every ORM read made by a read-only view to a replica, if configured.
+
+    Reads of REPLICA_APPS models are sent to replicas from any view; this
+    extends that to the other apps' models (users, profiles) for views known
+    not to write. Writes are unaffected and always go to the primary.
+    """
+    @wraps(view_func)
+    def wrapper(*args, **kwargs):
+        token = _replica_reads.set(True)
+        try:
+            return view_func(*args, **kwargs)
+        finally:
+            _replica_reads.reset(token)
+    return wrapper
+
+
+def get_replica_weights():
+    """Configured replica aliases and their relative weights"""
+    return {
+        alias: weight
+        for alias, weight in getattr(settings, 'DATABASE_REPLICAS', {}).items()
+        if alias in connections.databases
+    }
+
+
+def replica_is_healthy(alias):
+    """
+    Return False for replicas that failed to connect recently.
+
+    A failed replica is skipped for DATABASE_REPLICA_RETRY_SECONDS before it
+    is tried again.
+    """
+    now = time.monotonic()
+    if _replica_down_until.get(alias, 0) > now:
+        return False
+    try:
+        connections[alias].ensure_connection()
+    except Exception:
+        logger.warning("Database replica %r is unavailable", alias, exc_info=True)
+        _replica_down_until[alias] = now + getattr(settings, 'DATABASE_REPLICA_RETRY_SECONDS', 30)
+        return False
+    return True
+
+
+def choose_replica():
+    """Pick a healthy replica at random by weight, or None to use the primary"""
+    weights = {
+        alias: weight
+        for alias, weight in get_replica_weights().items()
+        if weight > 0 and replica_is_healthy(alias)
+    }
+    if not weights:
+        return None
+    return random.choices(list(weights), weights=list(weights.values()))[0]
+
+
+class PrimaryPinMiddleware:
+    """
+    Track writes per request and pin reads to the primary after one.
+
+    Reads made after a write in the same request, and reads in requests from
+    the same client for DATABASE_PRIMARY_PIN_SECONDS afterwards, go to the
+    primary.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routing = RequestRouting(pinned=PIN_COOKIE_NAME in request.COOKIES)
+        token = _request_routing.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_routing.reset(token)
+        if routing.wrote:
+            response.set_cookie(
+                PIN_COOKIE_NAME,
+                '1',
+                max_age=getattr(settings, 'DATABASE_PRIMARY_PIN_SECONDS', 5),
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+
+class ReplicaRouter:
+    """
+    Send reads to weighted, health-checked replicas and writes to the primary.
+
+    Only reads made while handling a request (through PrimaryPinMiddleware)
+    are routed to replicas; management commands and background jobs always
+    read from the primary.
+    """
+
+    replica_apps = {'core'}
+
+    def db_for_read(self, model, **hints):
+        routing = _request_routing.get()
+        if routing is None or routing.pinned:
+            return PRIMARY_ALIAS
+        if model._meta.app_label not in self.replica_apps and not _replica_reads.get():
+            return PRIMARY_ALIAS
+        return routing.replica() or PRIMARY_ALIAS
+
+    def db_for_write(self, model, **hints):
+        routing = _request_routing.get()
+        if routing is not None:
+            # Read-your-writes for the rest of this request and the next few
+            routing.pinned = True
+            routing.wrote = True
+        return PRIMARY_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primary and replicas hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are populated by replication, never migrated directly
+        return db == PRIMARY_ALIAS
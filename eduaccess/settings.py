@@ -10,11 +10,19 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from dotenv import load_dotenv
+
+from .database import databases_from_env
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Environment overrides (database credentials etc.) from an optional .env file
+load_dotenv(BASE_DIR / '.env')
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/6.0/howto/deployment/checklist/
@@ -44,6 +52,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'eduaccess.routers.PrimaryPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -76,14 +85,72 @@ WSGI_APPLICATION = 'eduaccess.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
-DATABASES = {
+# Built from DB_* environment variables (see .env.example). SQLite is the
+# default and runs in WAL mode with a busy timeout and IMMEDIATE transactions;
+# PostgreSQL keeps persistent, health-checked connections. Either can add a
+# read replica.
+
+DATABASES = databases_from_env(os.environ, BASE_DIR)
+
+# Reads of core models go to a replica picked by weight; a client's reads are
+# pinned to the primary for DATABASE_PRIMARY_PIN_SECONDS after it writes, and
+# an unreachable replica is skipped for DATABASE_REPLICA_RETRY_SECONDS.
+DATABASE_ROUTERS = ['eduaccess.routers.ReplicaRouter']
+
+DATABASE_REPLICAS = {alias: 1 for alias in DATABASES if alias != 'default'}
+
+DATABASE_PRIMARY_PIN_SECONDS = 5
+
+DATABASE_REPLICA_RETRY_SECONDS = 30
+
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# Login rate limits and sessions live here. This per-process cache only suits
+# a single development server; settings_production requires a shared one
+# (DJANGO_CACHE_URL).
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
 
+# Sessions
+# Reads come from the cache and updates are written back to the database at
+# most once per SESSION_WRITE_COALESCE_SECONDS; expired rows are cleaned up in
+# the background every SESSION_CLEANUP_INTERVAL seconds.
+
+SESSION_ENGINE = 'accounts.session_backend'
+
+SESSION_WRITE_COALESCE_SECONDS = 5
+
+SESSION_CLEANUP_INTERVAL = 3600
+
+
+# Password hashing
+# PASSWORD_HASH_ITERATIONS defaults to Django's PBKDF2 cost. Run
+# `python manage.py calibrate_hasher` to pick a value that meets
+# PASSWORD_HASH_TARGET_MS on the deployment hardware; existing hashes are
+# upgraded to the new cost on the user's next successful login.
+
+PASSWORD_HASHERS = [
+    'accounts.hashers.TunedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+
+PASSWORD_HASH_TARGET_MS = 250
+
+
+# Authentication
+# ProfileModelBackend loads the user's profile in the same query as the user.
+
+AUTHENTICATION_BACKENDS = [
+    'accounts.backends.ProfileModelBackend',
+]
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -128,6 +195,37 @@ AUTH_USER_MODEL = 'accounts.User'
 LOGIN_REDIRECT_URL = 'landing'
 LOGOUT_REDIRECT_URL = 'landing'
 
+# Admin changelists show an estimated row count, instead of running
+# COUNT(*), for unfiltered tables larger than this
+ADMIN_ESTIMATED_COUNT_THRESHOLD = 10000
+
+# Login throttling: (max attempts, window in seconds) per client IP and per email
+LOGIN_RATE_LIMITS = {
+    'ip': (20, 300),
+    'email': (5, 300),
+}
+
 # Media Files (for uploads)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+# Offline course bundles are built here, outside MEDIA_ROOT, so they are only
+# downloadable through the enrollment-checked view. Superseded archives are
+# kept for OFFLINE_BUNDLE_PRUNE_GRACE seconds for downloads in flight.
+OFFLINE_BUNDLE_ROOT = BASE_DIR / 'offline_bundles'
+OFFLINE_BUNDLE_PRUNE_GRACE = 60 * 60
+
+# Resumable lesson media uploads: largest accepted file, and how long an
+# unfinished or unattached upload is kept (`manage.py expire_uploads`).
+# Chunks are staged outside MEDIA_ROOT so partial uploads are never served;
+# on the same filesystem as MEDIA_ROOT, attaching one is a rename.
+LESSON_UPLOAD_MAX_SIZE = 1024 * 1024 * 1024
+LESSON_UPLOAD_EXPIRY = 24 * 60 * 60
+UPLOAD_STAGING_ROOT = BASE_DIR / 'upload_staging'
+
+# Lesson PDFs and course thumbnails live in content-addressed storage
+# (core.storage); these handlers hash multipart uploads as they stream in
+FILE_UPLOAD_HANDLERS = [
+    'core.storage.HashingMemoryFileUploadHandler',
+    'core.storage.HashingTemporaryFileUploadHandler',
+]
@@ -0,0 +1,57 @@
+"""
+Production settings for eduaccess project.
+
+Use with DJANGO_SETTINGS_MODULE=eduaccess.settings_production. Everything
+not overridden here comes from eduaccess/settings.py.
+"""
+
+import os
+
+from .caches import shared_cache
+from .settings import *  # noqa: F401,F403
+from .settings import TEMPLATES
+
+SECRET_KEY = os.environ['DJANGO_SECRET_KEY']
+
+DEBUG = False
+
+ALLOWED_HOSTS = [host for host in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',') if host]
+
+
+# Cache
+# Sessions are served from the cache and written back later, and login rate
+# limits are counted there, so every worker must share it. Startup fails
+# without DJANGO_CACHE_URL rather than falling back to a per-process cache.
+
+CACHES = {
+    'default': shared_cache(os.environ.get('DJANGO_CACHE_URL')),
+}
+
+
+# Templates
+# Always use the cached loader (instead of depending on DEBUG) and compile
+# every template under templates/ when the app starts, so the first request
+# after a deploy doesn't pay for compilation. `manage.py check_templates`
+# reports per-template compile times.
+
+TEMPLATES = [
+    {
+        **TEMPLATES[0],
+        'APP_DIRS': False,
+        'OPTIONS': {
+            **TEMPLATES[0]['OPTIONS'],
+            'context_processors': [
+                processor for processor in TEMPLATES[0]['OPTIONS']['context_processors']
+                if processor != 'django.template.context_processors.debug'
+            ],
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
+        },
+    },
+]
+
+TEMPLATE_WARMUP = True
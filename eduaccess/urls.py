@@ -23,6 +23,7 @@ urlpatterns = [
     path('', views.landing, name='landing'),
     path('accounts/', include('accounts.urls')),
     path('core/', include('core.urls')),
+    path('api/v1/', include('core.api_urls')),
 ]
 
 from django.conf import settings
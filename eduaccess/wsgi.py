@@ -11,6 +11,11 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
+from main.template_cache import warm_templates
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'eduaccess.settings')
 
 application = get_wsgi_application()
+
+# Compile templates before the first request (production settings)
+warm_templates()
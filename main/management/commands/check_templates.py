@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main.template_cache import compile_templates, reset_template_caches
+
+
+class Command(BaseCommand):
+    help = "Compile every project template and report per-template compile time"
+
+    def handle(self, *args, **options):
+        # Measure real compile times even if templates were warmed at startup
+        reset_template_caches()
+        results = compile_templates()
+        failed = [(name, error) for name, _, error in results if error]
+
+        for name, seconds, error in sorted(results, key=lambda r: r[1], reverse=True):
+            line = f"{seconds * 1000:8.2f} ms  {name}"
+            if error:
+                self.stdout.write(self.style.ERROR(f"{line}  {error}"))
+            else:
+                self.stdout.write(line)
+
+        total = sum(seconds for _, seconds, _ in results)
+        self.stdout.write(f"Compiled {len(results)} templates in {total * 1000:.1f} ms")
+
+        if failed:
+            raise CommandError(f"{len(failed)} template(s) failed to compile")
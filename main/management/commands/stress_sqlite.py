@@ -0,0 +1,85 @@
+import os
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+
+from eduaccess.database import sqlite_database
+
+# Django's stock SQLite settings: rollback journal, 5 s timeout, deferred BEGIN
+STOCK = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'OPTIONS': {'timeout': 5},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Run parallel read-then-write transactions, like recording a lesson completion, against "
+        "a scratch SQLite file with Django's stock settings and with eduaccess.database.sqlite_database(), "
+        "and count the writers that fail with 'database is locked'"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8, help="Parallel writer threads")
+        parser.add_argument('--transactions', type=int, default=25, help="Transactions per writer")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'configuration':<15}{'committed':>11}{'locked':>8}{'seconds':>9}{'tx/s':>8}")
+        with tempfile.TemporaryDirectory() as directory:
+            for label, config in (
+                ('stock', {**STOCK, 'NAME': os.path.join(directory, 'stock.sqlite3')}),
+                ('tuned', sqlite_database(os.path.join(directory, 'tuned.sqlite3'))),
+            ):
+                committed, locked, elapsed = self._run(label, config, options)
+                self.stdout.write(
+                    f"{label:<15}{committed:>11}{locked:>8}{elapsed:>9.2f}{committed / elapsed:>8.0f}"
+                )
+
+    def _run(self, alias, config, options):
+        alias = f'stress_{alias}'
+        connections.databases[alias] = connections.configure_settings({'default': config})['default']
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute(
+                    'CREATE TABLE completion (id INTEGER PRIMARY KEY, student INTEGER, lesson INTEGER)'
+                )
+            connections[alias].close()
+
+            committed = locked = 0
+            lock = threading.Lock()
+
+            def writer(student):
+                nonlocal committed, locked
+                for lesson in range(options['transactions']):
+                    try:
+                        with transaction.atomic(using=alias):
+                            cursor = connections[alias].cursor()
+                            # Read first, then write: the lock upgrade that
+                            # deferred transactions can't wait for
+                            cursor.execute('SELECT COUNT(*) FROM completion WHERE student = %s', [student])
+                            cursor.execute(
+                                'INSERT INTO completion (student, lesson) VALUES (%s, %s)', [student, lesson]
+                            )
+                    except OperationalError as e:
+                        if 'locked' not in str(e):
+                            raise
+                        with lock:
+                            locked += 1
+                    else:
+                        with lock:
+                            committed += 1
+                connections[alias].close()
+
+            threads = [threading.Thread(target=writer, args=(n,)) for n in range(options['writers'])]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            return committed, locked, time.perf_counter() - start
+        finally:
+            connections[alias].close()
+            del connections.databases[alias]
@@ -0,0 +1,91 @@
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager, nullcontext
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+BACKENDS = ['sqlite', 'postgresql']
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the test suite once per database backend (DB_ENGINE=sqlite, then postgresql), "
+        "optionally against a throwaway local PostgreSQL cluster"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('test_labels', nargs='*', help="Passed on to `manage.py test`")
+        parser.add_argument(
+            '--backends', default=','.join(BACKENDS),
+            help="Comma-separated backends to run, from: " + ', '.join(BACKENDS),
+        )
+        parser.add_argument(
+            '--start-postgres', action='store_true',
+            help="Create a temporary PostgreSQL cluster with initdb and pg_ctl (run as a non-root user) "
+                 "instead of using the DB_* settings from the environment",
+        )
+
+    def handle(self, *args, **options):
+        backends = [backend.strip() for backend in options['backends'].split(',') if backend.strip()]
+        unknown = set(backends) - set(BACKENDS)
+        if unknown:
+            raise CommandError(f"Unknown backend(s): {', '.join(sorted(unknown))}")
+
+        results = []
+        for backend in backends:
+            env = {**os.environ, 'DB_ENGINE': backend}
+            # The replica settings of one backend mean nothing to the other
+            for key in [key for key in env if key.startswith('DB_REPLICA_')]:
+                del env[key]
+            if backend == 'sqlite':
+                env.pop('DB_NAME', None)
+            server = (
+                self._throwaway_postgres(env)
+                if backend == 'postgresql' and options['start_postgres'] else nullcontext()
+            )
+            self.stdout.write(self.style.MIGRATE_HEADING(f"Running tests on {backend}"))
+            start = time.perf_counter()
+            with server:
+                code = subprocess.call(
+                    [sys.executable, '-m', 'django', 'test', '--noinput', *options['test_labels']],
+                    cwd=settings.BASE_DIR, env=env,
+                )
+            results.append((backend, code, time.perf_counter() - start))
+
+        self.stdout.write(f"\n{'backend':<12}{'result':<8}{'seconds':>8}")
+        for backend, code, elapsed in results:
+            self.stdout.write(f"{backend:<12}{'ok' if code == 0 else 'FAILED':<8}{elapsed:>8.1f}")
+        if any(code for _, code, _ in results):
+            raise CommandError("Tests failed on at least one backend")
+
+    @contextmanager
+    def _throwaway_postgres(self, env):
+        """Run a PostgreSQL cluster in a temporary directory and point `env` at it"""
+        for tool in ('initdb', 'pg_ctl'):
+            if not shutil.which(tool):
+                raise CommandError(f"--start-postgres needs {tool} on PATH")
+        with tempfile.TemporaryDirectory() as directory:
+            data = os.path.join(directory, 'data')
+            with socket.socket() as s:
+                s.bind(('localhost', 0))
+                port = s.getsockname()[1]
+            subprocess.run(
+                ['initdb', '-D', data, '-U', 'eduaccess', '--auth=trust', '-E', 'UTF8'],
+                check=True, stdout=subprocess.DEVNULL,
+            )
+            subprocess.run(
+                ['pg_ctl', '-D', data, '-l', os.path.join(directory, 'postgres.log'), '-w',
+                 '-o', f"-p {port} -k {directory} -c listen_addresses=localhost -c fsync=off", 'start'],
+                check=True, stdout=subprocess.DEVNULL,
+            )
+            env.update(DB_HOST='localhost', DB_PORT=str(port), DB_USER='eduaccess', DB_PASSWORD='', DB_NAME='postgres')
+            try:
+                yield
+            finally:
+                subprocess.run(['pg_ctl', '-D', data, '-m', 'fast', '-w', 'stop'], stdout=subprocess.DEVNULL)
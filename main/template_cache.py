@@ -0,0 +1,60 @@
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.template import TemplateSyntaxError, engines
+
+
+def iter_template_names(engine):
+    """Yield the name of every template in the engine's project DIRS"""
+    for directory in engine.dirs:
+        directory = Path(directory)
+        for path in sorted(directory.rglob('*.html')):
+            yield path.relative_to(directory).as_posix()
+
+
+def django_engines():
+    """Yield (backend, engine) for every Django template backend"""
+    for backend in engines.all():
+        engine = getattr(backend, 'engine', None)
+        if engine is not None:
+            yield backend, engine
+
+
+def reset_template_caches():
+    """Empty the cached loaders so the next lookup compiles from source"""
+    for _, engine in django_engines():
+        for loader in engine.template_loaders:
+            if hasattr(loader, 'reset'):
+                loader.reset()
+
+
+def compile_templates():
+    """
+    Compile every project template, returning (name, seconds, error) tuples.
+
+    With the cached loader the compiled templates stay in memory, so calling
+    this at startup means the first request doesn't pay for compilation.
+    """
+    results = []
+    for backend, engine in django_engines():
+        for name in iter_template_names(engine):
+            start = time.perf_counter()
+            try:
+                backend.get_template(name)
+                error = None
+            except TemplateSyntaxError as e:
+                error = e
+            results.append((name, time.perf_counter() - start, error))
+    return results
+
+
+def warm_templates():
+    """
+    Compile every template if TEMPLATE_WARMUP is set.
+
+    Called from the WSGI and ASGI entry points, so only processes that
+    serve requests pay for it, not migrate, shell or other commands.
+    """
+    if getattr(settings, 'TEMPLATE_WARMUP', False):
+        compile_templates()
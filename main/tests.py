@@ -1,3 +1,205 @@
-from django.test import TestCase
+import contextlib
+import io
+import os
+import runpy
+import tempfile
+from pathlib import Path
+import unittest
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import OperationalError, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from accounts.models import User
+from core.models import Course
+from eduaccess import routers
+
+from eduaccess.caches import shared_cache
+from eduaccess.database import databases_from_env, sqlite_database
+from main.management.commands.stress_sqlite import Command as StressSQLite
+from main.template_cache import warm_templates
+
+
+# A plain unittest case: the scratch database lives outside the test databases
+class SQLiteConcurrencyTests(unittest.TestCase):
+    def test_parallel_writers_never_see_locked_errors(self):
+        with tempfile.TemporaryDirectory() as directory:
+            committed, locked, _ = StressSQLite()._run(
+                'test', sqlite_database(os.path.join(directory, 'db.sqlite3')),
+                {'writers': 8, 'transactions': 10},
+            )
+        self.assertEqual((committed, locked), (80, 0))
+
+
+class ReplicaRoutingTests(TestCase):
+    """Routing between the test database and two scratch SQLite replicas"""
+
+    replicas = ['replica_a', 'replica_b']
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Registered after the test case guards the configured aliases, and
+        # connected directly, so the runner never sets up test databases for them
+        cls.directory = tempfile.TemporaryDirectory()
+        for alias in cls.replicas:
+            config = sqlite_database(os.path.join(cls.directory.name, f'{alias}.sqlite3'))
+            connections.databases[alias] = connections.configure_settings({'default': config})['default']
+            connections[alias].connect()
+            with connections[alias].schema_editor() as editor:
+                editor.create_model(Course)
+
+    @classmethod
+    def tearDownClass(cls):
+        for alias in cls.replicas:
+            connections[alias].close()
+            del connections[alias]
+            del connections.databases[alias]
+        cls.directory.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        routers._replica_down_until.clear()
+        self.addCleanup(routers._replica_down_until.clear)
+        settings_override = override_settings(DATABASE_REPLICAS={alias: 1 for alias in self.replicas})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def request(self, view, cookies=None):
+        """Run `view` through PrimaryPinMiddleware; return the response and the alias of each course read"""
+        aliases = []
+
+        def record(alias):
+            def wrapper(execute, sql, params, many, context):
+                if sql.startswith('SELECT') and '"core_course"' in sql:
+                    aliases.append(alias)
+                return execute(sql, params, many, context)
+            return wrapper
+
+        request = RequestFactory().get('/')
+        request.COOKIES.update(cookies or {})
+        with contextlib.ExitStack() as stack:
+            for alias in ['default', *self.replicas]:
+                stack.enter_context(connections[alias].execute_wrapper(record(alias)))
+            response = routers.PrimaryPinMiddleware(view)(request)
+        return response, aliases
+
+    def read_courses(self, request, reads=5):
+        for _ in range(reads):
+            list(Course.objects.all())
+        return HttpResponse()
+
+    def test_a_request_reads_from_one_replica(self):
+        for _ in range(10):
+            _, aliases = self.request(self.read_courses)
+            self.assertEqual(len(aliases), 5)
+            self.assertEqual(len(set(aliases)), 1)
+            self.assertIn(aliases[0], self.replicas)
+
+    def test_other_apps_and_background_work_read_from_the_primary(self):
+        def view(request):
+            self.assertEqual(connections[User.objects.all().db].alias, 'default')
+            return HttpResponse()
+        self.request(view)
+        self.assertEqual(Course.objects.all().db, 'default')
+
+    def test_unreachable_replicas_fall_back_to_the_primary(self):
+        with contextlib.ExitStack() as stack:
+            connects = [
+                stack.enter_context(mock.patch.object(
+                    connections[alias], 'ensure_connection', side_effect=OperationalError('unreachable'),
+                ))
+                for alias in self.replicas
+            ]
+            with self.assertLogs('eduaccess.routers', 'WARNING'):
+                _, aliases = self.request(self.read_courses)
+            self.assertEqual(aliases, ['default'] * 5)
+            # Down replicas aren't retried on every request
+            _, aliases = self.request(self.read_courses)
+            self.assertEqual(aliases, ['default'] * 5)
+            self.assertEqual([connect.call_count for connect in connects], [1, 1])
+
+    def test_reads_after_a_write_are_pinned_to_the_primary(self):
+        def view(request):
+            list(Course.objects.all())
+            Course.objects.filter(pk=0).update(title='unused')
+            list(Course.objects.all())
+            return HttpResponse()
+
+        response, aliases = self.request(view)
+        self.assertIn(aliases[0], self.replicas)
+        self.assertEqual(aliases[1:], ['default'])
+        cookie = response.cookies[routers.PIN_COOKIE_NAME]
+        # The client's next request reads from the primary too
+        _, aliases = self.request(self.read_courses, cookies={cookie.key: cookie.value})
+        self.assertEqual(aliases, ['default'] * 5)
+
+
+class DatabaseConfigTests(SimpleTestCase):
+    def test_sqlite_is_the_default(self):
+        databases = databases_from_env({}, Path('/srv'))
+        self.assertEqual(list(databases), ['default'])
+        self.assertEqual(databases['default']['ENGINE'], 'django.db.backends.sqlite3')
+        self.assertEqual(databases['default']['NAME'], Path('/srv/db.sqlite3'))
+
+    def test_postgresql_keeps_health_checked_connections(self):
+        databases = databases_from_env({'DB_ENGINE': 'postgresql', 'DB_HOST': 'db', 'DB_CONN_MAX_AGE': '60'}, Path('/srv'))
+        self.assertEqual(databases['default']['HOST'], 'db')
+        self.assertEqual(databases['default']['CONN_MAX_AGE'], 60)
+        self.assertTrue(databases['default']['CONN_HEALTH_CHECKS'])
+
+    def test_replica_inherits_the_primary_settings(self):
+        databases = databases_from_env(
+            {'DB_ENGINE': 'postgresql', 'DB_HOST': 'db', 'DB_PASSWORD': 'secret', 'DB_REPLICA_HOST': 'replica'}, Path('/srv'),
+        )
+        self.assertEqual(databases['replica']['HOST'], 'replica')
+        self.assertEqual(databases['replica']['PASSWORD'], 'secret')
+        self.assertEqual(databases['replica']['TEST'], {'MIRROR': 'default'})
+
+    def test_unknown_engine_is_rejected(self):
+        with self.assertRaises(ValueError):
+            databases_from_env({'DB_ENGINE': 'mysql'}, Path('/srv'))
+
+
+class TemplateWarmupTests(SimpleTestCase):
+    def test_every_template_compiles(self):
+        out = io.StringIO()
+        call_command('check_templates', stdout=out)
+        self.assertIn('Compiled', out.getvalue())
+
+    def test_warmup_only_runs_when_enabled(self):
+        with mock.patch('main.template_cache.compile_templates') as compile_templates:
+            warm_templates()
+            self.assertFalse(compile_templates.called)
+            with override_settings(TEMPLATE_WARMUP=True):
+                warm_templates()
+            self.assertTrue(compile_templates.called)
+
+
+class SharedCacheTests(SimpleTestCase):
+    def test_redis_and_memcached_urls(self):
+        self.assertEqual(
+            shared_cache('redis://cache:6379/0'),
+            {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache:6379/0'},
+        )
+        self.assertEqual(
+            shared_cache('memcached://cache:11211'),
+            {'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache', 'LOCATION': 'cache:11211'},
+        )
+
+    def test_a_missing_or_per_process_cache_is_rejected(self):
+        for url in (None, '', 'locmem://', 'redis://'):
+            with self.subTest(url=url), self.assertRaises(ValueError):
+                shared_cache(url)
+
+    def test_production_settings_refuse_to_start_without_a_shared_cache(self):
+        env = {'DJANGO_SECRET_KEY': 'x', 'DJANGO_CACHE_URL': ''}
+        with mock.patch.dict(os.environ, env):
+            with self.assertRaises(ValueError):
+                runpy.run_module('eduaccess.settings_production')
+            os.environ['DJANGO_CACHE_URL'] = 'redis://cache:6379/0'
+            settings = runpy.run_module('eduaccess.settings_production')
+        self.assertEqual(settings['CACHES']['default']['LOCATION'], 'redis://cache:6379/0')
+        self.assertEqual(settings['SESSION_ENGINE'], 'accounts.session_backend')